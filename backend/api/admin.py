@@ -5,7 +5,7 @@ from .models import ApiLog
 
 @admin.register(ApiLog)
 class ApiLogAdmin(admin.ModelAdmin):
-    list_display = ('timestamp', 'endpoint', 'method', 'status_code')
+    list_display = ('timestamp', 'endpoint', 'method', 'status_code', 'latency_ms', 'request_id')
     list_filter = ('method', 'status_code', 'timestamp')
-    search_fields = ('endpoint',)
+    search_fields = ('endpoint', 'request_id', 'error_message')
     readonly_fields = ('timestamp',)
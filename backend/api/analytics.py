@@ -0,0 +1,202 @@
+# Attendance analytics computed server-side with NumPy
+# Each report is a single vectorised pass over the attendance rows of one
+# seminar (or of every seminar in a date range for the rollup). Results are
+# cached per seminar and invalidated whenever a scan is recorded.
+
+import logging
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+from . import cache_utils
+from .cache_utils import bump, generation
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Lateness / early-leave buckets in minutes; the first bucket is "on time"
+HISTOGRAM_EDGES = [0, 5, 10, 15, 30, 60]
+MAX_CURVE_POINTS = 500
+PAGE_SIZE = 1000
+
+
+def _histogram_labels():
+    labels = ['on_time']
+    for lo, hi in zip(HISTOGRAM_EDGES, HISTOGRAM_EDGES[1:]):
+        labels.append(f'{lo}-{hi}')
+    labels.append(f'{HISTOGRAM_EDGES[-1]}+')
+    return labels
+
+
+def fetch_all(build_query, page_size=PAGE_SIZE):
+    """Page through a select so PostgREST's row cap does not truncate results"""
+    rows, start = [], 0
+    while True:
+        page = build_query().range(start, start + page_size - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start += page_size
+
+
+def _naive_utc(value):
+    if not value:
+        return None
+    text = str(value)
+    if text.endswith('Z'):
+        return text[:-1]
+    if text.endswith('+00:00'):
+        return text[:-6]
+    parsed = datetime.fromisoformat(text)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.isoformat()
+
+
+def to_epoch_seconds(values):
+    """Vector of ISO timestamps -> float seconds since epoch (NaN for missing)"""
+    stamps = np.array([_naive_utc(v) for v in values], dtype='datetime64[us]')
+    seconds = stamps.astype('int64').astype('float64') / 1e6
+    seconds[np.isnat(stamps)] = np.nan
+    return seconds
+
+
+def _epoch_to_iso(seconds):
+    return datetime.fromtimestamp(float(seconds), tz=timezone.utc).isoformat()
+
+
+def _stat(values, fn):
+    finite = values[np.isfinite(values)]
+    return round(float(fn(finite)), 2) if finite.size else None
+
+
+def _histogram(minutes):
+    finite = minutes[np.isfinite(minutes)]
+    labels = _histogram_labels()
+    # Buckets are (lo, hi]; anything at or before the boundary counts as on time
+    counts = np.bincount(np.searchsorted(HISTOGRAM_EDGES, finite, side='left'), minlength=len(labels))
+    return dict(zip(labels, (int(c) for c in counts)))
+
+
+def _presence_curve(time_in, time_out, start, end, bucket_seconds):
+    """Number of people timed in at each bucket boundary"""
+    has_in = np.isfinite(time_in)
+    if not has_in.any():
+        return []
+    ins = np.sort(time_in[has_in])
+    # Someone who never timed out is counted as present until the seminar ends
+    fallback = end if np.isfinite(end) else np.inf
+    outs = np.sort(np.where(np.isfinite(time_out[has_in]), time_out[has_in], fallback))
+
+    lo = np.nanmin([start, ins[0]])
+    hi = np.nanmax([end, np.max(outs[np.isfinite(outs)], initial=ins[-1])])
+    steps = max(1, min(MAX_CURVE_POINTS, int((hi - lo) // bucket_seconds) + 1))
+    grid = lo + np.arange(steps) * bucket_seconds
+    present = np.searchsorted(ins, grid, side='right') - np.searchsorted(outs, grid, side='right')
+    return [{'t': _epoch_to_iso(t), 'present': int(n)} for t, n in zip(grid, present)]
+
+
+def summarize_seminar(seminar, attendance, registered_emails, bucket_minutes=5):
+    """Compute the per-seminar analytics payload"""
+    # Fixed-width unicode arrays keep unique/isin on the sort-based fast path
+    emails = np.array([r.get('participant_email') or '' for r in attendance], dtype=str)
+    time_in = to_epoch_seconds([r.get('time_in') for r in attendance])
+    time_out = to_epoch_seconds([r.get('time_out') for r in attendance])
+    start = to_epoch_seconds([seminar.get('start_datetime')])[0]
+    end = to_epoch_seconds([seminar.get('end_datetime')])[0]
+
+    minutes = (time_out - time_in) / 60.0
+    minutes[minutes < 0] = np.nan
+    finite = np.isfinite(minutes)
+
+    registered = np.unique(np.array([e for e in registered_emails if e], dtype=str))
+    attended = np.unique(emails[np.isfinite(time_in)]) if emails.size else emails
+    showed = np.isin(registered, attended) if registered.size else np.array([], dtype=bool)
+
+    return {
+        'seminar_id': seminar.get('id'),
+        'registered': int(registered.size),
+        'attended': int(attended.size),
+        'no_show_rate': round(1 - float(showed.mean()), 4) if registered.size else None,
+        'minutes_attended': dict(zip(emails[finite].tolist(), np.round(minutes[finite], 1).tolist())),
+        'mean_minutes': _stat(minutes, np.mean),
+        'median_minutes': _stat(minutes, np.median),
+        'late_arrival_histogram': _histogram((time_in - start) / 60.0),
+        'early_leave_histogram': _histogram((end - time_out) / 60.0),
+        'present_over_time': _presence_curve(time_in, time_out, start, end, bucket_minutes * 60),
+    }
+
+
+def summarize_rollup(seminars, attendance, joined):
+    """Per-seminar totals for many seminars, grouped with bincount"""
+    ids = [s['id'] for s in seminars]
+    index = {sid: i for i, sid in enumerate(ids)}
+    n = len(ids)
+
+    att_idx = np.array([index[r['seminar_id']] for r in attendance], dtype=np.int64)
+    time_in = to_epoch_seconds([r.get('time_in') for r in attendance])
+    time_out = to_epoch_seconds([r.get('time_out') for r in attendance])
+    minutes = (time_out - time_in) / 60.0
+    valid = np.isfinite(minutes) & (minutes >= 0)
+
+    attended = np.bincount(att_idx[np.isfinite(time_in)], minlength=n)
+    duration_sum = np.bincount(att_idx[valid], weights=minutes[valid], minlength=n)
+    duration_n = np.bincount(att_idx[valid], minlength=n)
+
+    # Registrants who timed in, matched on (seminar, email) composite keys
+    join_idx = np.array([index[r['seminar_id']] for r in joined], dtype=np.int64)
+    join_keys = np.array([f"{r['seminar_id']}|{r.get('participant_email')}" for r in joined], dtype=str)
+    att_keys = np.array([f"{r['seminar_id']}|{r.get('participant_email')}" for r in attendance], dtype=str)
+    showed = np.isin(join_keys, att_keys[np.isfinite(time_in)]) if join_keys.size else np.zeros(0, dtype=bool)
+    registered = np.bincount(join_idx, minlength=n)
+    registered_showed = np.bincount(join_idx[showed], minlength=n)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_minutes = np.where(duration_n > 0, duration_sum / duration_n, np.nan)
+        no_show = np.where(registered > 0, 1 - registered_showed / registered, np.nan)
+
+    per_seminar = []
+    for i, seminar in enumerate(seminars):
+        per_seminar.append({
+            'seminar_id': seminar['id'],
+            'title': seminar.get('title'),
+            'date': seminar.get('date'),
+            'registered': int(registered[i]),
+            'attended': int(attended[i]),
+            'no_show_rate': round(float(no_show[i]), 4) if np.isfinite(no_show[i]) else None,
+            'mean_minutes': round(float(mean_minutes[i]), 2) if np.isfinite(mean_minutes[i]) else None,
+        })
+
+    total_registered = int(registered.sum())
+    return {
+        'seminars': len(seminars),
+        'registered': total_registered,
+        'attended': int(attended.sum()),
+        'no_show_rate': round(1 - int(registered_showed.sum()) / total_registered, 4) if total_registered else None,
+        'mean_minutes': _stat(minutes[valid], np.mean),
+        'median_minutes': _stat(minutes[valid], np.median),
+        'per_seminar': per_seminar,
+    }
+
+
+# ---- caching ----
+
+def seminar_cache_key(seminar_id, bucket_minutes):
+    return f'analytics:seminar:{seminar_id}:{bucket_minutes}:{generation(f"scans:{seminar_id}")}'
+
+
+def rollup_cache_key(date_from, date_to):
+    return f'analytics:rollup:{date_from}:{date_to}:{generation("scans")}:{generation("seminars")}'
+
+
+def invalidate(seminar_id):
+    """Called after every recorded scan"""
+    bump(f'scans:{seminar_id}', 'scans')
+
+
+def cached(key, compute, timeout=None):
+    return cache_utils.cached(key, settings.ANALYTICS_CACHE_SECONDS if timeout is None else timeout, compute)
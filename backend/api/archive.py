@@ -0,0 +1,238 @@
+# Cold archive of finished seminars
+# Attendance, participant and evaluation rows of old seminars are moved out of
+# Supabase into compressed Arrow IPC files under ARCHIVE_DIR, one directory per
+# seminar. Reads memory-map the files, and list endpoints fall back to them
+# transparently once a seminar is archived. An archived seminar is read-only:
+# its reads come from the archive, so write endpoints refuse it. A participant
+# index next to the archives maps each email to the seminars it appears in, so
+# history only opens the archives that hold that participant.
+
+import json
+import logging
+import os
+import shutil
+import threading
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+from .delta import parse_timestamp
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except Exception:
+    pa = None
+    pa_ipc = None
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_TABLES = ('attendance', 'joined_participants', 'evaluations')
+MANIFEST = 'manifest.json'
+# Seminar ids never start with a dot, so the index cannot collide with an archive
+INDEX = '.participants.json'
+# Index key for archives written before manifests listed their emails
+ANY_EMAIL = '*'
+COMPRESSION = 'zstd'
+
+
+class ArchiveError(Exception):
+    """Raised when an archive cannot be written or verified"""
+
+
+def _seminar_dir(seminar_id):
+    # Seminar ids are UUIDs; refuse anything that could escape ARCHIVE_DIR
+    if not seminar_id or os.sep in seminar_id or seminar_id.startswith('.'):
+        raise ArchiveError(f'invalid seminar id: {seminar_id!r}')
+    return os.path.join(settings.ARCHIVE_DIR, seminar_id)
+
+
+def is_archived(seminar_id):
+    try:
+        return os.path.exists(os.path.join(_seminar_dir(seminar_id), MANIFEST))
+    except ArchiveError:
+        return False
+
+
+def read_manifest(seminar_id):
+    with open(os.path.join(_seminar_dir(seminar_id), MANIFEST)) as fh:
+        return json.load(fh)
+
+
+def _to_table(rows):
+    """Build an Arrow table; nested JSON columns are stored as JSON text"""
+    columns = sorted({key for row in rows for key in row})
+    json_columns = [c for c in columns if any(isinstance(r.get(c), (dict, list)) for r in rows)]
+    arrays = {}
+    for column in columns:
+        values = [r.get(column) for r in rows]
+        if column in json_columns:
+            values = [json.dumps(v) if v is not None else None for v in values]
+        try:
+            arrays[column] = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed scalar types: keep the text form rather than fail the archive
+            arrays[column] = pa.array([None if v is None else str(v) for v in values], type=pa.string())
+    table = pa.table(arrays) if arrays else pa.table({})
+    return table.replace_schema_metadata({'json_columns': json.dumps(json_columns)})
+
+
+def _write_table(path, rows):
+    table = _to_table(rows)
+    options = pa_ipc.IpcWriteOptions(compression=COMPRESSION)
+    with pa.OSFile(path, 'wb') as sink:
+        with pa_ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+
+
+def _read_path(path):
+    with pa.memory_map(path, 'r') as source:
+        data = pa_ipc.open_file(source).read_all()
+    json_columns = json.loads((data.schema.metadata or {}).get(b'json_columns', b'[]'))
+    rows = data.to_pylist()
+    for row in rows:
+        for column in json_columns:
+            if row.get(column) is not None:
+                row[column] = json.loads(row[column])
+    return rows
+
+
+def read_rows(seminar_id, table):
+    """Rows of one archived table, read through a memory map"""
+    return _read_path(os.path.join(_seminar_dir(seminar_id), f'{table}.arrow'))
+
+
+def archived_seminar_ids():
+    try:
+        names = os.listdir(settings.ARCHIVE_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted(name for name in names if not name.endswith('.tmp') and is_archived(name))
+
+
+_index_lock = threading.Lock()
+_index_cache = {'key': None, 'index': None}
+
+
+def _index_path():
+    return os.path.join(settings.ARCHIVE_DIR, INDEX)
+
+
+def _index_entries(manifest):
+    emails = manifest.get('participant_emails')
+    return [ANY_EMAIL] if emails is None else emails
+
+
+def _write_index(index):
+    path = _index_path()
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as fh:
+        json.dump(index, fh)
+    os.replace(tmp, path)
+
+
+def _read_index():
+    """The index file as last written, re-read only when it changes; None if missing"""
+    try:
+        stat = os.stat(_index_path())
+    except FileNotFoundError:
+        return None
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _index_lock:
+        if _index_cache['key'] != key:
+            with open(_index_path()) as fh:
+                _index_cache.update(key=key, index=json.load(fh))
+        return _index_cache['index']
+
+
+def rebuild_index():
+    """Rebuild the participant index from every manifest"""
+    index = {'seminars': archived_seminar_ids(), 'emails': {}}
+    for seminar_id in index['seminars']:
+        for email in _index_entries(read_manifest(seminar_id)):
+            index['emails'].setdefault(email, []).append(seminar_id)
+    if index['seminars']:
+        _write_index(index)
+    return index
+
+
+def load_index():
+    """{'seminars': [...], 'emails': {email: [seminar_id, ...]}} covering every archive"""
+    index = _read_index()
+    # One directory listing catches archives published by another process or run
+    if index is None or index['seminars'] != archived_seminar_ids():
+        return rebuild_index()
+    return index
+
+
+def _add_to_index(seminar_id, manifest):
+    index = _read_index()
+    others = [sid for sid in archived_seminar_ids() if sid != seminar_id]
+    if index is None or sorted(set(index['seminars']) - {seminar_id}) != others:
+        rebuild_index()
+        return
+    emails = {email: [sid for sid in ids if sid != seminar_id] for email, ids in index['emails'].items()}
+    for email in _index_entries(manifest):
+        emails.setdefault(email, []).append(seminar_id)
+    _write_index({'seminars': sorted(others + [seminar_id]), 'emails': emails})
+
+
+def participant_rows(email):
+    """{table: rows} of one participant across every archived seminar"""
+    found = {table: [] for table in ARCHIVED_TABLES}
+    emails = load_index()['emails']
+    for seminar_id in sorted(set(emails.get(email, [])) | set(emails.get(ANY_EMAIL, []))):
+        for table in ARCHIVED_TABLES:
+            found[table].extend(query_rows(seminar_id, table, participant_email=email))
+    return found
+
+
+def query_rows(seminar_id, table, since=None, column=None, participant_email=None, order=None):
+    """Archived rows filtered the same way the upstream list queries are"""
+    rows = read_rows(seminar_id, table)
+    if participant_email:
+        rows = [r for r in rows if r.get('participant_email') == participant_email]
+    if since and column:
+        floor = parse_timestamp(since)
+        rows = [r for r in rows if r.get(column) and parse_timestamp(r[column]) >= floor]
+    if order:
+        rows.sort(key=lambda r: (r.get(order) is None, r.get(order) or ''))
+    return rows
+
+
+def write_archive(seminar_id, tables):
+    """Write {table: rows} for a seminar, verify it reads back, then publish it atomically"""
+    if pa is None:
+        raise ArchiveError('pyarrow is required for archiving. Run pip install -r requirements.txt.')
+    final_dir = _seminar_dir(seminar_id)
+    tmp_dir = final_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    try:
+        counts = {}
+        for table in ARCHIVED_TABLES:
+            rows = tables.get(table) or []
+            path = os.path.join(tmp_dir, f'{table}.arrow')
+            _write_table(path, rows)
+            # Verify before the manifest exists, so a bad file is never served
+            if len(_read_path(path)) != len(rows):
+                raise ArchiveError(f'{table}: row count mismatch after write')
+            counts[table] = len(rows)
+        manifest = {
+            'seminar_id': seminar_id,
+            'archived_at': datetime.now(timezone.utc).isoformat(),
+            'format': f'arrow-ipc+{COMPRESSION}',
+            'row_counts': counts,
+            'participant_emails': sorted({r['participant_email'] for rows in tables.values()
+                                          for r in rows or [] if r.get('participant_email')}),
+        }
+        with open(os.path.join(tmp_dir, MANIFEST), 'w') as fh:
+            json.dump(manifest, fh)
+
+        shutil.rmtree(final_dir, ignore_errors=True)
+        os.replace(tmp_dir, final_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    _add_to_index(seminar_id, manifest)
+    return manifest
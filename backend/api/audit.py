@@ -0,0 +1,165 @@
+# API request audit trail
+# AuditMiddleware notes the endpoint, method, status, latency and error of each
+# recorded /api/ request in a bounded in-memory ring buffer; nothing touches the
+# database on the request path. A flusher thread per process drains the buffer
+# every API_LOG_FLUSH_SECONDS into ApiLog with bulk inserts. Errors (status
+# >= 400) and slow calls (>= API_LOG_SLOW_MS) are always recorded; other
+# requests are sampled at API_LOG_SAMPLE_RATE. Once an hour the flusher
+# compacts the table: sampled rows go after API_LOG_COMPACT_AFTER_DAYS, the
+# rest after API_LOG_RETENTION_DAYS.
+
+import atexit
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ApiLog
+
+logger = logging.getLogger(__name__)
+
+COMPACT_INTERVAL = 3600
+# Bytes of an error response kept to extract its message from
+ERROR_BODY_BYTES = 2048
+ERROR_MESSAGE_CHARS = 1000
+
+
+def _timestamp(ts):
+    moment = datetime.fromtimestamp(ts, dt_timezone.utc)
+    return moment if settings.USE_TZ else timezone.make_naive(moment)
+
+
+def _error_message(error, body):
+    if error:
+        return error[:ERROR_MESSAGE_CHARS]
+    if not body:
+        return None
+    try:
+        message = json.loads(body).get('error')
+    except (ValueError, AttributeError):
+        message = None
+    if message is None:
+        message = body.decode('utf-8', 'replace')
+    return str(message)[:ERROR_MESSAGE_CHARS]
+
+
+class AuditTrail:
+    """Ring buffer of request records and the thread that writes them out"""
+
+    def __init__(self, size):
+        self.buffer = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._compacted_at = 0.0
+        self.stats = {'recorded': 0, 'overwritten': 0, 'written': 0, 'failed': 0}
+
+    def record(self, entry):
+        """Called on the request path: one deque append, no I/O"""
+        if len(self.buffer) == self.buffer.maxlen:
+            self.stats['overwritten'] += 1
+        self.buffer.append(entry)
+        self.stats['recorded'] += 1
+        self._ensure_flusher()
+
+    def _ensure_flusher(self):
+        # Started lazily so every gunicorn worker process gets its own thread
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='audit-flush', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(settings.API_LOG_FLUSH_SECONDS)
+            try:
+                self.flush()
+                if time.monotonic() - self._compacted_at >= COMPACT_INTERVAL:
+                    self._compacted_at = time.monotonic()
+                    compact()
+            except Exception:
+                logger.exception("Audit trail flush failed")
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of rows written"""
+        entries = []
+        while True:
+            try:
+                entries.append(self.buffer.popleft())
+            except IndexError:
+                break
+        if not entries:
+            return 0
+        rows = [ApiLog(timestamp=_timestamp(ts), endpoint=path[:255], method=method,
+                       status_code=status, latency_ms=round(latency_ms, 2), request_id=request_id[:128],
+                       error_message=_error_message(error, body))
+                for ts, path, method, status, latency_ms, request_id, error, body in entries]
+        try:
+            ApiLog.objects.bulk_create(rows, batch_size=500)
+        except Exception:
+            # The trail is best effort; a failed batch is dropped rather than retried forever
+            self.stats['failed'] += len(rows)
+            logger.warning("Dropped %d audit record(s): bulk insert failed", len(rows), exc_info=True)
+            return 0
+        self.stats['written'] += len(rows)
+        return len(rows)
+
+    def snapshot(self):
+        return dict(self.stats, buffered=len(self.buffer))
+
+
+def compact(now=None):
+    """Drop sampled rows past API_LOG_COMPACT_AFTER_DAYS and all rows past API_LOG_RETENTION_DAYS"""
+    now = now or timezone.now()
+    expired, _ = ApiLog.objects.filter(timestamp__lt=now - timedelta(days=settings.API_LOG_RETENTION_DAYS)).delete()
+    sampled, _ = ApiLog.objects.filter(
+        Q(latency_ms__lt=settings.API_LOG_SLOW_MS) | Q(latency_ms__isnull=True),
+        timestamp__lt=now - timedelta(days=settings.API_LOG_COMPACT_AFTER_DAYS), status_code__lt=400,
+    ).delete()
+    return {'expired': expired, 'sampled': sampled}
+
+
+trail = AuditTrail(max(settings.API_LOG_BUFFER_SIZE, 1))
+
+
+class AuditMiddleware:
+    """Record /api/ requests in the audit trail: all errors and slow calls, a sample of the rest"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if settings.API_LOG_BUFFER_SIZE <= 0:
+            raise MiddlewareNotUsed
+        self.sample_rate = settings.API_LOG_SAMPLE_RATE
+        self.slow_ms = settings.API_LOG_SLOW_MS
+
+    def __call__(self, request):
+        if not request.path.startswith('/api/'):
+            return self.get_response(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        latency_ms = (time.perf_counter() - started) * 1000
+        status = response.status_code
+        if status < 400 and latency_ms < self.slow_ms and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return response
+        error = getattr(request, '_audit_error', None)
+        # The message is parsed out of the body on the flusher thread
+        body = response.content[:ERROR_BODY_BYTES] if status >= 400 and not response.streaming else None
+        trail.record((time.time(), request.path, request.method, status, latency_ms,
+                      getattr(request, 'request_id', ''), error, body))
+        return response
+
+    def process_exception(self, request, exception):
+        request._audit_error = f'{type(exception).__name__}: {exception}'
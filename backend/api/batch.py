@@ -0,0 +1,242 @@
+# Multiplexed API requests
+# POST /api/batch/ carries a list of API requests and answers them all in one
+# response, so a phone on a slow network pays one round trip instead of one per
+# call. Each sub-request is dispatched in-process through the normal URL routes
+# and middleware, so it shares the process's Supabase connection pool and
+# behaves exactly like the same request sent on its own. Independent
+# sub-requests run concurrently. A sub-request can wait for others with
+# `depends_on`, or by referencing their results with `{{id.path.to.value}}`
+# placeholders in its path or body; one whose dependency failed is not run and
+# gets status 424.
+
+import base64
+import io
+import json
+import logging
+import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import quote, unquote, unquote_to_bytes, urlsplit
+
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+PLACEHOLDER = re.compile(r'\{\{\s*([\w-]+)((?:\.[\w-]+)*)\s*\}\}')
+
+# Request headers that describe the batch itself, not its sub-requests
+_PARENT_ONLY = ('CONTENT_LENGTH', 'CONTENT_TYPE', 'QUERY_STRING', 'HTTP_IDEMPOTENCY_KEY', 'HTTP_IF_MATCH',
+                'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE', 'wsgi.input')
+
+_handler = None
+_handler_lock = threading.Lock()
+
+
+class BatchError(ValueError):
+    pass
+
+
+def _references(value):
+    """Item ids referenced by placeholders anywhere in `value`"""
+    if isinstance(value, str):
+        return {match.group(1) for match in PLACEHOLDER.finditer(value)}
+    if isinstance(value, dict):
+        return set().union(*map(_references, value.values())) if value else set()
+    if isinstance(value, list):
+        return set().union(*map(_references, value)) if value else set()
+    return set()
+
+
+def parse(body):
+    """Validated sub-requests from a batch request body"""
+    requests = body.get('requests') if isinstance(body, dict) else None
+    if not isinstance(requests, list) or not requests:
+        raise BatchError('requests must be a non-empty list')
+    if len(requests) > settings.BATCH_MAX_REQUESTS:
+        raise BatchError(f'At most {settings.BATCH_MAX_REQUESTS} requests per batch')
+
+    items = []
+    for index, raw in enumerate(requests):
+        if not isinstance(raw, dict):
+            raise BatchError(f'requests[{index}] must be an object')
+        item_id = str(raw.get('id', index))
+        method = str(raw.get('method', 'GET')).upper()
+        path = raw.get('path')
+        headers = raw.get('headers') or {}
+        if method not in METHODS:
+            raise BatchError(f'requests[{index}]: method must be one of {", ".join(METHODS)}')
+        if not isinstance(path, str) or not path.startswith('/api/'):
+            raise BatchError(f'requests[{index}]: path must start with /api/')
+        if not isinstance(headers, dict):
+            raise BatchError(f'requests[{index}]: headers must be an object')
+        depends_on = raw.get('depends_on') or []
+        if not isinstance(depends_on, list):
+            raise BatchError(f'requests[{index}]: depends_on must be a list of request ids')
+        items.append({'id': item_id, 'method': method, 'path': path, 'body': raw.get('body'), 'headers': headers,
+                      'depends_on': {str(d) for d in depends_on} | _references(path) | _references(raw.get('body'))})
+
+    ids = [item['id'] for item in items]
+    if len(set(ids)) != len(ids):
+        raise BatchError('Request ids must be unique')
+    for item in items:
+        unknown = item['depends_on'] - set(ids)
+        if unknown:
+            raise BatchError(f'Request "{item["id"]}" depends on unknown request "{sorted(unknown)[0]}"')
+
+    # Every request must be reachable in dependency order
+    done = set()
+    while len(done) < len(items):
+        ready = {item['id'] for item in items if item['id'] not in done and item['depends_on'] <= done}
+        if not ready:
+            raise BatchError('Request dependencies form a cycle')
+        done |= ready
+    return items
+
+
+def _lookup(results, ref, path):
+    value = results[ref]['body']
+    for part in path:
+        if isinstance(value, list) and part.lstrip('-').isdigit():
+            value = value[int(part)]
+        elif isinstance(value, dict):
+            value = value[part]
+        else:
+            raise KeyError(part)
+    return value
+
+
+def _resolve(match, results):
+    ref, path = match.group(1), match.group(2)
+    try:
+        return _lookup(results, ref, path.split('.')[1:] if path else [])
+    except (KeyError, IndexError, TypeError):
+        raise LookupError(f'{match.group(0)} did not resolve against the result of "{ref}"')
+
+
+def _substitute(value, results):
+    """`value` with placeholders replaced; a string that is one whole placeholder takes the referenced value as is"""
+    if isinstance(value, str):
+        whole = PLACEHOLDER.fullmatch(value.strip())
+        if whole:
+            return _resolve(whole, results)
+        return PLACEHOLDER.sub(lambda m: str(_resolve(m, results)), value)
+    if isinstance(value, dict):
+        return {k: _substitute(v, results) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_substitute(v, results) for v in value]
+    return value
+
+
+def _get_handler():
+    global _handler
+    with _handler_lock:
+        if _handler is None:
+            handler = BaseHandler()
+            handler.load_middleware()
+            _handler = handler
+        return _handler
+
+
+def _environ(parent, item_id, method, path, query, body, headers):
+    environ = {k: v for k, v in parent.META.items() if k not in _PARENT_ONLY}
+    if getattr(parent, 'request_id', None):
+        # Sub-request log records share the batch's request id
+        environ['HTTP_X_REQUEST_ID'] = f'{parent.request_id}.{item_id}'
+    data = json.dumps(body).encode('utf-8') if body is not None else b''
+    environ.update({
+        'REQUEST_METHOD': method,
+        # WSGI carries the decoded path as latin-1 text
+        'PATH_INFO': unquote_to_bytes(path).decode('latin-1'),
+        'QUERY_STRING': query,
+        'CONTENT_LENGTH': str(len(data)),
+        'wsgi.input': io.BytesIO(data),
+    })
+    if body is not None:
+        environ['CONTENT_TYPE'] = 'application/json'
+    for name, value in headers.items():
+        environ['HTTP_' + str(name).upper().replace('-', '_')] = str(value)
+    return environ
+
+
+def _result(item, status, body, headers=None):
+    result = {'id': item['id'], 'status': status, 'body': body}
+    if headers:
+        result['headers'] = headers
+    return result
+
+
+def _decode(item, response):
+    if getattr(response, 'streaming', False):
+        response.close()
+        return _result(item, 400, {'error': 'Streaming responses are not available in a batch; request the path directly'})
+    content_type = response.get('Content-Type', '')
+    headers = {k: v for k, v in response.items()
+               if k.lower() not in ('content-length', 'vary') and not k.lower().startswith('access-control-')}
+    content = response.content
+    if not content:
+        body = None
+    elif content_type.startswith('application/json'):
+        body = json.loads(content)
+    elif content_type.startswith(('text/', 'image/svg+xml')):
+        body = content.decode(response.charset or 'utf-8', 'replace')
+    else:
+        body = base64.b64encode(content).decode('ascii')
+        headers['X-Batch-Body-Encoding'] = 'base64'
+    return _result(item, response.status_code, body, headers)
+
+
+def _dispatch(parent, item, results):
+    try:
+        try:
+            path = PLACEHOLDER.sub(lambda m: quote(str(_resolve(m, results)), safe=''), item['path'])
+            body = _substitute(item['body'], results)
+        except LookupError as e:
+            return _result(item, 400, {'error': str(e.args[0])})
+        target = urlsplit(path)
+        try:
+            match = resolve(unquote(target.path))
+        except Resolver404:
+            return _result(item, 404, {'error': f'No route for {target.path}'})
+        if match.url_name == 'batch_requests':
+            return _result(item, 400, {'error': 'Batches cannot be nested'})
+        request = WSGIRequest(_environ(parent, item['id'], item['method'], target.path, target.query, body, item['headers']))
+        return _decode(item, _get_handler().get_response(request))
+    finally:
+        # Pool threads must not leave database connections behind
+        connections.close_all()
+
+
+def run(parent, items):
+    """Results of `items`, in request order, each with its own status code"""
+    results = {}
+    pending = list(items)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(settings.BATCH_MAX_CONCURRENCY, len(items))),
+                            thread_name_prefix='batch') as pool:
+        while pending or running:
+            ready = [item for item in pending if item['depends_on'] <= results.keys()]
+            skipped = False
+            for item in ready:
+                pending.remove(item)
+                failed = sorted(d for d in item['depends_on'] if results[d]['status'] >= 400)
+                if failed:
+                    results[item['id']] = _result(item, 424, {'error': f'Dependency "{failed[0]}" failed'})
+                    skipped = True
+                else:
+                    running[pool.submit(_dispatch, parent, item, results)] = item
+            if skipped or not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = running.pop(future)
+                try:
+                    results[item['id']] = future.result()
+                except Exception:
+                    logger.exception("Batch sub-request %s %s failed", item['method'], item['path'])
+                    results[item['id']] = _result(item, 500, {'error': 'Sub-request failed'})
+    return [results[item['id']] for item in items]
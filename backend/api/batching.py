@@ -0,0 +1,128 @@
+# Micro-batching writer for high-volume inserts
+# Submissions that queue up while earlier flushes are busy, plus any arriving
+# within a short window after them, are flushed together as one multi-row
+# insert; a lone submission is written at once. Each caller blocks on its own future and receives its own
+# row; if the batch insert fails, the items are retried one by one so a single
+# bad row cannot fail its neighbours. A caller that stops waiting gets
+# WriteTimeout, which carries the future so the outcome can still be recorded.
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+logger = logging.getLogger(__name__)
+
+
+class WriteTimeout(Exception):
+    """The caller's wait ran out; the write may still succeed. `future` settles when it does."""
+
+    def __init__(self, future):
+        super().__init__('Write still in progress')
+        self.future = future
+
+
+class MicroBatcher:
+    """Collect items for up to `window` seconds (or `max_size` items) per flush,
+    waiting only when more than one item is queued.
+
+    `write_many(items)` must return one result per item, in order.
+    `write_one(item)` is used when the window is 0. After `write_many` raises,
+    each item goes through `fallback(item)` (default `write_one`) instead; the
+    failed batch may have been written before the error, so it should check
+    for the row before inserting it again. At most `max_inflight` flushes run at once; while
+    they are busy, new items keep accumulating into the next batch.
+    """
+
+    def __init__(self, write_many, write_one, window=0.005, max_size=50, max_inflight=2, timeout=30, name='batcher',
+                 fallback=None):
+        self.write_many = write_many
+        self.write_one = write_one
+        self.fallback = fallback or write_one
+        self.window = window
+        self.max_size = max_size
+        self.timeout = timeout
+        self.name = name
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._slots = threading.BoundedSemaphore(max_inflight)
+        self._pool = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix=f'{name}-flush')
+        self.stats = {'items': 0, 'batches': 0, 'fallbacks': 0, 'max_batch': 0}
+
+    def submit(self, item):
+        """Write `item` and return its result, raising the write error if any, or
+        WriteTimeout if the batch has not finished within `timeout` seconds"""
+        if self.window <= 0 or self.max_size <= 1:
+            return self.write_one(item)
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((item, future))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise WriteTimeout(future)
+
+    def _ensure_worker(self):
+        # Started lazily so every gunicorn worker process gets its own thread
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Wait for a free flush slot first: submissions keep queueing meanwhile
+            self._slots.acquire()
+            self._drain(batch, block=False)
+            if len(batch) > 1:
+                # Only wait out the window under load; a lone submission is written at once
+                self._drain(batch, block=True)
+            self._pool.submit(self._flush, batch)
+
+    def _drain(self, batch, block):
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_size:
+            try:
+                if block:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+    def _flush(self, batch):
+        try:
+            self._write(batch)
+        finally:
+            self._slots.release()
+
+    def _write(self, batch):
+        items = [item for item, _ in batch]
+        with self._lock:
+            self.stats['batches'] += 1
+            self.stats['items'] += len(items)
+            self.stats['max_batch'] = max(self.stats['max_batch'], len(items))
+        try:
+            results = self.write_many(items)
+            if len(results) != len(items):
+                raise ValueError(f'expected {len(items)} results, got {len(results)}')
+        except Exception as e:
+            logger.warning("%s: batch of %s failed (%s); retrying per row", self.name, len(items), e)
+            with self._lock:
+                self.stats['fallbacks'] += 1
+            for item, future in batch:
+                try:
+                    future.set_result(self.fallback(item))
+                except Exception as row_error:
+                    future.set_exception(row_error)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
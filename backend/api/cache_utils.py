@@ -0,0 +1,50 @@
+# Helpers for derived-data caches
+# Entries are keyed by one or more "generation" tokens. Invalidating a scope
+# replaces its token, so every entry built on the old token becomes unreachable
+# and ages out on its own; no key enumeration is needed. Tokens are random
+# rather than counters so a culled token can never resurrect stale entries.
+
+import hashlib
+import logging
+import uuid
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+def _token_key(scope):
+    return f'gen:{scope}'
+
+
+def generation(scope):
+    """Current token for `scope`, created on first use"""
+    key = _token_key(scope)
+    token = cache.get(key)
+    if token is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        token = cache.get(key) or ''
+    return token
+
+
+def bump(*scopes):
+    """Invalidate every entry keyed on any of `scopes`"""
+    for scope in scopes:
+        try:
+            cache.set(_token_key(scope), uuid.uuid4().hex, None)
+        except Exception:
+            logger.warning("Failed to invalidate cache scope %s", scope)
+
+
+def email_scope(email):
+    """Cache scope for one participant, without putting the address in key names"""
+    return 'person:' + hashlib.sha1((email or '').strip().lower().encode('utf-8')).hexdigest()
+
+
+def cached(key, timeout, compute):
+    """Return the cached value for `key`, computing and storing it on a miss"""
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.set(key, result, timeout)
+    return result
@@ -0,0 +1,168 @@
+# Live per-seminar counters
+# Registered, present, timed-in and timed-out counts are kept in the local
+# database, which every gunicorn worker shares, and updated incrementally by
+# the join, check-in/out and time-in/out views. Capacity is enforced with a
+# single conditional UPDATE, which the database serialises, so racing joins
+# cannot overbook. Counters are rebuilt from Supabase when first used and
+# every SEMINAR_COUNTERS_RECONCILE_SECONDS after that, which also corrects
+# drift from writes that bypass this API.
+#
+# Every write is one autocommit statement: SQLite cannot upgrade a read
+# transaction to a write under contention, it fails it with "database is
+# locked" instead of waiting. A statement that still finds the table locked is
+# retried with backoff, and CountersBusy is raised once the retries run out.
+
+import logging
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import SeminarCounter
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('registered', 'present', 'timed_in', 'timed_out')
+LOCK_RETRIES = 10
+LOCK_RETRY_DELAY = 0.005
+LOCK_RETRY_MAX_DELAY = 0.2
+
+
+class CountersBusy(Exception):
+    """Raised when the counters table stayed locked through every retry"""
+
+    retry_after = 1
+
+
+def _retrying(fn):
+    """Run `fn`, retrying while SQLite reports the counters table locked or busy"""
+    for attempt in range(LOCK_RETRIES):
+        try:
+            return fn()
+        except OperationalError as e:
+            if 'locked' not in str(e) and 'busy' not in str(e):
+                raise
+            delay = min(LOCK_RETRY_DELAY * 2 ** attempt, LOCK_RETRY_MAX_DELAY)
+            time.sleep(random.uniform(delay / 2, delay))
+    raise CountersBusy('seminar counters are busy; retry shortly')
+
+
+def _count(query):
+    return query.limit(1).execute().count or 0
+
+
+def count_upstream(client, seminar_id):
+    """Exact counts and capacity for one seminar, from Supabase"""
+    def joined():
+        return client.table('joined_participants').select('id', count='exact').eq('seminar_id', seminar_id)
+
+    def attendance():
+        return client.table('attendance').select('id', count='exact').eq('seminar_id', seminar_id)
+
+    seminar = client.table('seminars').select('capacity').eq('id', seminar_id).limit(1).execute().data
+    return {
+        'capacity': seminar[0].get('capacity') if seminar else None,
+        'registered': _count(joined()),
+        'present': _count(joined().is_('present', 'true')),
+        'timed_in': _count(attendance().not_.is_('time_in', 'null')),
+        'timed_out': _count(attendance().not_.is_('time_out', 'null')),
+    }
+
+
+def _values(row):
+    return {field: getattr(row, field) for field in FIELDS} if row else dict.fromkeys(FIELDS, 0)
+
+
+def reconcile(client, seminar_id):
+    """Rebuild a seminar's counters from Supabase"""
+    before = _values(_retrying(lambda: SeminarCounter.objects.filter(pk=seminar_id).first()))
+    counts = count_upstream(client, seminar_id)
+    stamp = timezone.now()
+    # Keep increments made while counting; they may already be in `counts`,
+    # which errs towards a full seminar rather than an overbooked one
+    merged = {f: Greatest(F(f) + (counts[f] - before[f]), Value(0)) for f in FIELDS}
+    absolute = {f: counts[f] for f in FIELDS}
+
+    def write():
+        fields = {'capacity': counts['capacity'], 'reconciled_at': stamp}
+        if SeminarCounter.objects.filter(pk=seminar_id).update(**merged, **fields):
+            return
+        try:
+            with transaction.atomic():
+                SeminarCounter.objects.create(seminar_id=seminar_id, **absolute, **fields)
+        except IntegrityError:
+            # Another worker created the row after our read; its counts are as fresh as ours
+            SeminarCounter.objects.filter(pk=seminar_id).update(**absolute, **fields)
+
+    _retrying(write)
+    return _retrying(lambda: SeminarCounter.objects.get(pk=seminar_id))
+
+
+def get(client, seminar_id):
+    """Current counters, reconciling first if they are missing or stale"""
+    row = _retrying(lambda: SeminarCounter.objects.filter(pk=seminar_id).first())
+    max_age = timedelta(seconds=settings.SEMINAR_COUNTERS_RECONCILE_SECONDS)
+    if row is None or timezone.now() - row.reconciled_at > max_age:
+        row = reconcile(client, seminar_id)
+    return row
+
+
+def as_dict(row):
+    capacity = row.capacity if row.capacity and row.capacity > 0 else None
+    return {
+        'seminar_id': row.seminar_id,
+        **_values(row),
+        'capacity': capacity,
+        'remaining': max(0, capacity - row.registered) if capacity else None,
+        'reconciled_at': row.reconciled_at.isoformat(),
+    }
+
+
+def reserve_seat(client, seminar_id):
+    """Atomically count one more registration unless the seminar is full"""
+    get(client, seminar_id)
+    unlimited = Q(capacity__isnull=True) | Q(capacity__lte=0)
+    seat = SeminarCounter.objects.filter(Q(pk=seminar_id), unlimited | Q(registered__lt=F('capacity')))
+    return _retrying(lambda: seat.update(registered=F('registered') + 1)) == 1
+
+
+def reserve_seats(client, seminar_id, count):
+    """Atomically count up to `count` more registrations; returns how many fit"""
+    row = get(client, seminar_id)
+    for _ in range(LOCK_RETRIES):
+        free = row.capacity - row.registered if row.capacity and row.capacity > 0 else count
+        granted = max(0, min(count, free))
+        if granted == 0:
+            return 0
+        # Compare-and-set on the values the grant was computed from
+        seats = SeminarCounter.objects.filter(pk=seminar_id, registered=row.registered, capacity=row.capacity)
+        if _retrying(lambda: seats.update(registered=F('registered') + granted)):
+            return granted
+        row = get(client, seminar_id)
+    raise CountersBusy('seminar counters are busy; retry shortly')
+
+
+def adjust(seminar_id, **deltas):
+    """Apply increments such as present=1 or registered=-1"""
+    deltas = {field: n for field, n in deltas.items() if n}
+    if not deltas:
+        return
+    try:
+        _retrying(lambda: SeminarCounter.objects.filter(pk=seminar_id).update(**{f: F(f) + n for f, n in deltas.items()}))
+    except CountersBusy:
+        # The write this counts has already happened; the next reconcile corrects the drift
+        logger.warning("Counters for seminar %s stayed locked; skipped %s", seminar_id, deltas)
+
+
+def set_capacity(seminar_id, capacity):
+    _retrying(lambda: SeminarCounter.objects.filter(pk=seminar_id).update(capacity=capacity))
+
+
+def forget(seminar_id):
+    """Drop a seminar's counters so the next use rebuilds them from Supabase"""
+    _retrying(lambda: SeminarCounter.objects.filter(pk=seminar_id).delete())
@@ -0,0 +1,77 @@
+# Delta sync helpers for list endpoints
+# Clients pass `since=<next_since from the previous response>` and receive only
+# rows written at or after that point, plus tombstones for deleted rows. The
+# comparison is inclusive so rows sharing the boundary timestamp are never
+# missed; clients upsert rows by id, which makes the overlap harmless.
+
+from datetime import datetime, timezone
+
+# Column used as the change timestamp for each synced table
+CHANGE_COLUMNS = {
+    'seminars': 'updated_at',
+    'attendance': 'updated_at',
+    'joined_participants': 'updated_at',
+    'evaluations': 'created_at',
+}
+
+CHANGE_LOG_TABLE = 'change_log'
+
+
+def parse_timestamp(value):
+    """Parse an ISO-8601 timestamp (with optional Z suffix) as an aware datetime"""
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        text = str(value).strip()
+        if text.endswith(('Z', 'z')):
+            text = text[:-1] + '+00:00'
+        parsed = datetime.fromisoformat(text)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def parse_since(request):
+    """Return (since_iso, error) for the optional `since` query parameter"""
+    raw = request.GET.get('since')
+    if not raw:
+        return None, None
+    try:
+        return parse_timestamp(raw).isoformat(), None
+    except ValueError:
+        return None, 'since must be an ISO-8601 timestamp or a next_since cursor'
+
+
+def apply_since(query, table, since):
+    """Restrict a select query to rows changed at or after `since`"""
+    if since is None:
+        return query
+    return query.gte(CHANGE_COLUMNS[table], since)
+
+
+def high_water_mark(since, rows, column, tombstones=()):
+    """Latest change timestamp seen, to be sent back as the next `since`"""
+    marks = [parse_timestamp(since)] if since else []
+    marks += [parse_timestamp(r[column]) for r in rows if r.get(column)]
+    marks += [parse_timestamp(t['deleted_at']) for t in tombstones if t.get('deleted_at')]
+    return max(marks).isoformat() if marks else None
+
+
+def fetch_tombstones(client, since, table=None, seminar_id=None):
+    """Deletions recorded in the change log at or after `since`"""
+    query = client.table(CHANGE_LOG_TABLE).select('table_name,row_id,seminar_id,deleted_at').gte('deleted_at', since)
+    if table:
+        query = query.eq('table_name', table)
+    if seminar_id:
+        query = query.eq('seminar_id', seminar_id)
+    return query.order('deleted_at').execute().data or []
+
+
+def record_tombstone(client, table, row_id, seminar_id=None):
+    """Log a deletion so delta-sync clients can drop the row"""
+    # deleted_at defaults to now() upstream, on the same clock as updated_at
+    client.table(CHANGE_LOG_TABLE).insert({
+        'table_name': table,
+        'row_id': row_id,
+        'seminar_id': seminar_id,
+    }).execute()
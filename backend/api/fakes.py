@@ -0,0 +1,406 @@
+# In-memory stand-in for the Supabase client
+# Mirrors the subset of the postgrest query builder used by the views so tests
+# and offline tooling can exercise the API without a network connection.
+# FakeSMTPServer plays the same role for outgoing email.
+
+import copy
+import socketserver
+import threading
+import time
+import uuid
+from datetime import datetime
+
+
+class FakeAPIError(Exception):
+    """Raised for constraint violations and single() mismatches"""
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _now_iso():
+    return datetime.utcnow().isoformat() + 'Z'
+
+
+# Columns filled in by the database when a row is inserted
+TABLE_DEFAULTS = {
+    'seminars': ('created_at', 'updated_at'),
+    'joined_participants': ('joined_at', 'updated_at'),
+    'attendance': ('created_at', 'updated_at'),
+    'evaluations': ('created_at',),
+    'change_log': ('deleted_at',),
+}
+
+# Tables whose updated_at is bumped by a trigger on every update
+TABLE_TOUCH = ('seminars', 'attendance', 'joined_participants')
+
+# Unique constraints from scripts/*.sql
+TABLE_UNIQUE = {
+    'attendance': [('seminar_id', 'participant_email')],
+    'joined_participants': [('seminar_id', 'participant_email')],
+}
+
+
+class FakeQuery:
+    """Chainable query against one FakeSupabaseClient table"""
+
+    def __init__(self, client, table):
+        self._client = client
+        self._table = table
+        self._op = 'select'
+        self._payload = None
+        self._on_conflict = None
+        self._ignore_duplicates = False
+        self._filters = []
+        self._kinds = []
+        self._negate = False
+        self._order = []
+        self._limit = None
+        self._offset = 0
+        self._single = None
+        self._count = None
+        self._columns = '*'
+
+    # ---- operations ----
+
+    def select(self, columns='*', count=None):
+        if self._op == 'select':
+            self._columns = columns
+        self._count = count
+        return self
+
+    def insert(self, payload, **kwargs):
+        self._op = 'insert'
+        self._payload = payload
+        return self
+
+    def upsert(self, payload, on_conflict='', ignore_duplicates=False, **kwargs):
+        self._op = 'upsert'
+        self._payload = payload
+        self._on_conflict = tuple(c.strip() for c in on_conflict.split(',') if c.strip())
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, payload, **kwargs):
+        self._op = 'update'
+        self._payload = payload
+        return self
+
+    def delete(self, **kwargs):
+        self._op = 'delete'
+        return self
+
+    # ---- filters ----
+
+    def _add(self, column, test, kind='other'):
+        if self._negate:
+            self._negate = False
+            test = (lambda inner: lambda v: not inner(v))(test)
+            kind = 'other'
+        self._filters.append((column, test))
+        self._kinds.append((column, kind))
+        return self
+
+    @property
+    def not_(self):
+        self._negate = True
+        return self
+
+    def eq(self, column, value):
+        return self._add(column, lambda v: v == value, 'eq')
+
+    def neq(self, column, value):
+        return self._add(column, lambda v: v != value)
+
+    def gt(self, column, value):
+        return self._add(column, lambda v: v is not None and v > value, 'range')
+
+    def gte(self, column, value):
+        return self._add(column, lambda v: v is not None and v >= value, 'range')
+
+    def lt(self, column, value):
+        return self._add(column, lambda v: v is not None and v < value, 'range')
+
+    def lte(self, column, value):
+        return self._add(column, lambda v: v is not None and v <= value, 'range')
+
+    def in_(self, column, values):
+        values = set(values)
+        return self._add(column, lambda v: v in values, 'eq')
+
+    def is_(self, column, value):
+        if value in ('null', None):
+            return self._add(column, lambda v: v is None)
+        if value in ('true', True):
+            return self._add(column, lambda v: v is True)
+        if value in ('false', False):
+            return self._add(column, lambda v: v is False)
+        return self._add(column, lambda v: v is not None)
+
+    def order(self, column, desc=False, **kwargs):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, size):
+        self._limit = size
+        return self
+
+    def range(self, start, end):
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    def single(self):
+        self._single = 'single'
+        return self
+
+    def maybe_single(self):
+        self._single = 'maybe'
+        return self
+
+    # ---- execution ----
+
+    def shape(self):
+        """(table, equality columns, range columns, order columns), as api.query_audit.shape_key builds"""
+        eq = frozenset(c for c, kind in self._kinds if kind == 'eq')
+        ranged = frozenset(c for c, kind in self._kinds if kind == 'range')
+        return (self._table, eq, ranged, tuple(c for c, _ in self._order))
+
+    def _matches(self, row):
+        return all(test(row.get(column)) for column, test in self._filters)
+
+    def _project(self, row):
+        if self._columns in ('*', None):
+            return copy.deepcopy(row)
+        cols = [c.strip() for c in self._columns.split(',')]
+        return {c: copy.deepcopy(row.get(c)) for c in cols}
+
+    def execute(self):
+        if self._client.latency:
+            time.sleep(self._client.latency)
+        with self._client.lock:
+            self._client.calls.append((self._table, self._op))
+            if self._op in ('select', 'update', 'delete'):
+                self._client.shapes.add(self.shape())
+            rows = self._client.tables.setdefault(self._table, [])
+            if self._op == 'insert':
+                data = self._client._insert(self._table, self._payload)
+            elif self._op == 'upsert':
+                data = self._client._upsert(self._table, self._payload, self._on_conflict, self._ignore_duplicates)
+            elif self._op == 'update':
+                data = []
+                for row in rows:
+                    if self._matches(row):
+                        row.update(copy.deepcopy(self._payload))
+                        self._client._touch(self._table, row)
+                        data.append(copy.deepcopy(row))
+            elif self._op == 'delete':
+                data = [copy.deepcopy(r) for r in rows if self._matches(r)]
+                self._client.tables[self._table] = [r for r in rows if not self._matches(r)]
+            else:
+                matched = [r for r in rows if self._matches(r)]
+                for column, desc in reversed(self._order):
+                    matched.sort(key=lambda r: (r.get(column) is None, r.get(column) or ''), reverse=desc)
+                total = len(matched)
+                matched = matched[self._offset:]
+                if self._limit is not None:
+                    matched = matched[:self._limit]
+                data = [self._project(r) for r in matched]
+                if self._single:
+                    if len(data) > 1 or (self._single == 'single' and not data):
+                        raise FakeAPIError('JSON object requested, multiple (or no) rows returned')
+                    data = data[0] if data else None
+                return FakeResponse(data, total if self._count else None)
+            return FakeResponse(data)
+
+
+class _FakeCall:
+    def __init__(self, client, fn, params):
+        self._client = client
+        self._fn = fn
+        self._params = params
+
+    def execute(self):
+        with self._client.lock:
+            self._client.calls.append((self._fn, 'rpc'))
+            if self._fn not in self._client.functions:
+                raise FakeAPIError(f'Could not find the function public.{self._fn}')
+            return FakeResponse(self._client.functions[self._fn](**self._params))
+
+
+class FakeSupabaseClient:
+    """Thread-safe in-memory replacement for supabase.Client
+
+    `latency` (seconds) is slept before every execute() to simulate the
+    network round trip to Supabase.
+    """
+
+    def __init__(self, tables=None, latency=0.0):
+        self.latency = latency
+        self.lock = threading.RLock()
+        self.tables = {name: [dict(r) for r in rows] for name, rows in (tables or {}).items()}
+        self.calls = []
+        # Shapes of the queries run so far, see FakeQuery.shape()
+        self.shapes = set()
+        # Database functions reachable through rpc(), by name
+        self.functions = {}
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    from_ = table
+
+    def rpc(self, fn, params=None):
+        """Call one of the Python callables registered in `functions`"""
+        return _FakeCall(self, fn, params or {})
+
+    def _with_defaults(self, table, row):
+        row = copy.deepcopy(row)
+        row.setdefault('id', str(uuid.uuid4()))
+        for column in TABLE_DEFAULTS.get(table, ()):
+            if row.get(column) is None:
+                row[column] = _now_iso()
+        return row
+
+    def _touch(self, table, row):
+        if table in TABLE_TOUCH:
+            row['updated_at'] = _now_iso()
+
+    def _key_index(self, table, key):
+        return {tuple(r.get(k) for k in key): r for r in self.tables.get(table, [])}
+
+    def _insert(self, table, payload):
+        rows = payload if isinstance(payload, list) else [payload]
+        prepared = [self._with_defaults(table, r) for r in rows]
+        for key in TABLE_UNIQUE.get(table, []):
+            index = self._key_index(table, key)
+            for row in prepared:
+                marker = tuple(row.get(k) for k in key)
+                if marker in index:
+                    raise FakeAPIError(f'duplicate key value violates unique constraint on {table}{key}')
+                index[marker] = row
+        self.tables.setdefault(table, []).extend(prepared)
+        return [copy.deepcopy(r) for r in prepared]
+
+    def _upsert(self, table, payload, on_conflict, ignore_duplicates):
+        rows = payload if isinstance(payload, list) else [payload]
+        keys = on_conflict or (TABLE_UNIQUE.get(table) or [('id',)])[0]
+        index = self._key_index(table, keys)
+        seen = set()
+        data = []
+        fresh = []
+        for row in rows:
+            marker = tuple(row.get(k) for k in keys)
+            if marker in seen:
+                raise FakeAPIError('ON CONFLICT DO UPDATE command cannot affect row a second time')
+            seen.add(marker)
+            existing = index.get(marker)
+            if existing is None:
+                fresh.append(row)
+            elif not ignore_duplicates:
+                existing.update(copy.deepcopy(row))
+                self._touch(table, existing)
+                data.append(copy.deepcopy(existing))
+        if fresh:
+            data.extend(self._insert(table, fresh))
+        return data
+
+
+class FakeReplica(FakeSupabaseClient):
+    """Read replica of a FakeSupabaseClient that only sees the primary's data as of
+    its last catch_up(), and reports `lag` seconds from replica_lag_seconds()"""
+
+    def __init__(self, primary, lag=0.0, latency=0.0):
+        super().__init__(latency=latency)
+        self.primary = primary
+        self.lag = lag
+        self.functions['replica_lag_seconds'] = lambda: self.lag
+        self.catch_up()
+
+    def catch_up(self):
+        with self.primary.lock:
+            tables = copy.deepcopy(self.primary.tables)
+        with self.lock:
+            self.tables = tables
+
+
+class _SMTPSession(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT"""
+
+    def _reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        server = self.server.owner
+        with server.lock:
+            server.connections += 1
+        self._reply('220 fake-smtp ready')
+        sender, recipients = None, []
+        for raw in self.rfile:
+            command = raw.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+            if verb in ('EHLO', 'HELO'):
+                self._reply('250 fake-smtp')
+            elif verb == 'MAIL':
+                sender, recipients = command.split(':', 1)[1].strip().strip('<>'), []
+                self._reply('250 OK')
+            elif verb == 'RCPT':
+                address = command.split(':', 1)[1].strip().strip('<>')
+                if address in server.refuse:
+                    self._reply('550 No such user')
+                else:
+                    recipients.append(address)
+                    self._reply('250 OK')
+            elif verb == 'DATA':
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                for line in self.rfile:
+                    if line.rstrip(b'\r\n') == b'.':
+                        break
+                    lines.append(line)
+                with server.lock:
+                    server.messages.append((sender, recipients, b''.join(lines)))
+                self._reply('250 OK')
+            elif verb in ('RSET', 'NOOP'):
+                sender, recipients = (None, []) if verb == 'RSET' else (sender, recipients)
+                self._reply('250 OK')
+            elif verb == 'QUIT':
+                self._reply('221 Bye')
+                return
+            else:
+                self._reply('502 Command not implemented')
+
+
+class FakeSMTPServer:
+    """Local SMTP server on an ephemeral port that records what it receives.
+
+    Messages land in `messages` as (sender, recipients, data); `connections`
+    counts SMTP sessions opened. Addresses in `refuse` are rejected at RCPT.
+    """
+
+    def __init__(self, host='127.0.0.1'):
+        self.lock = threading.Lock()
+        self.messages = []
+        self.connections = 0
+        self.refuse = set()
+        self._server = socketserver.ThreadingTCPServer((host, 0), _SMTPSession)
+        self._server.daemon_threads = True
+        self._server.owner = self
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-smtp', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def recipients(self):
+        with self.lock:
+            return [address for _, to, _ in self.messages for address in to]
@@ -0,0 +1,66 @@
+# Per-participant history across all seminars
+# Built from set-based lookups keyed on participant_email: joins, attendance
+# and evaluations are fetched concurrently in one round, then the referenced
+# seminars in a second. Backed by the email indexes in
+# scripts/add_participant_email_indexes.sql. Archived seminars are read from
+# the cold archive instead, like the list endpoints do.
+
+from concurrent.futures import ThreadPoolExecutor
+
+from . import archive
+
+SEMINAR_COLUMNS = 'id,title,speaker,date,start_datetime,end_datetime,start_time,end_time,duration,certificate_template_url'
+
+_pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix='history')
+
+
+def _select(client, table, columns, email):
+    return client.table(table).select(columns).eq('participant_email', email).execute().data or []
+
+
+def build_history(client, email):
+    """Every seminar the participant joined or attended, newest first"""
+    joins_f = _pool.submit(_select, client, 'joined_participants', 'seminar_id,joined_at,present,check_in,check_out', email)
+    attendance_f = _pool.submit(_select, client, 'attendance', 'seminar_id,time_in,time_out', email)
+    evaluations_f = _pool.submit(_select, client, 'evaluations', 'seminar_id,created_at', email)
+    archived = archive.participant_rows(email)
+    joins = {r['seminar_id']: r for r in joins_f.result()}
+    attendance = {r['seminar_id']: r for r in attendance_f.result()}
+    evaluations = {}
+    for r in evaluations_f.result():
+        evaluations.setdefault(r['seminar_id'], r)
+    # The archive is authoritative for archived seminars, even when hot rows were kept
+    for sid in {r['seminar_id'] for rows in archived.values() for r in rows}:
+        joins.pop(sid, None)
+        attendance.pop(sid, None)
+        evaluations.pop(sid, None)
+    joins.update((r['seminar_id'], r) for r in archived['joined_participants'])
+    attendance.update((r['seminar_id'], r) for r in archived['attendance'])
+    for r in archived['evaluations']:
+        evaluations.setdefault(r['seminar_id'], r)
+
+    ids = sorted(set(joins) | set(attendance))
+    seminars = []
+    if ids:
+        seminars = client.table('seminars').select(SEMINAR_COLUMNS).in_('id', ids).execute().data or []
+
+    entries = []
+    for seminar in seminars:
+        sid = seminar['id']
+        join = joins.get(sid) or {}
+        scan = attendance.get(sid) or {}
+        evaluation = evaluations.get(sid)
+        entries.append(dict(
+            seminar,
+            joined=sid in joins,
+            joined_at=join.get('joined_at'),
+            present=join.get('present'),
+            check_in=join.get('check_in'),
+            check_out=join.get('check_out'),
+            time_in=scan.get('time_in'),
+            time_out=scan.get('time_out'),
+            evaluated=evaluation is not None,
+            evaluated_at=evaluation.get('created_at') if evaluation else None,
+        ))
+    entries.sort(key=lambda e: (e.get('start_datetime') or e.get('date') or ''), reverse=True)
+    return {'participant_email': email, 'seminars': entries}
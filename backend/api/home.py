@@ -0,0 +1,69 @@
+# Participant landing screen
+# Everything Participant.jsx needs for first paint in one payload: upcoming and
+# ongoing seminars, whether the participant joined each, their live attendance
+# state, and which attended seminars still await an evaluation. Seminar details
+# and status buckets come from the in-memory seminar index; the participant's
+# own rows are three set-based lookups on participant_email, run concurrently
+# while the index is consulted.
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix='home')
+
+
+def _select(client, table, columns, email):
+    return client.table(table).select(columns).eq('participant_email', email).execute().data or []
+
+
+def attendance_state(scan):
+    """'timed_out', 'timed_in' or None for an attendance row"""
+    if scan.get('time_out'):
+        return 'timed_out'
+    if scan.get('time_in'):
+        return 'timed_in'
+    return None
+
+
+def build_home(client, index, email, limit=50, now=None):
+    """(payload, seconds until a listed seminar starts or ends and the payload goes stale)"""
+    now = now if now is not None else time.time()
+    joins_f = _pool.submit(_select, client, 'joined_participants', 'seminar_id,joined_at', email)
+    attendance_f = _pool.submit(_select, client, 'attendance', 'seminar_id,time_in,time_out', email)
+    evaluations_f = _pool.submit(_select, client, 'evaluations', 'seminar_id', email)
+
+    _, ongoing = index.search(status='ongoing', now=now, limit=limit)
+    _, upcoming = index.search(status='upcoming', now=now, limit=limit)
+    joins = {r['seminar_id']: r for r in joins_f.result()}
+    attendance = {r['seminar_id']: r for r in attendance_f.result()}
+    evaluated = {r['seminar_id'] for r in evaluations_f.result()}
+
+    listed = {row['id']: status for status, rows in (('ongoing', ongoing), ('upcoming', upcoming)) for row in rows}
+    docs = index.lookup(list(listed) + [sid for sid in attendance if sid not in listed])
+
+    def entry(sid, status):
+        row, _, _ = docs[sid]
+        scan = attendance.get(sid) or {}
+        return dict(
+            row,
+            status=status,
+            joined=sid in joins,
+            joined_at=(joins.get(sid) or {}).get('joined_at'),
+            attendance=attendance_state(scan),
+            time_in=scan.get('time_in'),
+            time_out=scan.get('time_out'),
+            evaluated=sid in evaluated,
+            evaluation_pending=status != 'upcoming' and bool(scan.get('time_in')) and sid not in evaluated,
+        )
+
+    seminars = [entry(sid, status) for sid, status in listed.items() if sid in docs]
+    pending = [entry(sid, 'past') for sid in attendance
+               if sid not in listed and sid in docs and attendance[sid].get('time_in') and sid not in evaluated]
+    pending.sort(key=lambda e: docs[e['id']][2] or 0, reverse=True)
+
+    # The next start among upcoming seminars or end among ongoing ones moves a seminar between buckets
+    changes = [docs[sid][1] for sid, status in listed.items() if status == 'upcoming' and sid in docs] + \
+              [docs[sid][2] for sid, status in listed.items() if status == 'ongoing' and sid in docs]
+    valid_for = min((t - now for t in changes if t is not None and t > now), default=None)
+    payload = {'participant_email': email, 'seminars': seminars, 'pending_evaluations': pending}
+    return payload, valid_for
@@ -0,0 +1,164 @@
+# Idempotency-Key handling for write endpoints
+# The first response to a POST carrying an Idempotency-Key header is stored in
+# the local database and replayed for retries with the same key, so a retried
+# join or evaluation never reaches Supabase twice. The database is shared by
+# every gunicorn worker, which makes the key claim atomic across processes.
+
+import hashlib
+import logging
+from datetime import timedelta
+from itertools import count
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .models import IdempotencyRecord
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+REPLAY_HEADER = 'Idempotent-Replayed'
+
+# A pending claim older than this is assumed abandoned by a crashed worker
+PENDING_STALE_SECONDS = 90
+
+# Run size-bound pruning every N stored responses per process
+PRUNE_EVERY = 100
+
+_stores = count(1)
+
+
+def _has_body(request):
+    return request.META.get('CONTENT_LENGTH') not in (None, '', '0') or 'HTTP_TRANSFER_ENCODING' in request.META
+
+
+def _fingerprint(request):
+    """Hash of method, path and body, or None for a streaming upload"""
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(request.path.encode())
+    if (request.content_type or '').startswith('application/json'):
+        digest.update(request.body)
+    elif _has_body(request):
+        # Streaming uploads (CSV/multipart imports) are not buffered just to hash them,
+        # and a key that ignored the file would replay the first import for a new one
+        return None
+    return digest.hexdigest()
+
+
+def settle_later(response, future, render):
+    """Mark `response`, sent while `future` is still writing, so the key stays claimed:
+    retries get 409 until the write finishes, then the replay of `render(result)`.
+    A failed write releases the claim."""
+    response.pending_write = (future, render)
+    return response
+
+
+def _replay(record):
+    response = HttpResponse(bytes(record.content or b''), status=record.status_code,
+                            content_type=record.content_type or 'application/json')
+    response[REPLAY_HEADER] = 'true'
+    return response
+
+
+def prune(now=None):
+    """Drop expired records and trim the table to IDEMPOTENCY_MAX_ENTRIES"""
+    now = now or timezone.now()
+    IdempotencyRecord.objects.filter(expires_at__lte=now).delete()
+    overflow = IdempotencyRecord.objects.count() - settings.IDEMPOTENCY_MAX_ENTRIES
+    if overflow > 0:
+        oldest = IdempotencyRecord.objects.order_by('created_at').values_list('id', flat=True)[:overflow]
+        IdempotencyRecord.objects.filter(id__in=list(oldest)).delete()
+
+
+def _claim(key, path, fingerprint, now):
+    """Insert a pending record; return the existing one if the key is taken"""
+    expires_at = now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS)
+    try:
+        with transaction.atomic():
+            IdempotencyRecord.objects.create(key=key, path=path, fingerprint=fingerprint, expires_at=expires_at)
+        return None
+    except IntegrityError:
+        pass
+
+    existing = IdempotencyRecord.objects.filter(key=key, path=path).first()
+    if existing is None:
+        return _claim(key, path, fingerprint, now)
+
+    stale = existing.status_code is None and (now - existing.created_at).total_seconds() > PENDING_STALE_SECONDS
+    if existing.expires_at <= now or stale:
+        # Take over the slot; the conditional delete keeps concurrent takeovers safe
+        IdempotencyRecord.objects.filter(id=existing.id, created_at=existing.created_at).delete()
+        return _claim(key, path, fingerprint, now)
+    return existing
+
+
+class IdempotencyMiddleware:
+    """Replay stored responses for POSTs that repeat an Idempotency-Key"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = request.META.get(HEADER)
+        if request.method != 'POST' or not key or not request.path.startswith('/api/'):
+            return self.get_response(request)
+
+        if len(key) > 255:
+            return JsonResponse({'error': 'Idempotency-Key must be at most 255 characters'}, status=400)
+
+        now = timezone.now()
+        fingerprint = _fingerprint(request)
+        if fingerprint is None:
+            return JsonResponse({'error': 'Idempotency-Key is not supported for streaming uploads; '
+                                          're-importing the same file is already idempotent'}, status=400)
+        try:
+            existing = _claim(key, request.path, fingerprint, now)
+        except Exception:
+            # The store is an optimisation; never fail the write because of it
+            logger.exception("Idempotency store unavailable")
+            return self.get_response(request)
+
+        if existing is not None:
+            if existing.fingerprint != fingerprint:
+                return JsonResponse({'error': 'Idempotency-Key was already used with a different request'}, status=422)
+            if existing.status_code is None:
+                return JsonResponse({'error': 'A request with this Idempotency-Key is still in progress'}, status=409)
+            return _replay(existing)
+
+        response = self.get_response(request)
+        self._store(key, request.path, response)
+        return response
+
+    def _store(self, key, path, response):
+        pending = getattr(response, 'pending_write', None)
+        if pending is not None:
+            future, render = pending
+            future.add_done_callback(lambda f: self._settle(key, path, f, render))
+            return
+        try:
+            records = IdempotencyRecord.objects.filter(key=key, path=path)
+            # Server errors stay retryable, so release the claim instead
+            if response.status_code >= 500 or getattr(response, 'streaming', False):
+                records.delete()
+                return
+            records.update(status_code=response.status_code, content=response.content,
+                           content_type=response.get('Content-Type', ''))
+            if next(_stores) % PRUNE_EVERY == 0:
+                prune()
+        except Exception:
+            logger.exception("Failed to store idempotent response")
+
+    def _settle(self, key, path, future, render):
+        # Runs on the writer's thread once a deferred write finishes
+        if future.exception() is not None:
+            response = HttpResponse(status=500)
+        else:
+            try:
+                response = render(future.result())
+            except Exception:
+                logger.exception("Failed to render deferred idempotent response")
+                response = HttpResponse(status=500)
+        self._store(key, path, response)
@@ -0,0 +1,206 @@
+# Bulk registrant import for joined_participants
+# Rows are parsed from the request stream one at a time and written in chunked
+# upserts keyed on (seminar_id, participant_email), so re-imports are idempotent.
+# Emails are stripped and lowercased. A row only carries the columns it has a
+# value for, so re-importing a roster without names or metadata keeps the
+# stored ones; each chunk is upserted in groups of rows with the same columns.
+# New registrants take seats from the live counters first, like joins do; rows
+# that do not fit the seminar's capacity are reported instead of written.
+
+import csv
+import io
+import json
+import logging
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+
+from . import counters
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on per-row errors echoed back to the client
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportFormatError(Exception):
+    """Raised when the upload as a whole cannot be parsed"""
+
+
+class _ReadAdapter(io.RawIOBase):
+    """Expose any object with read(n) (HttpRequest, UploadedFile) as a raw stream"""
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk = self._fileobj.read(len(buffer))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+
+def _text_stream(fileobj):
+    """Wrap a binary file-like object for line-by-line text reading"""
+    return io.TextIOWrapper(io.BufferedReader(_ReadAdapter(fileobj)), encoding='utf-8-sig', newline='')
+
+
+def _iter_csv(fileobj):
+    reader = csv.DictReader(_text_stream(fileobj))
+    if not reader.fieldnames:
+        return
+    # Header is line 1, so data rows start at 2
+    for line_no, row in enumerate(reader, start=2):
+        yield line_no, {(k or '').strip(): v for k, v in row.items()}
+
+
+def _iter_ndjson(fileobj):
+    for line_no, line in enumerate(_text_stream(fileobj), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, ValueError(f'invalid JSON: {e.msg}')
+
+
+def _iter_json(fileobj):
+    try:
+        body = json.loads(fileobj.read().decode('utf-8') or '[]')
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise ImportFormatError(f'Invalid JSON in request body: {e}')
+    if isinstance(body, dict):
+        body = body.get('participants')
+    if not isinstance(body, list):
+        raise ImportFormatError('JSON body must be a list or {"participants": [...]}')
+    for index, item in enumerate(body, start=1):
+        yield index, item
+
+
+def iter_upload(request):
+    """Yield (row_number, row) pairs from a CSV, NDJSON or JSON upload.
+
+    Multipart uploads are read from the `file` field. CSV and NDJSON are
+    consumed incrementally; a plain JSON array has to be decoded in full.
+    """
+    content_type = (request.content_type or '').lower()
+    fileobj = request
+    name = ''
+    if content_type.startswith('multipart/'):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ImportFormatError('multipart upload must include a "file" field')
+        fileobj, name = upload, (upload.name or '').lower()
+        content_type = (upload.content_type or '').lower()
+
+    if 'csv' in content_type or name.endswith('.csv'):
+        return _iter_csv(fileobj)
+    if 'ndjson' in content_type or 'jsonlines' in content_type or name.endswith(('.ndjson', '.jsonl')):
+        return _iter_ndjson(fileobj)
+    if 'json' in content_type or name.endswith('.json'):
+        return _iter_json(fileobj)
+    raise ImportFormatError('Unsupported content type; send text/csv, application/x-ndjson or application/json')
+
+
+def validate_registrant(row, seminar_id):
+    """Return (payload, error) for a single upload row"""
+    if isinstance(row, Exception):
+        return None, str(row)
+    if not isinstance(row, dict):
+        return None, 'row must be an object'
+
+    email = (row.get('participant_email') or row.get('email') or '').strip().lower()
+    if not email:
+        return None, 'participant_email is required'
+    try:
+        validate_email(email)
+    except ValidationError:
+        return None, f'invalid email address: {email}'
+
+    name = row.get('participant_name') or row.get('name')
+    metadata = row.get('metadata')
+    if isinstance(metadata, str) and metadata.strip():
+        try:
+            metadata = json.loads(metadata)
+        except json.JSONDecodeError:
+            return None, 'metadata must be valid JSON'
+
+    payload = {'seminar_id': seminar_id, 'participant_email': email}
+    if isinstance(name, str) and name.strip():
+        payload['participant_name'] = name.strip()
+    if metadata:
+        payload['metadata'] = metadata
+    return payload, None
+
+
+def import_registrants(client, seminar_id, rows, chunk_size=500):
+    """Validate rows as they stream in and upsert them chunk by chunk.
+
+    Duplicate emails inside one chunk are collapsed (last row wins) because
+    Postgres rejects an upsert that touches the same row twice.
+    """
+    summary = {'received': 0, 'imported': 0, 'duplicates': 0, 'over_capacity': 0, 'failed': 0, 'chunks': 0,
+               'errors': []}
+
+    def record_error(row_no, message):
+        summary['failed'] += 1
+        if len(summary['errors']) < MAX_REPORTED_ERRORS:
+            summary['errors'].append({'row': row_no, 'error': message})
+
+    def flush(pending):
+        if not pending:
+            return
+        summary['chunks'] += 1
+        try:
+            existing = {r['participant_email'] for r in client.table('joined_participants').select('participant_email')
+                        .eq('seminar_id', seminar_id).in_('participant_email', list(pending)).execute().data or []}
+            new = [email for email in pending if email not in existing]
+            granted = counters.reserve_seats(client, seminar_id, len(new)) if new else 0
+        except Exception as e:
+            logger.exception("Capacity check failed for seminar %s", seminar_id)
+            for row_no, _ in pending.values():
+                record_error(row_no, f'capacity check failed: {e}')
+            return
+        for email in new[granted:]:
+            summary['over_capacity'] += 1
+            record_error(pending.pop(email)[0], 'seminar is at capacity')
+        seated = set(new[:granted])
+
+        # PostgREST sends the union of the keys as columns, so rows are grouped by key set
+        groups = {}
+        for row_no, payload in pending.values():
+            groups.setdefault(tuple(sorted(payload)), []).append((row_no, payload))
+        for group in groups.values():
+            try:
+                client.table('joined_participants').upsert(
+                    [payload for _, payload in group],
+                    on_conflict='seminar_id,participant_email',
+                ).execute()
+                summary['imported'] += len(group)
+            except Exception as e:
+                logger.exception("Bulk upsert failed for seminar %s", seminar_id)
+                counters.adjust(seminar_id, registered=-sum(p['participant_email'] in seated for _, p in group))
+                for row_no, _ in group:
+                    record_error(row_no, f'upsert failed: {e}')
+
+    pending = {}
+    for row_no, row in rows:
+        summary['received'] += 1
+        payload, error = validate_registrant(row, seminar_id)
+        if error:
+            record_error(row_no, error)
+            continue
+        key = payload['participant_email']
+        if key in pending:
+            summary['duplicates'] += 1
+        pending[key] = (row_no, payload)
+        if len(pending) >= chunk_size:
+            flush(pending)
+            pending = {}
+    flush(pending)
+
+    summary['errors_truncated'] = summary['failed'] > len(summary['errors'])
+    return summary
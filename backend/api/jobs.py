@@ -0,0 +1,323 @@
+# Background jobs backed by the local database
+# Long operations (exports, mass time-outs, ...) are queued as Job rows and run
+# by `manage.py run_jobs` outside the request cycle. Workers claim jobs with a
+# conditional UPDATE, so any number of worker threads and processes can share
+# the queue. Failed jobs are retried with exponential backoff; jobs whose worker
+# stopped heartbeating are requeued. Handlers report progress through their
+# JobContext, which is also where cancellation requests are noticed.
+#
+# Queue writes are retried while SQLite reports the database locked, like the
+# counters are. A worker thread that still hits an error logs it, backs off and
+# carries on, so one bad poll cannot stop the queue.
+
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections
+from django.db.models import Count, F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = 'queued', 'running', 'succeeded', 'failed', 'cancelled'
+STATUSES = (QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED)
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+# Progress is written at most this often (seconds) unless a job finishes a step
+PROGRESS_INTERVAL = 0.5
+HEARTBEAT_INTERVAL = 15
+LOCK_RETRIES = 10
+LOCK_RETRY_DELAY = 0.005
+LOCK_RETRY_MAX_DELAY = 0.2
+# Longest pause (seconds) after repeated worker loop errors
+MAX_ERROR_BACKOFF = 30
+
+HANDLERS = {}
+REQUIRED_PARAMS = {}
+
+
+def _retrying(fn):
+    """Run `fn`, retrying while SQLite reports the database locked or busy"""
+    for attempt in range(LOCK_RETRIES):
+        try:
+            return fn()
+        except OperationalError as e:
+            if ('locked' not in str(e) and 'busy' not in str(e)) or attempt == LOCK_RETRIES - 1:
+                raise
+            delay = min(LOCK_RETRY_DELAY * 2 ** attempt, LOCK_RETRY_MAX_DELAY)
+            time.sleep(random.uniform(delay / 2, delay))
+
+
+def _set(job, **fields):
+    return _retrying(lambda: Job.objects.filter(pk=job.pk).update(**fields))
+
+
+def handler(kind, required=()):
+    """Register `fn(ctx)` as the handler for jobs of `kind`"""
+    def register(fn):
+        HANDLERS[kind] = fn
+        REQUIRED_PARAMS[kind] = tuple(required)
+        return fn
+    return register
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler once cancellation has been requested"""
+
+
+class JobContext:
+    """What a handler sees: its params, the Supabase client and progress reporting"""
+
+    def __init__(self, job, client):
+        self.job = job
+        self.client = client
+        self.params = job.params or {}
+        self._written_at = 0.0
+
+    def progress(self, done, total=None, message=None):
+        """Record progress and stop here if the job has been cancelled"""
+        now = time.monotonic()
+        last_step = total is not None and done >= total
+        if now - self._written_at < PROGRESS_INTERVAL and not last_step:
+            return
+        self._written_at = now
+        fields = {'progress_done': done, 'heartbeat_at': timezone.now()}
+        if total is not None:
+            fields['progress_total'] = total
+        if message is not None:
+            fields['message'] = message[:255]
+        _set(self.job, **fields)
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if Job.objects.filter(pk=self.job.pk, cancel_requested=True).exists():
+            raise JobCancelled()
+
+
+def enqueue(kind, params=None, max_attempts=None):
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind '{kind}'. Available: {', '.join(sorted(HANDLERS))}")
+    missing = [name for name in REQUIRED_PARAMS[kind] if not (params or {}).get(name)]
+    if missing:
+        raise ValueError(f"{kind} requires params: {', '.join(missing)}")
+    return Job.objects.create(kind=kind, params=params or {}, run_after=timezone.now(),
+                              max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS)
+
+
+def cancel(job):
+    """Cancel a queued job now, or ask a running one to stop at its next progress report"""
+    now = timezone.now()
+    if not Job.objects.filter(pk=job.pk, status=QUEUED).update(status=CANCELLED, cancel_requested=True, finished_at=now):
+        Job.objects.filter(pk=job.pk, status=RUNNING).update(cancel_requested=True)
+    job.refresh_from_db()
+    return job
+
+
+def claim(worker_id):
+    """Take the next runnable job, or return None"""
+    now = timezone.now()
+    for _ in range(5):
+        job = _retrying(lambda: Job.objects.filter(status=QUEUED, run_after__lte=now).order_by('run_after', 'id').first())
+        if job is None:
+            return None
+        # Only one claimant can move the row out of 'queued'
+        claimed = _retrying(lambda: Job.objects.filter(pk=job.pk, status=QUEUED).update(
+            status=RUNNING, worker=worker_id, attempts=F('attempts') + 1,
+            started_at=Coalesce('started_at', now), heartbeat_at=now))
+        if claimed:
+            _retrying(job.refresh_from_db)
+            return job
+    return None
+
+
+def requeue_stale():
+    """Return jobs whose worker stopped heartbeating to the queue"""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_STALE_SECONDS)
+    stale = Job.objects.filter(status=RUNNING, heartbeat_at__lt=cutoff)
+    failed = _retrying(lambda: stale.filter(attempts__gte=F('max_attempts')).update(
+        status=FAILED, error='worker stopped responding', finished_at=timezone.now()))
+    requeued = _retrying(lambda: stale.update(status=QUEUED, run_after=timezone.now(), worker=''))
+    if failed or requeued:
+        logger.warning("Requeued %s and failed %s stale job(s)", requeued, failed)
+    return requeued
+
+
+def execute(job, client):
+    """Run one claimed job to completion, retry or cancellation"""
+    ctx = JobContext(job, client)
+    started = time.monotonic()
+    try:
+        result = HANDLERS[job.kind](ctx)
+    except JobCancelled:
+        _set(job, status=CANCELLED, finished_at=timezone.now(), message='cancelled')
+        logger.info("Job %s (%s) cancelled", job.pk, job.kind)
+        return CANCELLED
+    except Exception as e:
+        if job.attempts < job.max_attempts:
+            delay = settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+            _set(job, status=QUEUED, error=str(e), worker='', run_after=timezone.now() + timedelta(seconds=delay))
+            logger.warning("Job %s (%s) attempt %s failed: %s; retrying in %ss", job.pk, job.kind, job.attempts, e, delay)
+            return QUEUED
+        _set(job, status=FAILED, error=str(e), finished_at=timezone.now())
+        logger.exception("Job %s (%s) failed after %s attempt(s)", job.pk, job.kind, job.attempts)
+        return FAILED
+    _set(job, status=SUCCEEDED, result=result, error='', finished_at=timezone.now(),
+         progress_done=Coalesce('progress_total', 'progress_done'))
+    logger.info("Job %s (%s) succeeded in %.2fs", job.pk, job.kind, time.monotonic() - started)
+    return SUCCEEDED
+
+
+def as_dict(job):
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'params': job.params,
+        'status': job.status,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'progress': {
+            'done': job.progress_done,
+            'total': job.progress_total,
+            'fraction': round(job.progress_done / job.progress_total, 4) if job.progress_total else None,
+            'message': job.message,
+        },
+        'result': job.result,
+        'error': job.error or None,
+        'cancel_requested': job.cancel_requested,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+
+    def pick(q):
+        return round(values[min(len(values) - 1, int(q * len(values)))], 3)
+    return {'mean': round(sum(values) / len(values), 3), 'p50': pick(0.5), 'p95': pick(0.95), 'max': round(values[-1], 3)}
+
+
+def stats(window_seconds=3600):
+    """Queue depth, throughput and queue latency over the last `window_seconds`"""
+    now = timezone.now()
+    counts = dict.fromkeys(STATUSES, 0)
+    counts.update(Job.objects.order_by().values_list('status').annotate(n=Count('id')))
+    oldest = Job.objects.filter(status=QUEUED).order_by('created_at').values_list('created_at', flat=True).first()
+    finished = Job.objects.filter(finished_at__gte=now - timedelta(seconds=window_seconds)) \
+        .exclude(started_at=None).values_list('created_at', 'started_at', 'finished_at')
+    waits = [(started - created).total_seconds() for created, started, _ in finished]
+    runs = [(done - started).total_seconds() for _, started, done in finished]
+    return {
+        'counts': counts,
+        'oldest_queued_seconds': round((now - oldest).total_seconds(), 3) if oldest else None,
+        'window_seconds': window_seconds,
+        'finished': len(runs),
+        'throughput_per_minute': round(len(runs) * 60 / window_seconds, 3),
+        'queue_latency_seconds': _percentiles(waits),
+        'run_seconds': _percentiles(runs),
+    }
+
+
+class Worker:
+    """Run queued jobs on `concurrency` threads until stopped"""
+
+    def __init__(self, client, concurrency=1, poll_interval=1.0, name=None):
+        self.client = client
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        # Jobs being executed right now; only these are kept alive by the heartbeat
+        self._running = set()
+        self._running_lock = threading.Lock()
+
+    def run_pending(self):
+        """Run jobs on the calling thread until none are runnable; returns how many ran"""
+        ran = 0
+        while True:
+            job = claim(self.name)
+            if job is None:
+                return ran
+            self._execute(job)
+            ran += 1
+
+    def _execute(self, job):
+        with self._running_lock:
+            self._running.add(job.pk)
+        try:
+            return execute(job, self.client)
+        finally:
+            with self._running_lock:
+                self._running.discard(job.pk)
+
+    def _backoff(self, stop, failures, what):
+        delay = min(self.poll_interval * 2 ** failures, MAX_ERROR_BACKOFF)
+        logger.exception("Job worker %s: %s failed; retrying in %.1fs", self.name, what, delay)
+        # A broken connection is replaced on the next query
+        close_old_connections()
+        stop.wait(delay)
+
+    def _loop(self, stop):
+        failures = 0
+        try:
+            while not stop.is_set():
+                try:
+                    job = claim(self.name)
+                    if job is None:
+                        stop.wait(self.poll_interval)
+                        continue
+                    # A job whose final status write failed stops heartbeating and is requeued as stale
+                    self._execute(job)
+                    failures = 0
+                except Exception:
+                    failures += 1
+                    self._backoff(stop, failures, 'poll')
+        finally:
+            close_old_connections()
+
+    def _heartbeat(self, stop):
+        failures = 0
+        try:
+            while not stop.wait(HEARTBEAT_INTERVAL):
+                try:
+                    with self._running_lock:
+                        running = list(self._running)
+                    if running:
+                        _retrying(lambda: Job.objects.filter(pk__in=running, status=RUNNING)
+                                  .update(heartbeat_at=timezone.now()))
+                    requeue_stale()
+                    failures = 0
+                except Exception:
+                    failures += 1
+                    self._backoff(stop, failures, 'heartbeat')
+        finally:
+            close_old_connections()
+
+    def run(self, stop=None):
+        stop = stop or threading.Event()
+        requeue_stale()
+        threads = [threading.Thread(target=self._heartbeat, args=(stop,), name='jobs-heartbeat', daemon=True)]
+        threads += [threading.Thread(target=self._loop, args=(stop,), name=f'jobs-{i}', daemon=True)
+                    for i in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(t.is_alive() for t in threads):
+                for thread in threads:
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            logger.info("Stopping once running jobs finish")
+            stop.set()
+            for thread in threads:
+                thread.join()
@@ -0,0 +1,227 @@
+# Logging off the request path
+# The handler configured in LOGGING only puts records on a bounded queue; one
+# writer thread per process formats them and writes the console and a
+# size-rotated log file. Each process (gunicorn worker, job runner) writes its
+# own file, named with its pid, since RotatingFileHandler rotation is not safe
+# across processes sharing one file. A full queue drops records, and counts them, rather
+# than blocking a request. Records from upstream failures (a Supabase outage
+# logs one traceback per request) are sampled per call site. Every record
+# carries the id of the request that produced it (X-Request-Id), in text or
+# JSON output (LOG_FORMAT).
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+REQUEST_ID_HEADER = 'X-Request-Id'
+_VALID_REQUEST_ID = re.compile(r'^[\w.:-]{1,128}$')
+
+TEXT_FORMATS = {
+    'console': '{levelname} [{request_id}] {message}',
+    'file': '{levelname} {asctime} {name} {process:d} {thread:d} [{request_id}] {message}',
+}
+
+request_id = contextvars.ContextVar('request_id', default='-')
+
+stats = {'dropped': 0, 'sampled_out': 0}
+_handlers = []
+
+# Arguments of these types cannot change after the logging call returns, so
+# formatting them is left to the writer thread
+_IMMUTABLE = (str, int, float, bool, type(None))
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+def _formatter(fmt, target):
+    if fmt == 'json':
+        return JsonFormatter()
+    return logging.Formatter(TEXT_FORMATS[target], style='{')
+
+
+class UpstreamSampler(logging.Filter):
+    """Lets through the first `burst` upstream-failure records per call site in each
+    `window` seconds; the next record let through reports how many were dropped"""
+
+    def __init__(self, window=10, burst=5, loggers=('api.upstream', 'api.routing')):
+        super().__init__()
+        self.window = float(window)
+        self.burst = int(burst)
+        self.loggers = tuple(loggers)
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def _is_upstream(self, record):
+        if record.name in self.loggers:
+            return True
+        exc = record.exc_info[1] if record.exc_info else None
+        if exc is None:
+            return False
+        from .upstream import is_upstream_failure
+        return is_upstream_failure(exc)
+
+    def filter(self, record):
+        if self.burst <= 0 or record.levelno < logging.WARNING or not self._is_upstream(record):
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window:
+                site = self._sites[key] = [now, 0, site[2] if site else 0]
+            if site[1] >= self.burst:
+                site[2] += 1
+                stats['sampled_out'] += 1
+                return False
+            site[1] += 1
+            suppressed, site[2] = site[2], 0
+        if suppressed:
+            note = f' [{suppressed} similar record(s) suppressed]'
+            if isinstance(record.args, tuple) and record.args:
+                record.msg = f'{record.msg}%s'
+                record.args = record.args + (note,)
+            else:
+                record.msg = f'{record.getMessage()}{note}'
+                record.args = None
+        return True
+
+
+def process_filename(filename, pid=None):
+    """`filename` with the process id before the extension: debug.log -> debug.1234.log"""
+    root, ext = os.path.splitext(filename)
+    return f'{root}.{pid or os.getpid()}{ext}'
+
+
+class BackgroundHandler(logging.handlers.QueueHandler):
+    """Queues records for a writer thread that writes the console and a rotating file"""
+
+    def __init__(self, filename=None, max_bytes=10 * 1024 * 1024, backup_count=5, fmt='text',
+                 console_level='INFO', file_level='DEBUG', queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        self.queue_size = queue_size
+        self._reported = 0
+        self.dropped = 0
+        console = logging.StreamHandler()
+        console.setLevel(console_level)
+        console.setFormatter(_formatter(fmt, 'console'))
+        self.targets = [console]
+        self._file_options = (filename, max_bytes, backup_count, fmt, file_level)
+        if filename:
+            os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+            self.targets.append(self._file_target())
+        self.listener = logging.handlers.QueueListener(self.queue, *self.targets, respect_handler_level=True)
+        self.listener.start()
+        _handlers.append(self)
+        atexit.register(self.stop)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._restart_in_child)
+
+    def _file_target(self):
+        filename, max_bytes, backup_count, fmt, file_level = self._file_options
+        rotating = logging.handlers.RotatingFileHandler(process_filename(filename), maxBytes=max_bytes,
+                                                        backupCount=backup_count, encoding='utf-8', delay=True)
+        rotating.setLevel(file_level)
+        rotating.setFormatter(_formatter(fmt, 'file'))
+        return rotating
+
+    def prepare(self, record):
+        # Unlike QueueHandler.prepare, nothing is formatted here unless it has to
+        # be: mutable arguments are merged now, tracebacks on the writer thread
+        record = copy.copy(record)
+        if not hasattr(record, 'request_id'):
+            record.request_id = request_id.get()
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(a, _IMMUTABLE) for a in args)):
+            record.msg, record.args = record.getMessage(), None
+        return record
+
+    def enqueue(self, record):
+        # Called under the handler lock, so the counters need no lock of their own
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            stats['dropped'] += 1
+            return
+        if self.dropped > self._reported:
+            missed, self._reported = self.dropped - self._reported, self.dropped
+            try:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                    'msg': 'Log queue full: dropped %d record(s)', 'args': (missed,), 'request_id': '-'}))
+            except queue.Full:
+                pass
+
+    def stop(self):
+        """Write out everything queued and stop the writer thread"""
+        if self.listener._thread is not None:
+            self.listener.stop()
+        for target in self.targets:
+            target.close()
+
+    def _restart_in_child(self):
+        # The writer thread does not survive fork; records queued in the parent are its to write
+        self.queue = queue.Queue(self.queue_size)
+        self.listener.queue = self.queue
+        if self._file_options[0]:
+            # The parent's file is the parent's to rotate; the child gets one named with its own pid
+            self.targets[-1] = self._file_target()
+            self.listener.handlers = tuple(self.targets)
+        self.listener._thread = None
+        self.listener.start()
+
+
+def snapshot():
+    return {
+        'queued': sum(h.queue.qsize() for h in _handlers),
+        'dropped': stats['dropped'],
+        'sampled_out': stats['sampled_out'],
+    }
+
+
+class RequestIdMiddleware:
+    """Gives every request an id (the caller's X-Request-Id if valid) for its log records"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rid = request.headers.get(REQUEST_ID_HEADER, '')
+        if not _VALID_REQUEST_ID.match(rid):
+            rid = uuid.uuid4().hex
+        request.request_id = rid
+        token = request_id.set(rid)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_id.reset(token)
+        response[REQUEST_ID_HEADER] = rid
+        return response
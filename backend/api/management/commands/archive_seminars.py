@@ -0,0 +1,84 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import analytics, archive, counters, views
+from api.cache_utils import bump
+from api.delta import parse_timestamp
+
+# Hot rows are deleted by id in chunks of this size, keeping the filter URL short
+DELETE_CHUNK = 200
+
+
+class Command(BaseCommand):
+    help = 'Move attendance, participant and evaluation rows of old seminars into the cold archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.ARCHIVE_AFTER_DAYS,
+                            help='Archive seminars that ended at least this many days ago')
+        parser.add_argument('--seminar', action='append', default=[], help='Archive only these seminar ids')
+        parser.add_argument('--dry-run', action='store_true', help='List candidates without archiving')
+        hot = parser.add_mutually_exclusive_group()
+        hot.add_argument('--keep-hot', dest='delete_hot', action='store_false',
+                         help='Write the archive but keep the Supabase rows (the default)')
+        hot.add_argument('--delete-hot', dest='delete_hot', action='store_true',
+                         help='Delete the archived rows from Supabase; needs a persistent ARCHIVE_DIR')
+        parser.set_defaults(delete_hot=False)
+
+    def _candidates(self, client, opts):
+        cutoff = datetime.now(timezone.utc) - timedelta(days=opts['older_than_days'])
+        seminars = analytics.fetch_all(lambda: client.table('seminars').select('id,title,date,end_datetime').order('id'))
+        for seminar in seminars:
+            if opts['seminar'] and seminar['id'] not in opts['seminar']:
+                continue
+            if archive.is_archived(seminar['id']):
+                continue
+            ended = seminar.get('end_datetime') or seminar.get('date')
+            if opts['seminar'] or (ended and parse_timestamp(ended) < cutoff):
+                yield seminar
+
+    def handle(self, *args, **opts):
+        if archive.pa is None:
+            raise CommandError('pyarrow is required for archiving. Run pip install -r requirements.txt.')
+        if opts['delete_hot'] and not opts['dry_run'] and _inside(settings.ARCHIVE_DIR, settings.BASE_DIR):
+            raise CommandError(f'ARCHIVE_DIR ({settings.ARCHIVE_DIR}) is inside the application directory, which is '
+                               'replaced on every deploy. Point ARCHIVE_DIR at a persistent volume before --delete-hot.')
+        client = views.sb
+        if client is None:
+            raise CommandError('Supabase service client not configured. Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY.')
+
+        archived = 0
+        for seminar in self._candidates(client, opts):
+            seminar_id = seminar['id']
+            label = f"{seminar_id} ({seminar.get('title') or 'untitled'}, {seminar.get('date') or 'no date'})"
+            if opts['dry_run']:
+                self.stdout.write(f'would archive {label}')
+                continue
+
+            tables = {
+                table: analytics.fetch_all(lambda t=table: client.table(t).select('*').eq('seminar_id', seminar_id).order('id'))
+                for table in archive.ARCHIVED_TABLES
+            }
+            manifest = archive.write_archive(seminar_id, tables)
+            if opts['delete_hot']:
+                # Only the rows that made it into the archive; rows written since stay hot
+                for table, rows in tables.items():
+                    ids = [r['id'] for r in rows]
+                    for i in range(0, len(ids), DELETE_CHUNK):
+                        client.table(table).delete().in_('id', ids[i:i + DELETE_CHUNK]).execute()
+            analytics.invalidate(seminar_id)
+            counters.forget(seminar_id)
+            archived += 1
+            counts = ', '.join(f'{t}={n}' for t, n in manifest['row_counts'].items())
+            self.stdout.write(f'archived {label}: {counts}')
+
+        if archived:
+            bump('participants')
+        self.stdout.write(self.style.SUCCESS(f'{archived} seminar(s) archived to {settings.ARCHIVE_DIR}'))
+
+
+def _inside(path, root):
+    path, root = os.path.realpath(path), os.path.realpath(root)
+    return os.path.commonpath([path, root]) == root
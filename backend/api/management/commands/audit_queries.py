@@ -0,0 +1,152 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import query_audit
+
+try:
+    import psycopg
+    from psycopg.rows import dict_row
+except Exception:
+    psycopg = None
+
+SCRIPTS_DIR = settings.BASE_DIR.parent / 'scripts'
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN ANALYZE every query shape the API issues against synthetic data and report missing indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dsn', default=os.environ.get('AUDIT_DATABASE_URL'),
+                            help='Local Postgres to audit against (default: $AUDIT_DATABASE_URL). Never production.')
+        parser.add_argument('--schema', default='query_audit', help='Scratch schema, dropped and recreated')
+        parser.add_argument('--seminars', type=int, default=200, help='Synthetic seminars to generate')
+        parser.add_argument('--per-seminar', type=int, default=250, help='Registrations per seminar')
+        parser.add_argument('--shape', action='append', default=[], help='Audit only these shape names')
+        parser.add_argument('--list', action='store_true', help='Print the shape catalogue and SQL, then exit')
+        parser.add_argument('--verify', action='store_true',
+                            help='Apply the recommended indexes in the scratch schema and re-run the affected shapes')
+        parser.add_argument('--ddl-out', help='Also write the recommended DDL to this file')
+        parser.add_argument('--keep', action='store_true', help='Keep the scratch schema afterwards')
+        parser.add_argument('--fail-on-findings', action='store_true',
+                            help='Exit non-zero on any sequential scan or missing index (for CI)')
+
+    def _shapes(self, opts):
+        shapes = [s for s in query_audit.SHAPES if not opts['shape'] or s.name in opts['shape']]
+        unknown = set(opts['shape']) - {s.name for s in shapes}
+        if unknown:
+            raise CommandError(f"Unknown shape(s): {', '.join(sorted(unknown))}")
+        return shapes
+
+    def _load(self, cur, opts):
+        schema = opts['schema']
+        cur.execute(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE')
+        cur.execute(f'CREATE SCHEMA "{schema}"')
+        cur.execute(f'SET search_path TO "{schema}", public')
+        for name in query_audit.SCHEMA_SCRIPTS:
+            cur.execute((SCRIPTS_DIR / name).read_text())
+        params = {
+            'seminars': opts['seminars'],
+            'per_seminar': opts['per_seminar'],
+            'pool': max(opts['per_seminar'], opts['seminars'] * opts['per_seminar'] // 5),
+        }
+        for statement in query_audit.SYNTHETIC_DATA.split(';\n'):
+            if statement.strip():
+                cur.execute(statement, params)
+        cur.execute('ANALYZE')
+
+    def _samples(self, cur):
+        samples = {}
+        for table in ('joined_participants', 'attendance', 'evaluations', 'seminars'):
+            cur.execute(query_audit.SAMPLE_QUERIES[table])
+            samples[table] = cur.fetchone()
+        seminar_id = samples['attendance']['seminar_id']
+        cur.execute(query_audit.SAMPLE_QUERIES['change_log'], {'seminar_id': seminar_id})
+        samples['change_log'] = cur.fetchone()
+
+        def ids(sql, *params):
+            cur.execute(sql, params)
+            return [row['id'] for row in cur.fetchall()]
+
+        in_window = ids('SELECT id FROM seminars WHERE date >= %s', samples['seminars']['date__from'])
+        samples['many'] = {
+            ('seminars', 'id'): ids('SELECT seminar_id AS id FROM joined_participants WHERE participant_email = %s',
+                                    samples['joined_participants']['participant_email']),
+            ('attendance', 'id'): ids('SELECT id FROM attendance WHERE seminar_id = %s LIMIT 200', seminar_id),
+            ('attendance', 'seminar_id'): in_window,
+            ('joined_participants', 'seminar_id'): in_window,
+        }
+        return samples
+
+    def _indexes(self, cur):
+        cur.execute(query_audit.INDEX_QUERY)
+        indexes = {}
+        for row in cur.fetchall():
+            indexes.setdefault(row['table_name'], {})[row['index_name']] = list(row['columns'])
+        return indexes
+
+    def _explain(self, cur, shape, samples):
+        sql = 'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + query_audit.to_sql(shape)
+        params = query_audit.params_for(shape, samples)
+        # The second run reports warm-cache timings
+        for _ in range(2):
+            cur.execute(sql, params)
+            plan = next(iter(cur.fetchone().values()))
+        return plan
+
+    def _print(self, report):
+        shape = report['shape']
+        if report['seq_scan']:
+            status = self.style.ERROR('SEQ SCAN')
+        elif report['ddl']:
+            status = self.style.WARNING('NO INDEX')
+        else:
+            status = self.style.SUCCESS('ok')
+        access = ', '.join(report['indexes']) or ' > '.join(dict.fromkeys(report['nodes']))
+        self.stdout.write(f"{status:<8} {shape.name:<36} {report['total_ms']:>9.3f} ms  {access}")
+        if report['seq_scan'] or report['ddl']:
+            self.stdout.write(f"         used by {shape.used_by}: {query_audit.to_sql(shape)}")
+
+    def handle(self, *args, **opts):
+        shapes = self._shapes(opts)
+        if opts['list']:
+            for shape in shapes:
+                self.stdout.write(f"{shape.name} ({shape.used_by})\n  {query_audit.to_sql(shape)}")
+            return
+        if psycopg is None:
+            raise CommandError('psycopg is required. Run pip install "psycopg[binary]".')
+        if not opts['dsn']:
+            raise CommandError('Pass --dsn or set AUDIT_DATABASE_URL to a local Postgres.')
+
+        with psycopg.connect(opts['dsn'], autocommit=True, row_factory=dict_row) as conn, conn.cursor() as cur:
+            self.stdout.write(f"Loading schema and {opts['seminars']} x {opts['per_seminar']} synthetic registrations...")
+            self._load(cur, opts)
+            samples = self._samples(cur)
+            indexes = self._indexes(cur)
+            reports = [query_audit.audit(shape, self._explain(cur, shape, samples), indexes) for shape in shapes]
+            for report in reports:
+                self._print(report)
+
+            ddl = query_audit.recommended_ddl(reports)
+            if ddl:
+                self.stdout.write('\n-- Recommended indexes\n' + '\n'.join(ddl))
+                if opts['ddl_out']:
+                    with open(opts['ddl_out'], 'w') as fh:
+                        fh.write('\n'.join(ddl) + '\n')
+            if ddl and opts['verify']:
+                self.stdout.write('\nAfter applying them:')
+                for statement in ddl:
+                    cur.execute(statement)
+                cur.execute('ANALYZE')
+                indexes = self._indexes(cur)
+                for report in reports:
+                    if report['seq_scan'] or report['ddl']:
+                        self._print(query_audit.audit(report['shape'], self._explain(cur, report['shape'], samples), indexes))
+            if not opts['keep']:
+                cur.execute(f'DROP SCHEMA IF EXISTS "{opts["schema"]}" CASCADE')
+
+        findings = sum(1 for r in reports if r['seq_scan'] or r['ddl'])
+        self.stdout.write(f'\n{len(reports)} shape(s) audited, {findings} finding(s)')
+        if findings and opts['fail_on_findings']:
+            raise CommandError(f'{findings} query shape(s) without a suitable index')
@@ -0,0 +1,80 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.batching import MicroBatcher
+from api.fakes import FakeSupabaseClient
+
+
+class Command(BaseCommand):
+    help = 'Simulate an end-of-seminar evaluation spike with and without micro-batching'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--submissions', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=2,
+                            help='Worker processes, each with its own batcher (gunicorn --workers)')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Concurrent request threads per worker (gunicorn --threads)')
+        parser.add_argument('--latency-ms', type=float, default=40, help='Simulated upstream round trip')
+        parser.add_argument('--upstream-slots', type=int, default=8,
+                            help='Concurrent upstream requests the database pool can serve')
+        parser.add_argument('--window-ms', type=float, default=settings.EVALUATION_BATCH_WINDOW_MS or 5)
+        parser.add_argument('--max-size', type=int, default=settings.EVALUATION_BATCH_MAX_SIZE)
+
+    def _run(self, opts, window):
+        client = FakeSupabaseClient(latency=opts['latency_ms'] / 1000.0)
+        slots = threading.Semaphore(opts['upstream_slots'])
+
+        def insert(rows):
+            with slots:
+                return client.table('evaluations').insert(rows).execute().data
+
+        writers = [
+            MicroBatcher(lambda rows: [[r] for r in insert(rows)], insert, window=window, max_size=opts['max_size'])
+            for _ in range(opts['workers'])
+        ]
+        payloads = [
+            {'seminar_id': 'bench', 'participant_email': f'user{i}@example.com', 'answers': {'q1': i % 5}}
+            for i in range(opts['submissions'])
+        ]
+        latencies = []
+
+        def serve(writer, share):
+            # One gunicorn worker: its own batcher and request threads
+            with ThreadPoolExecutor(max_workers=opts['concurrency']) as pool:
+                list(pool.map(lambda payload: submit(writer, payload), share))
+
+        def submit(writer, payload):
+            start = time.perf_counter()
+            writer.submit(payload)
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=opts['workers']) as workers:
+            list(workers.map(serve, writers, [payloads[i::opts['workers']] for i in range(opts['workers'])]))
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        return {
+            'elapsed': elapsed,
+            'throughput': len(payloads) / elapsed,
+            'p50_ms': latencies[len(latencies) // 2] * 1000,
+            'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+            'upstream_calls': len(client.calls),
+            'rows': len(client.tables['evaluations']),
+        }
+
+    def handle(self, *args, **opts):
+        self.stdout.write(
+            f"{opts['submissions']} submissions, {opts['workers']} workers x {opts['concurrency']} threads, "
+            f"{opts['latency_ms']:.0f} ms upstream latency, {opts['upstream_slots']} upstream slots"
+        )
+        for label, window in (('unbatched', 0), (f"batched ({opts['window_ms']:g} ms window)", opts['window_ms'] / 1000.0)):
+            r = self._run(opts, window)
+            self.stdout.write(
+                f"  {label:<28} {r['throughput']:8.1f} req/s  p50 {r['p50_ms']:6.1f} ms  "
+                f"p99 {r['p99_ms']:6.1f} ms  upstream calls {r['upstream_calls']:4d}  rows {r['rows']}"
+            )
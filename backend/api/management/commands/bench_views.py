@@ -0,0 +1,54 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import microbench
+
+
+class Command(BaseCommand):
+    help = 'Time view-layer helpers and a list view against synthetic data, offline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=list(microbench.DEFAULT_SIZES),
+                            help='Synthetic dataset sizes, in registrant rows')
+        parser.add_argument('--only', nargs='+', choices=sorted(microbench.BENCHMARKS), help='Benchmarks to run')
+        parser.add_argument('--budget', type=float, default=microbench.DEFAULT_BUDGET,
+                            help='Seconds of timed runs per benchmark and size')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', dest='json_out', help='Write results to this file')
+        parser.add_argument('--compare', help='Baseline results file from an earlier --json run')
+        parser.add_argument('--threshold', type=float, default=0.10,
+                            help='Relative growth over the baseline reported as a regression')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **opts):
+        baseline = None
+        if opts['compare']:
+            try:
+                with open(opts['compare']) as fh:
+                    baseline = json.load(fh)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline {opts['compare']}: {e}")
+
+        self.stdout.write(f"{'benchmark':<22} {'rows':>7} {'runs':>5} {'min ms':>10} {'p50 ms':>10} "
+                          f"{'peak KiB':>10} {'held KiB':>10} {'blocks':>8}")
+
+        def progress(name, size, r):
+            self.stdout.write(f"{name:<22} {size:>7} {r['runs']:>5} {r['min_ms']:>10.3f} {r['p50_ms']:>10.3f} "
+                              f"{r['peak_kib']:>10.1f} {r['retained_kib']:>10.1f} {r['blocks']:>8}")
+
+        results = microbench.run(opts['sizes'], opts['only'], opts['budget'], opts['seed'], progress)
+        if opts['json_out']:
+            with open(opts['json_out'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(f"Results written to {opts['json_out']}")
+        if baseline is None:
+            return
+
+        regressions = microbench.compare(results, baseline, opts['threshold'])
+        for name, size, metric, old, new in regressions:
+            self.stdout.write(self.style.WARNING(f"  regression: {name} at {size} rows, {metric} {old} -> {new}"))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS(f"No regressions over {opts['threshold']:.0%} against {opts['compare']}"))
+        elif opts['fail_on_regression']:
+            raise CommandError(f"{len(regressions)} regression(s) against {opts['compare']}")
@@ -0,0 +1,35 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import jobs, tasks, views  # noqa: F401  (tasks registers the handlers)
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.JOB_WORKER_CONCURRENCY,
+                            help='Jobs run at once by this process')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds between queue polls when idle')
+        parser.add_argument('--once', action='store_true', help='Run every runnable job, then exit')
+
+    def handle(self, *args, **opts):
+        if views.sb is None:
+            raise CommandError('Supabase service client not configured. Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY.')
+        worker = jobs.Worker(views.sb, concurrency=opts['concurrency'], poll_interval=opts['poll'])
+
+        if opts['once']:
+            jobs.requeue_stale()
+            ran = worker.run_pending()
+            self.stdout.write(self.style.SUCCESS(f'{ran} job(s) run'))
+            return
+
+        stop = threading.Event()
+        # docker stop sends SIGTERM: finish the running jobs, claim no new ones
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        self.stdout.write(f"Job worker {worker.name} running {opts['concurrency']} at a time "
+                          f"({', '.join(sorted(jobs.HANDLERS))})")
+        worker.run(stop)
@@ -0,0 +1,192 @@
+# View-layer micro-benchmarks
+# Times the request-handling helpers in views.py (body parsing, seminar
+# validation and payload construction, response encoding) and one list view
+# end to end against the in-memory fake, at several synthetic dataset sizes.
+# Each benchmark reports wall-clock timings and, from a separate traced run,
+# allocation figures, so results can be saved as JSON and compared between
+# releases. Everything runs offline; the default sizes finish in under a
+# minute on one core.
+
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import django
+from django.test import RequestFactory, override_settings
+
+from . import synthetic, views
+from .fakes import FakeSupabaseClient
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_BUDGET = 0.5
+MIN_RUNS = 3
+MAX_RUNS = 1000
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Register `setup(data)`, which returns the zero-argument callable to time"""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+class Data:
+    """Synthetic tables for one size, with the derived inputs benchmarks share"""
+
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.tables = synthetic.dataset(size, seed=seed)
+        rng = random.Random(seed)
+        self.seminar_bodies = [synthetic.seminar_body(rng, i) for i in range(size)]
+        self.seminar_id = self.tables['seminars'][0]['id']
+        self.factory = RequestFactory()
+
+    def client(self):
+        return FakeSupabaseClient({name: list(rows) for name, rows in self.tables.items()})
+
+
+@benchmark('parse_json_body')
+def _parse_json_body(data):
+    body = json.dumps({'participants': data.tables['joined_participants']})
+    request = data.factory.post('/api/bench/', data=body, content_type='application/json')
+    # Read the stream once (past the upload limit the larger sizes exceed);
+    # later calls decode and parse the cached bytes
+    with override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=None):
+        request.body
+    return lambda: views._parse_json_body(request)
+
+
+@benchmark('validate_seminar_data')
+def _validate_seminar_data(data):
+    bodies = data.seminar_bodies
+    return lambda: [views._validate_seminar_data(body, is_create=True) for body in bodies]
+
+
+@benchmark('seminar_payload')
+def _seminar_payload(data):
+    bodies = data.seminar_bodies
+    return lambda: [views._seminar_payload(body) for body in bodies]
+
+
+@benchmark('success_response')
+def _success_response(data):
+    rows = data.tables['joined_participants']
+    return lambda: views._success(rows)
+
+
+@benchmark('delta_response')
+def _delta_response(data):
+    rows = data.tables['attendance']
+    return lambda: views._delta_success(rows, 'attendance', None)
+
+
+@benchmark('fake_select')
+def _fake_select(data):
+    # The upstream half of attendance_list_view, to separate it from view overhead
+    client = data.client()
+
+    def run():
+        client.calls.clear()
+        return client.table('attendance').select('*').eq('seminar_id', data.seminar_id).order('created_at').execute()
+    return run
+
+
+@benchmark('attendance_list_view')
+def _attendance_list_view(data):
+    client = data.client()
+    request = data.factory.get(f'/api/seminars/{data.seminar_id}/attendance/')
+
+    def run():
+        client.calls.clear()
+        saved, views.sb = views.sb, client
+        try:
+            return views.seminar_attendance_list(request, data.seminar_id)
+        finally:
+            views.sb = saved
+    return run
+
+
+def _time(fn, budget):
+    timings = []
+    deadline = time.perf_counter() + budget
+    while len(timings) < MIN_RUNS or (time.perf_counter() < deadline and len(timings) < MAX_RUNS):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)
+
+
+def _allocations(fn):
+    """Peak traced memory of one call, and memory and pymalloc blocks still held by its result"""
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        result = fn()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    held = sys.getallocatedblocks() - blocks
+    del result
+    return {'peak_kib': round((peak - base) / 1024, 1), 'retained_kib': round((current - base) / 1024, 1),
+            'blocks': held}
+
+
+def run(sizes=DEFAULT_SIZES, names=None, budget=DEFAULT_BUDGET, seed=0, progress=None):
+    """Run the benchmarks; results are keyed by benchmark name, then by size"""
+    results = {}
+    for size in sizes:
+        data = Data(size, seed)
+        for name, setup in BENCHMARKS.items():
+            if names and name not in names:
+                continue
+            fn = setup(data)
+            fn()  # warm-up
+            timings = _time(fn, budget)
+            result = {
+                'runs': len(timings),
+                'min_ms': round(timings[0] * 1000, 4),
+                'p50_ms': round(timings[len(timings) // 2] * 1000, 4),
+                'mean_ms': round(sum(timings) / len(timings) * 1000, 4),
+                **_allocations(fn),
+            }
+            results.setdefault(name, {})[str(size)] = result
+            if progress:
+                progress(name, size, result)
+        del data
+    return {
+        'meta': {'python': platform.python_version(), 'django': django.get_version(),
+                 'machine': platform.machine(), 'seed': seed, 'budget_seconds': budget},
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold=0.10):
+    """Benchmarks whose min time or held blocks grew by more than `threshold` over `baseline`.
+
+    Returns (name, size, metric, baseline value, current value) tuples.
+    Benchmarks or sizes missing from either side are ignored.
+    """
+    regressions = []
+    for name, by_size in current['results'].items():
+        for size, result in by_size.items():
+            before = baseline.get('results', {}).get(name, {}).get(size)
+            if not before:
+                continue
+            for metric in ('min_ms', 'blocks'):
+                old, new = before.get(metric), result.get(metric)
+                if old is None or new is None:
+                    continue
+                # Small block counts jitter by a few; only flag growth beyond that
+                slack = 0 if metric == 'min_ms' else 16
+                if new > old * (1 + threshold) + slack:
+                    regressions.append((name, size, metric, old, new))
+    return regressions
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeminarCounter',
+            fields=[
+                ('seminar_id', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('capacity', models.IntegerField(blank=True, null=True)),
+                ('registered', models.IntegerField(default=0)),
+                ('present', models.IntegerField(default=0)),
+                ('timed_in', models.IntegerField(default=0)),
+                ('timed_out', models.IntegerField(default=0)),
+                ('reconciled_at', models.DateTimeField()),
+            ],
+        ),
+    ]
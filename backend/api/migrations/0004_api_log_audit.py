@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:15
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apilog',
+            name='latency_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='apilog',
+            name='request_id',
+            field=models.CharField(blank=True, default='', max_length=128),
+        ),
+        migrations.AlterField(
+            model_name='apilog',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='apilog',
+            index=models.Index(fields=['status_code', 'timestamp'], name='api_apilog_status__774aee_idx'),
+        ),
+    ]
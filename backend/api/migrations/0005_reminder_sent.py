@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:17
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_api_log_audit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderSent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seminar_id', models.CharField(max_length=64)),
+                ('participant_email', models.CharField(max_length=255)),
+                ('sent_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'unique_together': {('seminar_id', 'participant_email')},
+            },
+        ),
+    ]
@@ -3,15 +3,81 @@
 # These models can be used later if migrating to Django ORM
 
 from django.db import models
+from django.utils import timezone
 
 
 class ApiLog(models.Model):
-    """Optional: log API requests for debugging"""
-    timestamp = models.DateTimeField(auto_now_add=True)
+    """Audit trail of API errors, slow calls and sampled requests, written in bulk by api.audit"""
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
     endpoint = models.CharField(max_length=255)
     method = models.CharField(max_length=10)
     status_code = models.IntegerField()
+    latency_ms = models.FloatField(null=True, blank=True)
+    request_id = models.CharField(max_length=128, blank=True, default='')
     error_message = models.TextField(blank=True, null=True)
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [models.Index(fields=['status_code', 'timestamp'])]
+
+
+class IdempotencyRecord(models.Model):
+    """Stored response for a POST carrying an Idempotency-Key header"""
+    key = models.CharField(max_length=255)
+    path = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.IntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, blank=True, default='')
+    content = models.BinaryField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ('key', 'path')
+        ordering = ['-created_at']
+
+
+class SeminarCounter(models.Model):
+    """Live per-seminar counts shared by all workers, reconciled against Supabase"""
+    seminar_id = models.CharField(max_length=64, primary_key=True)
+    capacity = models.IntegerField(null=True, blank=True)
+    registered = models.IntegerField(default=0)
+    present = models.IntegerField(default=0)
+    timed_in = models.IntegerField(default=0)
+    timed_out = models.IntegerField(default=0)
+    reconciled_at = models.DateTimeField()
+
+
+class Job(models.Model):
+    """Background job queued through api.jobs and run by `manage.py run_jobs`"""
+    kind = models.CharField(max_length=64)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=16, default='queued')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    progress_done = models.IntegerField(default=0)
+    progress_total = models.IntegerField(null=True, blank=True)
+    message = models.CharField(max_length=255, blank=True, default='')
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    cancel_requested = models.BooleanField(default=False)
+    worker = models.CharField(max_length=128, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    run_after = models.DateTimeField()
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'run_after'])]
+
+
+class ReminderSent(models.Model):
+    """Ledger of evaluation reminders already emailed, one row per seminar and participant"""
+    seminar_id = models.CharField(max_length=64)
+    participant_email = models.CharField(max_length=255)
+    sent_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('seminar_id', 'participant_email')
@@ -0,0 +1,221 @@
+# Sampled and on-demand request profiling
+# A configurable fraction of requests (PROFILING_SAMPLE_RATE), plus any request
+# carrying `X-Profile: <PROFILING_TOKEN>`, is profiled and written to
+# PROFILING_DIR tagged with the URL name and elapsed time. The default engine is
+# a wall-clock stack sampler whose output is in the folded format read by
+# flamegraph.pl and speedscope; `cprofile` writes pstats files instead. With
+# neither a sample rate nor a token configured the middleware removes itself
+# from the chain, so it costs nothing when disabled. Finished profiles are
+# handed to a writer thread, which writes and prunes them off the request path.
+
+import cProfile
+import hmac
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from itertools import count
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'HTTP_X_PROFILE'
+RESULT_HEADER = 'X-Profile-File'
+ENGINES = ('sampler', 'cprofile')
+
+# cProfile (and sys.setprofile on 3.12+) allows one active profiler per process
+_cprofile_lock = threading.Lock()
+
+_sequence = count(1)
+
+# Finished profiles waiting for the writer; more than this and new ones are dropped
+WRITE_QUEUE_SIZE = 64
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    filename = code.co_filename
+    marker = filename.rfind('site-packages' + os.sep)
+    if marker >= 0:
+        filename = filename[marker + len('site-packages') + 1:]
+    elif filename.startswith(str(settings.BASE_DIR)):
+        filename = os.path.relpath(filename, settings.BASE_DIR)
+    # ';' separates frames in the folded format
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'.replace(';', ':')
+
+
+class StackSampler:
+    """Sample one thread's stack every `interval` seconds into folded-stack counts"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, 'w') as fh:
+            for stack, n in self.samples.most_common():
+                fh.write(f'{stack} {n}\n')
+
+
+def prune(directory, max_files):
+    """Keep only the newest `max_files` profiles"""
+    try:
+        entries = [e for e in os.scandir(directory) if e.is_file()]
+    except FileNotFoundError:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    for entry in entries[max_files:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+class ProfileWriter:
+    """Bounded queue of finished profiles and the thread that writes them out"""
+
+    def __init__(self, size):
+        self.queue = queue.Queue(size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.stats = {'written': 0, 'dropped': 0, 'failed': 0}
+
+    def submit(self, path, profiler, summary):
+        """Called on the request path: never blocks, returns False if the profile was dropped"""
+        try:
+            self.queue.put_nowait((path, profiler, summary))
+        except queue.Full:
+            self.stats['dropped'] += 1
+            return False
+        self._ensure_writer()
+        return True
+
+    def _ensure_writer(self):
+        # Started lazily so every gunicorn worker process gets its own thread
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='profile-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            path, profiler, summary = self.queue.get()
+            try:
+                self._write(path, profiler, summary)
+            finally:
+                self.queue.task_done()
+
+    def _write(self, path, profiler, summary):
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            if isinstance(profiler, cProfile.Profile):
+                profiler.dump_stats(path)
+            else:
+                profiler.write(path)
+            prune(directory, settings.PROFILING_MAX_FILES)
+        except Exception:
+            self.stats['failed'] += 1
+            logger.exception("Failed to write request profile")
+            return
+        self.stats['written'] += 1
+        logger.info("Profiled %s -> %s", summary, os.path.basename(path))
+
+    def join(self):
+        """Wait until every queued profile has been written"""
+        self.queue.join()
+
+
+writer = ProfileWriter(WRITE_QUEUE_SIZE)
+
+
+class ProfilingMiddleware:
+    """Profile sampled or explicitly requested requests"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.token = settings.PROFILING_TOKEN
+        self.engine = settings.PROFILING_ENGINE
+        if self.sample_rate <= 0 and not self.token:
+            raise MiddlewareNotUsed
+        if self.engine not in ENGINES:
+            raise MiddlewareNotUsed(f'PROFILING_ENGINE must be one of {ENGINES}')
+
+    def _requested(self, request):
+        header = request.META.get(HEADER)
+        return bool(self.token and header and hmac.compare_digest(header, self.token))
+
+    def __call__(self, request):
+        requested = self._requested(request)
+        if not requested and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return self.get_response(request)
+
+        if self.engine == 'cprofile':
+            if not _cprofile_lock.acquire(blocking=False):
+                return self.get_response(request)
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            try:
+                profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    profiler.disable()
+            finally:
+                _cprofile_lock.release()
+        else:
+            profiler = StackSampler(threading.get_ident(), settings.PROFILING_INTERVAL_MS / 1000.0)
+            started = time.perf_counter()
+            profiler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.stop()
+
+        elapsed_ms = int((time.perf_counter() - started) * 1000)
+        path = self._save(request, profiler, elapsed_ms)
+        if path and requested:
+            response[RESULT_HEADER] = os.path.basename(path)
+        return response
+
+    def _save(self, request, profiler, elapsed_ms):
+        match = getattr(request, 'resolver_match', None)
+        url_name = (match.url_name if match else None) or 'unresolved'
+        stamp = time.strftime('%Y%m%dT%H%M%S')
+        suffix = 'prof' if self.engine == 'cprofile' else 'folded'
+        name = f'{stamp}-{os.getpid()}-{next(_sequence)}-{url_name}-{request.method}-{elapsed_ms}ms.{suffix}'
+        path = os.path.join(settings.PROFILING_DIR, name)
+        summary = f'{request.method} {request.path} ({url_name}) in {elapsed_ms}ms'
+        if not writer.submit(path, profiler, summary):
+            logger.warning("Profile writer is behind; dropped the profile of %s", summary)
+            return None
+        return path
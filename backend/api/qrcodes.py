@@ -0,0 +1,252 @@
+# Server-side QR codes
+# Participant codes carry the same URL ParticipantQRCode.jsx builds
+# (<FRONTEND_URL>/qr?data=<JSON payload>), so server-rendered and
+# client-rendered codes scan identically. Rendered images and encoded module
+# matrices are cached under a hash of everything that determines their bytes.
+# The image URL does not carry FRONTEND_URL, so images are cached for a day and
+# revalidated by ETag rather than marked immutable. Badge sheets are PDFs
+# whose codes are 1-bit image masks: a few hundred bytes per badge, printed
+# crisp at any size. Encoding is CPU-bound pure Python: sheets above
+# QR_SHEET_SYNC_MAX_BADGES are rendered by the qr_sheet job, which alone
+# spreads encoding over a process pool; web workers never start one.
+
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+
+try:
+    import segno
+except Exception:
+    segno = None
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+ERROR_LEVEL = 'm'
+BORDER = 4
+CACHE_SECONDS = 30 * 86400
+IMAGE_CACHE_CONTROL = 'public, max-age=86400'
+
+# Points; 72 per inch
+PAPER_SIZES = {'letter': (612, 792), 'a4': (595, 842)}
+SHEET_COLUMNS, SHEET_ROWS, SHEET_MARGIN = 3, 4, 36
+
+# Below this many uncached codes the process pool costs more than it saves
+PARALLEL_MIN = 64
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _encode_uri_component(text):
+    return quote(text, safe="-_.!~*'()")
+
+
+def participant_url(seminar_id, participant_email):
+    """Same URL as ParticipantQRCode.jsx; QRRedirect.jsx records the scan"""
+    payload = json.dumps({'seminar_id': seminar_id, 'participant_email': participant_email}, separators=(',', ':'))
+    return f'{settings.FRONTEND_URL}/qr?data={_encode_uri_component(payload)}'
+
+
+def seminar_url(seminar_id):
+    """Seminar poster code: opens the participant page, where the seminar can be joined"""
+    return f'{settings.FRONTEND_URL}/participant?seminar={_encode_uri_component(seminar_id)}'
+
+
+def evaluation_url(seminar_id):
+    """Opens the participant dashboard on the Evaluations tab with this seminar selected"""
+    return f'{seminar_url(seminar_id)}&section=evaluation'
+
+
+def digest(*parts):
+    return hashlib.sha256('\0'.join(str(p) for p in parts).encode()).hexdigest()
+
+
+def render(data, fmt, scale):
+    """PNG or SVG bytes for `data`, cached by content"""
+    key = f'qr:{fmt}:{digest(data, ERROR_LEVEL, scale, BORDER)}'
+    image = cache.get(key)
+    if image is None:
+        buffer = io.BytesIO()
+        segno.make(data, error=ERROR_LEVEL, micro=False).save(buffer, kind=fmt, scale=scale, border=BORDER)
+        image = buffer.getvalue()
+        cache.set(key, image, CACHE_SECONDS)
+    return image
+
+
+def _encode(data):
+    """(width, packed rows) of the module matrix including the quiet zone; dark modules are 1 bits"""
+    matrix = segno.make(data, error=ERROR_LEVEL, micro=False).matrix
+    width = len(matrix) + 2 * BORDER
+    blank = bytes((width + 7) // 8)
+    rows = [blank] * BORDER
+    for row in matrix:
+        bits = [0] * BORDER + [1 if module else 0 for module in row] + [0] * BORDER
+        packed = bytearray(len(blank))
+        for i, bit in enumerate(bits):
+            if bit:
+                packed[i >> 3] |= 0x80 >> (i & 7)
+        rows.append(bytes(packed))
+    rows += [blank] * BORDER
+    return width, b''.join(rows)
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: gunicorn workers run request threads
+            _pool = ProcessPoolExecutor(max_workers=settings.QR_RENDER_PROCESSES,
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _encode_parallel(payloads):
+    global _pool
+    chunk = max(1, len(payloads) // (settings.QR_RENDER_PROCESSES * 4))
+    try:
+        return list(_executor().map(_encode, payloads, chunksize=chunk))
+    except BrokenProcessPool:
+        logger.exception("QR encoding pool failed; encoding in-process")
+        with _pool_lock:
+            _pool = None
+        return [_encode(data) for data in payloads]
+
+
+def encode_many(payloads, parallel=False):
+    """Module matrices for many payloads: cached ones reused, the rest encoded (in parallel if allowed)"""
+    keys = {data: f'qr:matrix:{digest(data, ERROR_LEVEL, BORDER)}' for data in payloads}
+    found = cache.get_many(list(keys.values()))
+    matrices = {data: found[key] for data, key in keys.items() if key in found}
+    missing = [data for data in keys if data not in matrices]
+    if parallel and len(missing) >= PARALLEL_MIN and settings.QR_RENDER_PROCESSES > 1:
+        encoded = _encode_parallel(missing)
+    else:
+        encoded = [_encode(data) for data in missing]
+    fresh = dict(zip(missing, encoded))
+    cache.set_many({keys[data]: value for data, value in fresh.items()}, CACHE_SECONDS)
+    matrices.update(fresh)
+    return [matrices[data] for data in payloads]
+
+
+# ---- PDF sheets ----
+
+def _pdf_text(text):
+    raw = str(text or '').encode('latin-1', 'replace')
+    return raw.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def _fit(text, size, width):
+    # Helvetica averages about half an em per character
+    limit = max(4, int(width / (size * 0.5)))
+    text = str(text or '')
+    return text if len(text) <= limit else text[:limit - 1] + '~'
+
+
+def build_sheet(badges, paper='letter', title=None, parallel=False):
+    """Multi-page PDF with one labelled QR code per badge.
+
+    `badges` is a list of dicts with `data` and optional `name` and `email`.
+    """
+    page_w, page_h = PAPER_SIZES[paper]
+    per_page = SHEET_COLUMNS * SHEET_ROWS
+    header = 24 if title else 0
+    cell_w = (page_w - 2 * SHEET_MARGIN) / SHEET_COLUMNS
+    cell_h = (page_h - 2 * SHEET_MARGIN - header) / SHEET_ROWS
+    side = min(cell_w, cell_h - 30) * 0.85
+    matrices = encode_many([b['data'] for b in badges], parallel)
+
+    objects = []  # index i holds object number i + 1
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    def stream(dictionary, data):
+        data = zlib.compress(data)
+        return b'<< ' + dictionary + b' /Filter /FlateDecode /Length ' + str(len(data)).encode() + b' >>\nstream\n' + data + b'\nendstream'
+
+    catalog = add(None)
+    pages = add(None)
+    font = add(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+    page_ids = []
+    page_count = max(1, -(-len(badges) // per_page))
+    for page in range(page_count):
+        content = [b'0.8 G 0.5 w']
+        xobjects = []
+        if title:
+            content.append(b'BT /F1 12 Tf %.2f %.2f Td (%s) Tj ET' % (
+                SHEET_MARGIN, page_h - SHEET_MARGIN - 14, _pdf_text(f'{title} - page {page + 1} of {page_count}')))
+        for slot, index in enumerate(range(page * per_page, min(len(badges), (page + 1) * per_page))):
+            badge = badges[index]
+            width, bits = matrices[index]
+            image = add(stream(b'/Type /XObject /Subtype /Image /Width %d /Height %d /ImageMask true '
+                               b'/BitsPerComponent 1 /Decode [1 0]' % (width, width), bits))
+            xobjects.append(b'/Q%d %d 0 R' % (slot, image))
+            col, row = slot % SHEET_COLUMNS, slot // SHEET_COLUMNS
+            x0 = SHEET_MARGIN + col * cell_w
+            y0 = page_h - SHEET_MARGIN - header - (row + 1) * cell_h
+            qx = x0 + (cell_w - side) / 2
+            qy = y0 + cell_h - side - 6
+            content.append(b'%.2f %.2f %.2f %.2f re S' % (x0, y0, cell_w, cell_h))
+            content.append(b'q %.2f 0 0 %.2f %.2f %.2f cm /Q%d Do Q' % (side, side, qx, qy, slot))
+            for text, size, dy in ((badge.get('name'), 10, 12), (badge.get('email'), 8, 24)):
+                if not text:
+                    continue
+                text = _fit(text, size, cell_w - 8)
+                tx = x0 + max(4, (cell_w - len(text) * size * 0.5) / 2)
+                content.append(b'BT /F1 %d Tf %.2f %.2f Td (%s) Tj ET' % (size, tx, qy - dy, _pdf_text(text)))
+        contents = add(stream(b'', b'\n'.join(content)))
+        page_ids.append(add(b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R '
+                            b'/Resources << /Font << /F1 %d 0 R >> /XObject << %s >> >> >>'
+                            % (pages, page_w, page_h, contents, font, b' '.join(xobjects))))
+    objects[catalog - 1] = b'<< /Type /Catalog /Pages %d 0 R >>' % pages
+    objects[pages - 1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % p for p in page_ids), len(page_ids))
+
+    out = io.BytesIO()
+    out.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+    xref = out.tell()
+    out.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    out.write(b''.join(b'%010d 00000 n \n' % offset for offset in offsets))
+    out.write(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, catalog, xref))
+    return out.getvalue()
+
+
+def sheet_badges(seminar_id, registrants):
+    """Badge dicts for a seminar's registrants, ordered by name then email"""
+    people = sorted(registrants, key=lambda r: ((r.get('participant_name') or '').lower(), r.get('participant_email') or ''))
+    return [{'data': participant_url(seminar_id, r['participant_email']), 'name': r.get('participant_name'),
+             'email': r['participant_email']} for r in people if r.get('participant_email')]
+
+
+def sheet_etag(badges, paper='letter', title=None):
+    return digest(paper, title, *(f"{b['data']}\0{b.get('name')}" for b in badges))
+
+
+def cached_sheet(etag):
+    return cache.get(f'qr:sheet:{etag}')
+
+
+def sheet(badges, paper='letter', title=None, parallel=False):
+    """(etag, PDF bytes) for a badge sheet, cached by content"""
+    etag = sheet_etag(badges, paper, title)
+    pdf = cached_sheet(etag)
+    if pdf is None:
+        pdf = build_sheet(badges, paper, title, parallel)
+        cache.set(f'qr:sheet:{etag}', pdf, CACHE_SECONDS)
+    return etag, pdf
@@ -0,0 +1,288 @@
+# Query-plan audit
+# SHAPES lists every query shape the views, tasks and helpers send to
+# Supabase: which table, which columns are matched by equality (eq / in_),
+# which by range, and the sort order. `manage.py audit_queries` loads the
+# repo's SQL scripts and synthetic data into a scratch schema of a local
+# Postgres, runs EXPLAIN ANALYZE for each shape and reports sequential scans
+# and the composite indexes that would serve them. FakeQuery records the shape
+# of every query it runs, so tests can check that new code does not issue a
+# shape missing from this catalogue.
+
+import re
+from typing import NamedTuple, Optional
+
+# Applied in this order to build the audit schema
+SCHEMA_SCRIPTS = (
+    'create_tables.sql',
+    'create_attendance_table.sql',
+    'add_attendance_columns.sql',
+    'add_seminar_time_columns.sql',
+    'add_joined_participants_unique.sql',
+    'add_delta_sync.sql',
+    'add_participant_email_indexes.sql',
+)
+
+# Sorts over fewer rows than this are not worth an index
+SORT_ROWS_THRESHOLD = 10000
+
+
+class Shape(NamedTuple):
+    name: str
+    table: str
+    eq: tuple = ()        # col = value
+    many: tuple = ()      # col IN (values)
+    range: tuple = ()     # col >= value
+    order: tuple = ()
+    where: str = ''       # fixed extra predicate, e.g. IS NULL tests
+    columns: str = '*'
+    limit: Optional[int] = None
+    used_by: str = ''
+
+    @property
+    def key(self):
+        return shape_key(self.table, self.eq + self.many, self.range, self.order)
+
+
+def shape_key(table, eq, range_, order):
+    """Comparable form of a shape; FakeQuery records queries in this form"""
+    return (table, frozenset(eq), frozenset(range_), tuple(order))
+
+
+SHAPES = (
+    Shape('seminars_by_date', 'seminars', order=('date',), used_by='seminars_list_create'),
+    Shape('seminars_changed_since', 'seminars', range=('updated_at',), order=('updated_at',),
+          used_by='seminars_list_create ?since='),
+    Shape('seminars_changed_unordered', 'seminars', range=('updated_at',), columns='id,title,speaker,date,updated_at',
+          used_by='search index delta refresh'),
+    Shape('seminar_by_id', 'seminars', eq=('id',), limit=1,
+          used_by='seminar_detail, counters, analytics, QR sheet, seminar updates'),
+    Shape('seminars_by_ids', 'seminars', many=('id',), used_by='participant_history'),
+    Shape('seminars_by_id_paged', 'seminars', order=('id',), limit=1000, used_by='search index load, archive_seminars'),
+    Shape('seminars_in_date_range', 'seminars', range=('date',), order=('date',), columns='id,title,date',
+          used_by='analytics_rollup'),
+
+    Shape('attendance_by_seminar_email', 'attendance', eq=('seminar_id', 'participant_email'), limit=1,
+          used_by='seminar_time_in, seminar_time_out'),
+    Shape('attendance_by_id', 'attendance', eq=('id',), used_by='time-in/out updates'),
+    Shape('attendance_by_ids', 'attendance', many=('id',), where='time_out IS NULL', used_by='mass_time_out job'),
+    Shape('attendance_by_seminar', 'attendance', eq=('seminar_id',), order=('created_at',),
+          used_by='seminar_attendance_list'),
+    Shape('attendance_changed_since', 'attendance', eq=('seminar_id',), range=('updated_at',), order=('updated_at',),
+          used_by='seminar_attendance_list ?since='),
+    Shape('attendance_by_seminar_paged', 'attendance', eq=('seminar_id',), order=('id',), limit=1000,
+          used_by='seminar_analytics, export and mass_time_out jobs'),
+    Shape('attendance_by_seminars_paged', 'attendance', many=('seminar_id',), order=('id',), limit=1000,
+          used_by='analytics_rollup'),
+    Shape('attendance_by_email', 'attendance', eq=('participant_email',), used_by='participant_history'),
+    Shape('attendance_count', 'attendance', eq=('seminar_id',), where='time_in IS NOT NULL', columns='id', limit=1,
+          used_by='live counters'),
+
+    Shape('joined_by_seminar', 'joined_participants', eq=('seminar_id',), order=('joined_at',),
+          used_by='joined_participants_list'),
+    Shape('joined_changed_since', 'joined_participants', eq=('seminar_id',), range=('updated_at',), order=('updated_at',),
+          used_by='joined_participants_list ?since='),
+    Shape('joined_by_seminar_email', 'joined_participants', eq=('seminar_id', 'participant_email'), limit=1,
+          used_by='join, import_participants, check_in_participant, check_out_participant'),
+    Shape('joined_by_seminar_paged', 'joined_participants', eq=('seminar_id',), order=('id',), limit=1000,
+          used_by='seminar_analytics, QR sheet, export job'),
+    Shape('joined_by_seminars_paged', 'joined_participants', many=('seminar_id',), order=('id',), limit=1000,
+          used_by='analytics_rollup'),
+    Shape('joined_by_email', 'joined_participants', eq=('participant_email',), used_by='participant_history'),
+    Shape('joined_count', 'joined_participants', eq=('seminar_id',), where='present IS TRUE', columns='id', limit=1,
+          used_by='live counters'),
+
+    Shape('evaluations_by_seminar', 'evaluations', eq=('seminar_id',), used_by='fetch_evaluations'),
+    Shape('evaluations_by_seminar_email', 'evaluations', eq=('seminar_id', 'participant_email'),
+          used_by='has_evaluated, fetch_evaluations ?participant_email='),
+    Shape('evaluations_by_seminar_paged', 'evaluations', eq=('seminar_id',), order=('id',), limit=1000,
+          used_by='archive_seminars'),
+    Shape('evaluations_by_seminar_email_since', 'evaluations', eq=('seminar_id', 'participant_email'),
+          range=('created_at',), order=('created_at',), used_by='fetch_evaluations ?participant_email=&since='),
+    Shape('evaluations_created_since', 'evaluations', eq=('seminar_id',), range=('created_at',), order=('created_at',),
+          used_by='fetch_evaluations ?since='),
+    Shape('evaluations_by_email', 'evaluations', eq=('participant_email',), used_by='participant_history'),
+
+    Shape('tombstones_by_table', 'change_log', eq=('table_name',), range=('deleted_at',), order=('deleted_at',),
+          used_by='seminars_list_create ?since='),
+    Shape('tombstones_by_seminar', 'change_log', eq=('seminar_id',), range=('deleted_at',), order=('deleted_at',),
+          used_by='list endpoints ?since='),
+)
+
+CATALOGUE = {shape.key: shape for shape in SHAPES}
+
+
+def uncatalogued(recorded):
+    """Recorded shape keys (from FakeSupabaseClient.shapes) missing from SHAPES"""
+    return sorted((key for key in recorded if key not in CATALOGUE), key=repr)
+
+
+# ---- SQL ----
+
+def to_sql(shape):
+    """SELECT statement for one shape, with psycopg named placeholders"""
+    clauses = [f'{c} = %({c})s' for c in shape.eq]
+    clauses += [f'{c} = ANY(%({c})s)' for c in shape.many]
+    clauses += [f'{c} >= %({c}__from)s' for c in shape.range]
+    if shape.where:
+        clauses.append(shape.where)
+    sql = f'SELECT {shape.columns} FROM {shape.table}'
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    if shape.order:
+        sql += ' ORDER BY ' + ', '.join(shape.order)
+    if shape.limit:
+        sql += f' LIMIT {shape.limit}'
+    return sql
+
+
+def params_for(shape, samples):
+    """Concrete values for a shape's placeholders, taken from the synthetic data"""
+    row = samples[shape.table]
+    params = {c: row[c] for c in shape.eq}
+    for c in shape.many:
+        params[c] = samples['many'][(shape.table, c)]
+    for c in shape.range:
+        params[f'{c}__from'] = row[f'{c}__from']
+    return params
+
+
+# ---- plans ----
+
+def walk(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from walk(child)
+
+
+def summarize_plan(plan):
+    """Findings from one EXPLAIN (ANALYZE, FORMAT JSON) result"""
+    root = plan[0] if isinstance(plan, list) else plan
+    nodes = list(walk(root['Plan']))
+    return {
+        'total_ms': round(root.get('Execution Time', root['Plan'].get('Actual Total Time', 0.0)), 3),
+        'seq_scans': [
+            {'relation': n.get('Relation Name'), 'rows_removed': n.get('Rows Removed by Filter', 0)}
+            for n in nodes if n['Node Type'] == 'Seq Scan'
+        ],
+        'indexes': sorted({n['Index Name'] for n in nodes if n.get('Index Name')}),
+        'sort_rows': max([n.get('Actual Rows', 0) for n in nodes if n['Node Type'] in ('Sort', 'Incremental Sort')] or [0]),
+        'nodes': [n['Node Type'] for n in nodes],
+    }
+
+
+def wanted_index(shape):
+    """Columns of the composite index that would serve `shape`, equality columns first"""
+    columns = list(shape.eq + shape.many)
+    tail = (shape.range or shape.order)[:1]
+    return columns + [c for c in tail if c not in columns]
+
+
+def covering_index(shape, indexes, sort_rows=0):
+    """Name of an index that serves `shape`, or None.
+
+    `indexes` maps index name to its column list. The equality columns must
+    form the index's leading columns, in any order; a range column must come
+    right after them, and so must the sort column once sorting costs more than
+    SORT_ROWS_THRESHOLD rows.
+    """
+    eq = set(shape.eq + shape.many)
+    tail = (shape.range or (shape.order if sort_rows >= SORT_ROWS_THRESHOLD else ()))[:1]
+    if not eq and not tail:
+        return ''
+    for name, columns in sorted(indexes.items()):
+        if set(columns[:len(eq)]) != eq:
+            continue
+        if not tail or columns[len(eq):len(eq) + 1] == list(tail):
+            return name
+    return None
+
+
+def index_ddl(table, columns):
+    name = re.sub(r'[^a-z0-9_]', '_', f"idx_{table}_{'_'.join(columns)}".lower())[:63]
+    return f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table}({', '.join(columns)});"
+
+
+def recommended_ddl(reports):
+    """Index DDL for every uncovered shape, leaving out indexes another one's prefix already gives"""
+    wanted = []
+    for report in reports:
+        if report['ddl']:
+            entry = (report['shape'].table, wanted_index(report['shape']))
+            if entry not in wanted:
+                wanted.append(entry)
+    return [
+        index_ddl(table, columns) for table, columns in wanted
+        if not any(t == table and other != columns and other[:len(columns)] == columns for t, other in wanted)
+    ]
+
+
+def audit(shape, plan, indexes):
+    """One report row: plan summary, findings, and DDL for a missing index"""
+    summary = summarize_plan(plan)
+    filtered = bool(shape.eq or shape.many or shape.range)
+    seq = [s for s in summary['seq_scans'] if s['relation'] == shape.table] if filtered else []
+    covered = covering_index(shape, indexes.get(shape.table, {}), summary['sort_rows'])
+    ddl = None
+    if covered is None:
+        ddl = index_ddl(shape.table, wanted_index(shape))
+    return {'shape': shape, **summary, 'seq_scan': bool(seq), 'covered_by': covered, 'ddl': ddl}
+
+
+# ---- synthetic data ----
+
+SYNTHETIC_DATA = '''
+INSERT INTO seminars (title, speaker, capacity, date, start_datetime, end_datetime, updated_at)
+SELECT 'Seminar ' || g, 'Speaker ' || (g % 97), %(per_seminar)s,
+       (now() - (g % 720) * interval '1 day')::date,
+       now() - (g % 720) * interval '1 day',
+       now() - (g % 720) * interval '1 day' + interval '2 hours',
+       now() - (g % 720) * interval '1 day'
+FROM generate_series(1, %(seminars)s) g;
+
+-- Participants come from a shared pool, so each attends several seminars
+INSERT INTO joined_participants (seminar_id, participant_email, participant_name, joined_at, updated_at, present, check_in)
+SELECT s.id, 'p' || ((s.n * 7919 + p) %% %(pool)s) || '@example.edu', 'Participant ' || p,
+       s.start_datetime - random() * interval '7 days', s.start_datetime, random() < 0.7,
+       CASE WHEN random() < 0.7 THEN s.start_datetime END
+FROM (SELECT id, start_datetime, row_number() OVER (ORDER BY id) AS n FROM seminars) s
+CROSS JOIN generate_series(1, %(per_seminar)s) p;
+
+INSERT INTO attendance (seminar_id, participant_email, time_in, time_out, created_at, updated_at)
+SELECT j.seminar_id, j.participant_email, j.joined_at + interval '7 days',
+       CASE WHEN random() < 0.9 THEN j.joined_at + interval '7 days 2 hours' END, j.joined_at, j.updated_at
+FROM joined_participants j WHERE random() < 0.8;
+
+INSERT INTO evaluations (seminar_id, participant_email, answers, created_at)
+SELECT seminar_id, participant_email, '{"q1": 4, "q2": 5}'::jsonb, time_in + interval '3 hours'
+FROM attendance WHERE random() < 0.5;
+
+INSERT INTO change_log (table_name, row_id, seminar_id, deleted_at)
+SELECT 'seminars', gen_random_uuid()::text, NULL, now() - g * interval '1 hour'
+FROM generate_series(1, greatest(1, %(seminars)s / 20)) g;
+'''
+
+SAMPLE_QUERIES = {
+    # One seminar with registrations, and a participant of it
+    'joined_participants': 'SELECT id, seminar_id, participant_email, updated_at - interval \'1 day\' AS "updated_at__from" '
+                           'FROM joined_participants ORDER BY participant_email, seminar_id LIMIT 1',
+    'attendance': 'SELECT id, seminar_id, participant_email, updated_at - interval \'1 day\' AS "updated_at__from" '
+                  'FROM attendance ORDER BY participant_email, seminar_id LIMIT 1',
+    'evaluations': 'SELECT id, seminar_id, participant_email, created_at - interval \'1 day\' AS "created_at__from" '
+                   'FROM evaluations ORDER BY participant_email, seminar_id LIMIT 1',
+    'seminars': 'SELECT id, now() - interval \'3 days\' AS "updated_at__from", '
+                '(now() - interval \'30 days\')::date AS "date__from" FROM seminars ORDER BY date DESC LIMIT 1',
+    'change_log': 'SELECT \'seminars\' AS table_name, %(seminar_id)s::uuid AS seminar_id, '
+                  'now() - interval \'1 day\' AS "deleted_at__from"',
+}
+
+INDEX_QUERY = '''
+SELECT t.relname AS table_name, i.relname AS index_name, array_agg(a.attname ORDER BY k.ord) AS columns
+FROM pg_index x
+JOIN pg_class t ON t.oid = x.indrelid
+JOIN pg_class i ON i.oid = x.indexrelid
+JOIN pg_namespace n ON n.oid = t.relnamespace
+CROSS JOIN LATERAL unnest(x.indkey) WITH ORDINALITY AS k(attnum, ord)
+JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+WHERE n.nspname = current_schema() AND x.indpred IS NULL
+GROUP BY t.relname, i.relname
+'''
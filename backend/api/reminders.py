@@ -0,0 +1,202 @@
+# Evaluation reminder emails
+# Who still owes an evaluation is found with set-based reads per seminar:
+# attendance rows with a time_out, minus the emails in evaluations, minus the
+# emails already in the local ReminderSent ledger, all compared lowercased
+# (the ledger stores them lowercased too). The rest are mailed in
+# batches of REMINDER_BATCH_SIZE over REMINDER_SMTP_CONNECTIONS SMTP
+# connections that stay open for the whole run, paced to
+# REMINDER_RATE_PER_SECOND. Sent addresses go into the ledger after every
+# batch, so a rerun, or a retried job, only mails whoever is left.
+
+import logging
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+from . import archive, qrcodes
+from .analytics import fetch_all
+from .models import ReminderSent
+
+logger = logging.getLogger(__name__)
+
+# Refusals that concern one message; the connection stays usable
+_MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+SUBJECT = 'Please evaluate "{title}"'
+BODY = """Hi {name},
+
+Thank you for attending "{title}". Please take a minute to fill in its evaluation:
+
+{url}
+
+This is the only reminder you will receive for this seminar.
+"""
+
+
+def pending(client, seminar_id):
+    """{lowercased email: name} of participants who timed out of the seminar and have not evaluated it"""
+    if archive.is_archived(seminar_id):
+        attendance = archive.read_rows(seminar_id, 'attendance')
+        evaluations = archive.read_rows(seminar_id, 'evaluations')
+        joined = archive.read_rows(seminar_id, 'joined_participants')
+    else:
+        attendance = fetch_all(lambda: client.table('attendance').select('participant_email,time_out')
+                               .eq('seminar_id', seminar_id).not_.is_('time_out', 'null').order('id'))
+        evaluations = fetch_all(lambda: client.table('evaluations').select('participant_email')
+                                .eq('seminar_id', seminar_id).order('id'))
+        joined = fetch_all(lambda: client.table('joined_participants').select('participant_email,participant_name')
+                           .eq('seminar_id', seminar_id).order('id'))
+    evaluated = {_normalize(r.get('participant_email')) for r in evaluations}
+    names = {_normalize(r.get('participant_email')): r.get('participant_name') for r in joined}
+    owed = {_normalize(r.get('participant_email')) for r in attendance if r.get('time_out')}
+    return {email: names.get(email) for email in owed - evaluated if email}
+
+
+def _normalize(email):
+    return (email or '').strip().lower()
+
+
+def reminded(seminar_id):
+    return {_normalize(email) for email in
+            ReminderSent.objects.filter(seminar_id=seminar_id).values_list('participant_email', flat=True)}
+
+
+def _record(seminar_id, emails):
+    if emails:
+        ReminderSent.objects.bulk_create([ReminderSent(seminar_id=seminar_id, participant_email=e) for e in emails],
+                                         ignore_conflicts=True)
+
+
+class RateLimiter:
+    """Spaces calls to `rate` per second across threads; 0 means no limit"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class ReminderSender:
+    """Sends reminder batches from pool threads, one long-lived SMTP connection per thread"""
+
+    def __init__(self, seminar_id, title, rate):
+        self.seminar_id = seminar_id
+        self.title = title or 'the seminar'
+        self.url = qrcodes.evaluation_url(seminar_id)
+        self.limiter = RateLimiter(rate)
+        self.stop = threading.Event()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._sent = []
+        self.failed = []
+
+    def _connection(self, fresh=False):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and fresh:
+            self._close(connection)
+            connection = None
+        if connection is None:
+            connection = get_connection(fail_silently=False)
+            connection.open()
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _message(self, email, name, connection):
+        return EmailMessage(SUBJECT.format(title=self.title),
+                            BODY.format(name=name or 'there', title=self.title, url=self.url),
+                            settings.DEFAULT_FROM_EMAIL, [email], connection=connection)
+
+    def _send_one(self, email, name):
+        for attempt in (1, 2):
+            connection = self._connection(fresh=attempt == 2)
+            try:
+                self._message(email, name, connection).send()
+                return True
+            except _MESSAGE_ERRORS as e:
+                logger.warning("Reminder to %s refused: %s", email, e)
+                return False
+            except (smtplib.SMTPException, OSError) as e:
+                # Dropped or broken connection: reconnect once and resend
+                if attempt == 2:
+                    logger.warning("Reminder to %s failed: %s", email, e)
+                    return False
+        return False
+
+    def send_batch(self, batch):
+        for email, name in batch:
+            if self.stop.is_set():
+                return
+            self.limiter.acquire()
+            ok = self._send_one(email, name)
+            with self._lock:
+                (self._sent if ok else self.failed).append(email)
+
+    def take_sent(self):
+        """Addresses sent since the last call"""
+        with self._lock:
+            sent, self._sent = self._sent, []
+        return sent
+
+    def close(self):
+        for connection in self._connections:
+            self._close(connection)
+
+
+def send_reminders(client, seminar_id, progress=None, dry_run=False):
+    """Email every participant who still owes the seminar an evaluation and has not been reminded"""
+    owed = pending(client, seminar_id)
+    already = reminded(seminar_id) & owed.keys()
+    recipients = sorted(owed.keys() - already)
+    summary = {'seminar_id': seminar_id, 'pending': len(owed), 'already_reminded': len(already)}
+    if dry_run or not recipients:
+        return dict(summary, to_send=len(recipients), sent=0, failed=0)
+
+    seminar = client.table('seminars').select('title').eq('id', seminar_id).limit(1).execute().data or [{}]
+    sender = ReminderSender(seminar_id, seminar[0].get('title'), settings.REMINDER_RATE_PER_SECOND)
+    size = max(settings.REMINDER_BATCH_SIZE, 1)
+    batches = [[(email, owed[email]) for email in recipients[i:i + size]] for i in range(0, len(recipients), size)]
+    pool = ThreadPoolExecutor(max_workers=max(1, min(settings.REMINDER_SMTP_CONNECTIONS, len(batches))),
+                              thread_name_prefix='reminders')
+    sent = 0
+    try:
+        futures = [pool.submit(sender.send_batch, batch) for batch in batches]
+        for future in as_completed(futures):
+            future.result()
+            # Ledger writes stay on this thread, with its database connection
+            done = sender.take_sent()
+            _record(seminar_id, done)
+            sent += len(done)
+            if progress:
+                progress(sent + len(sender.failed), len(recipients))
+    finally:
+        sender.stop.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+        done = sender.take_sent()
+        _record(seminar_id, done)
+        sent += len(done)
+        sender.close()
+    return dict(summary, to_send=len(recipients), sent=sent, failed=len(sender.failed))
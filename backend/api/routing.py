@@ -0,0 +1,202 @@
+# Read/write routing with an optional read replica
+# When SUPABASE_READ_URL is set, list and dashboard GETs read from that replica
+# so reporting traffic stays off the primary that serves the scan write path.
+# Writes, and everything that feeds a write decision (capacity, duplicate
+# checks), always use the primary. A client that wrote within
+# READ_STICKY_SECONDS reads from the primary so it sees its own writes; the
+# marker is kept in the shared Django cache so it holds across workers.
+# Replica lag is measured with the replica_lag_seconds() function
+# (scripts/add_replica_lag_function.sql); while it exceeds
+# REPLICA_MAX_LAG_SECONDS, cannot be measured, or the replica's own circuit
+# breaker is open, reads fall back to the primary.
+
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import upstream
+
+try:
+    from supabase import ClientOptions, create_client
+except Exception:
+    create_client = None
+
+logger = logging.getLogger(__name__)
+
+PRIMARY, REPLICA = 'primary', 'replica'
+READ_FROM_HEADER = 'X-Read-From'
+CLIENT_ID_HEADER = 'X-Client-Id'
+LAG_FUNCTION = 'replica_lag_seconds'
+
+
+def client_key(request):
+    """Cache key naming the client behind `request`, for read-your-writes stickiness"""
+    ident = request.headers.get(CLIENT_ID_HEADER)
+    if not ident:
+        # The frontend always sends a per-browser id (src/lib/db.js). Other callers
+        # (scripts, curl) fall back to their IP, which every browser behind the same
+        # NAT shares: one write then pins all of them to the primary, never the reverse
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+        ident = forwarded.split(',')[0].strip() or request.META.get('REMOTE_ADDR', '')
+    return 'sticky:' + hashlib.sha1(ident.encode('utf-8')).hexdigest()
+
+
+class _ReplicaQuery:
+    """Query recorded as a chain of builder calls, run on the replica and replayed
+    on the primary if the replica fails"""
+
+    def __init__(self, router, primary, table, steps=()):
+        self._router = router
+        self._primary = primary
+        self._table = table
+        self._steps = steps
+
+    def _build(self, client):
+        builder = client.table(self._table)
+        for name, args, kwargs in self._steps:
+            builder = getattr(builder, name)
+            if args is not None:
+                builder = builder(*args, **kwargs)
+        return builder
+
+    def execute(self):
+        try:
+            return self._build(self._router.replica).execute()
+        except Exception as e:
+            if not upstream.is_upstream_failure(e):
+                raise
+            self._router.stats['fallbacks'] += 1
+            logger.warning("Replica read of %s failed, retrying on the primary: %s", self._table, e)
+            return self._build(self._primary).execute()
+
+    def __getattr__(self, name):
+        # Properties such as not_ are recorded with args None
+        if name in ('not_',):
+            return _ReplicaQuery(self._router, self._primary, self._table, self._steps + ((name, None, None),))
+
+        def method(*args, **kwargs):
+            return _ReplicaQuery(self._router, self._primary, self._table, self._steps + ((name, args, kwargs),))
+        return method
+
+
+class _ReplicaClient:
+    def __init__(self, router, primary):
+        self._router = router
+        self._primary = primary
+
+    def table(self, name):
+        return _ReplicaQuery(self._router, self._primary, name)
+
+
+class ReadRouter:
+    """Chooses the primary or the replica for each read"""
+
+    def __init__(self, replica, sticky_seconds, max_lag, lag_check_interval):
+        self.replica = replica
+        self.sticky_seconds = sticky_seconds
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self._lock = threading.Lock()
+        self._lag = None
+        self._checked_at = None
+        self._checking = False
+        self.stats = {PRIMARY: 0, REPLICA: 0, 'sticky': 0, 'lagging': 0, 'fallbacks': 0, 'lag_check_failures': 0}
+
+    def lag(self):
+        """Replica lag in seconds, or None when it could not be measured.
+
+        Measured at most once per interval per process; other threads use the
+        last value meanwhile.
+        """
+        now = time.monotonic()
+        with self._lock:
+            due = not self._checking and (self._checked_at is None or now - self._checked_at >= self.lag_check_interval)
+            if due:
+                self._checking = True
+        if due:
+            try:
+                lag = float(self.replica.breaker.call(lambda: self.replica.rpc(LAG_FUNCTION).execute()).data or 0)
+            except Exception as e:
+                lag = None
+                self.stats['lag_check_failures'] += 1
+                logger.warning("Replica lag check failed, reading from the primary: %s", e)
+            with self._lock:
+                self._lag, self._checked_at, self._checking = lag, time.monotonic(), False
+        return self._lag
+
+    def choose(self, request):
+        """PRIMARY or REPLICA for a read made on behalf of `request`"""
+        choice = PRIMARY
+        if self.replica is not None and not self.replica.breaker.is_open():
+            if self.sticky_seconds > 0 and cache.get(client_key(request)):
+                self.stats['sticky'] += 1
+            else:
+                lag = self.lag()
+                if lag is None or lag > self.max_lag:
+                    self.stats['lagging'] += 1
+                else:
+                    choice = REPLICA
+        self.stats[choice] += 1
+        return choice
+
+    def client(self, request, primary):
+        """Client to read with on behalf of `request`; records the choice on the request"""
+        request.read_from = self.choose(request)
+        return _ReplicaClient(self, primary) if request.read_from == REPLICA else primary
+
+    def note_write(self, request):
+        """Pin the client's reads to the primary for the stickiness window"""
+        if self.replica is not None and self.sticky_seconds > 0:
+            cache.set(client_key(request), 1, self.sticky_seconds)
+
+    def cache_seconds(self, choice, timeout):
+        """How long a result computed from `choice` may be cached.
+
+        A replica result can miss the write that invalidated the previous one,
+        so it is kept no longer than the lag the router tolerates.
+        """
+        return min(timeout, max(1, int(self.max_lag))) if choice == REPLICA else timeout
+
+    def snapshot(self):
+        return {
+            'replica_configured': self.replica is not None,
+            'lag_seconds': self._lag,
+            'max_lag_seconds': self.max_lag,
+            'sticky_seconds': self.sticky_seconds,
+            'replica_breaker': self.replica.breaker.snapshot()['state'] if self.replica is not None else None,
+            'reads': dict(self.stats),
+        }
+
+
+def _create_replica():
+    if not (create_client and settings.SUPABASE_READ_URL and settings.SUPABASE_READ_KEY):
+        return None
+    client = create_client(settings.SUPABASE_READ_URL, settings.SUPABASE_READ_KEY, options=ClientOptions(
+        postgrest_client_timeout=settings.SUPABASE_TIMEOUT_SECONDS))
+    # A failing replica must not open the primary's breaker
+    return upstream.guard(client, upstream.CircuitBreaker(
+        settings.UPSTREAM_BREAKER_THRESHOLD, settings.UPSTREAM_BREAKER_RESET_SECONDS, name='replica'))
+
+
+router = ReadRouter(_create_replica(), settings.READ_STICKY_SECONDS, settings.REPLICA_MAX_LAG_SECONDS,
+                    settings.REPLICA_LAG_CHECK_SECONDS)
+
+
+class ReadRoutingMiddleware:
+    """Marks clients that wrote as sticky and reports where each read was served from"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and 200 <= response.status_code < 300:
+            router.note_write(request)
+        read_from = getattr(request, 'read_from', None)
+        if read_from:
+            response[READ_FROM_HEADER] = read_from
+        return response
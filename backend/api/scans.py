@@ -0,0 +1,68 @@
+# Duplicate-scan suppression
+# Attendees often scan the same QR code several times within a few seconds,
+# and scanners re-fire on the same frame. The result of each recorded scan is
+# kept per (seminar_id, participant_email, action) for SCAN_DEDUP_SECONDS so
+# repeats are answered from memory instead of repeating the upstream lookup.
+# Entries live in one bounded, lock-protected LRU per worker process.
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+ACTIONS = ('time_in', 'time_out', 'check_in', 'check_out')
+
+
+class RecentScans:
+    """Bounded TTL map of recent scan results, shared by all request threads"""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.stats = {'suppressed': 0, 'recorded': 0, 'evicted': 0}
+
+    def _expire(self, now):
+        # TTL is fixed and entries are re-appended on write, so oldest come first
+        while self._entries:
+            key, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[key]
+
+    def get(self, seminar_id, participant_email, action):
+        """Cached result of a scan made inside the window, or None"""
+        if self.ttl <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((seminar_id, participant_email, action))
+            if entry is None or entry[0] <= now:
+                return None
+            self.stats['suppressed'] += 1
+            return entry[1]
+
+    def record(self, seminar_id, participant_email, action, result):
+        """Remember a scan result; a different action for the same person supersedes it"""
+        if self.ttl <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            for other in ACTIONS:
+                self._entries.pop((seminar_id, participant_email, other), None)
+            self._entries[(seminar_id, participant_email, action)] = (now + self.ttl, result)
+            self.stats['recorded'] += 1
+            self._expire(now)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evicted'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            return {'window_seconds': self.ttl, 'entries': len(self._entries), **self.stats}
+
+
+recent_scans = RecentScans(settings.SCAN_DEDUP_SECONDS, settings.SCAN_DEDUP_MAX_ENTRIES)
@@ -0,0 +1,246 @@
+# In-memory seminar search index
+# Each worker keeps a token index over title and speaker plus parsed start/end
+# times. Writes made through this worker are applied directly; writes made by
+# other workers (or straight to Supabase) are picked up with a delta-sync
+# refresh whenever the shared 'seminars' generation changes or the index is
+# older than SEMINAR_SEARCH_MAX_STALENESS seconds.
+
+import bisect
+import logging
+import re
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+
+from .analytics import fetch_all
+from .cache_utils import generation
+from .delta import fetch_tombstones, parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+INDEX_COLUMNS = 'id,title,speaker,date,start_datetime,end_datetime,start_time,end_time,duration,capacity,updated_at'
+INDEX_FIELDS = tuple(INDEX_COLUMNS.split(','))
+STATUSES = ('upcoming', 'ongoing', 'past')
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall((text or '').lower())
+
+
+def _to_epoch(value):
+    if not value:
+        return None
+    try:
+        return parse_timestamp(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _bounds(row):
+    """(start, end) epoch seconds; falls back to the date and duration"""
+    start = _to_epoch(row.get('start_datetime')) or _to_epoch(row.get('date'))
+    end = _to_epoch(row.get('end_datetime'))
+    if end is None and start is not None:
+        try:
+            minutes = int(row.get('duration') or 0)
+        except (TypeError, ValueError):
+            minutes = 0
+        # Without an explicit end, a dated seminar runs until the end of its day
+        end = start + minutes * 60 if minutes and row.get('start_datetime') else start + 86400
+    return start, end
+
+
+class SeminarIndex:
+    """Token and time index over the seminar catalog"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._docs = {}
+        self._tokens = {}
+        self._postings = {}
+        self._vocabulary = []
+        self._vocabulary_dirty = False
+        self._order = []
+        self._starts = []
+        self._order_dirty = False
+        self._loaded = False
+        self._generation = None
+        self._refreshed_at = 0.0
+        self._high_water = None
+
+    # ---- maintenance ----
+
+    def _add(self, row):
+        row = {field: row.get(field) for field in INDEX_FIELDS}
+        self._remove(row['id'])
+        self._order_dirty = True
+        start, end = _bounds(row)
+        self._docs[row['id']] = (row, start, end)
+        tokens = set(tokenize(row.get('title')) + tokenize(row.get('speaker')))
+        self._tokens[row['id']] = tokens
+        for token in tokens:
+            if token not in self._postings:
+                self._postings[token] = set()
+                self._vocabulary_dirty = True
+            self._postings[token].add(row['id'])
+        stamp = row.get('updated_at')
+        if stamp and (self._high_water is None or parse_timestamp(stamp) > parse_timestamp(self._high_water)):
+            self._high_water = stamp
+
+    def _remove(self, seminar_id):
+        if self._docs.pop(seminar_id, None) is not None:
+            self._order_dirty = True
+        for token in self._tokens.pop(seminar_id, ()):
+            ids = self._postings.get(token)
+            if ids is not None:
+                ids.discard(seminar_id)
+                if not ids:
+                    del self._postings[token]
+                    self._vocabulary_dirty = True
+
+    def apply(self, rows):
+        """Add or replace seminars written by this worker"""
+        with self._lock:
+            for row in rows or []:
+                if row and row.get('id'):
+                    self._add(row)
+
+    def remove(self, seminar_id):
+        with self._lock:
+            self._remove(seminar_id)
+
+    def load(self, client):
+        rows = fetch_all(lambda: client.table('seminars').select(INDEX_COLUMNS).order('id'))
+        with self._lock:
+            self._docs, self._tokens, self._postings = {}, {}, {}
+            self._vocabulary_dirty = True
+            self._high_water = None
+            for row in rows:
+                self._add(row)
+            self._loaded = True
+            self._refreshed_at = time.monotonic()
+
+    def _refresh(self, client):
+        since = self._high_water
+        if since is None:
+            return self.load(client)
+        try:
+            rows = client.table('seminars').select(INDEX_COLUMNS).gte('updated_at', since).execute().data or []
+            tombstones = fetch_tombstones(client, since, table='seminars')
+        except Exception:
+            logger.warning("Seminar index delta refresh failed; reloading", exc_info=True)
+            return self.load(client)
+        with self._lock:
+            for row in rows:
+                self._add(row)
+            for tombstone in tombstones:
+                self._remove(tombstone['row_id'])
+            self._refreshed_at = time.monotonic()
+
+    def ensure_fresh(self, client):
+        """Load on first use, then delta-refresh when other workers have written"""
+        token = generation('seminars')
+        stale = time.monotonic() - self._refreshed_at > settings.SEMINAR_SEARCH_MAX_STALENESS
+        if self._loaded and token == self._generation and not stale:
+            return
+        # Searches keep reading the current index while one thread refreshes it
+        with self._refresh_lock:
+            if not self._loaded:
+                self.load(client)
+            elif token != self._generation or stale:
+                self._refresh(client)
+            self._generation = token
+
+    # ---- queries ----
+
+    def lookup(self, seminar_ids):
+        """{id: (row, start, end)} for the indexed seminars among `seminar_ids`"""
+        with self._lock:
+            return {sid: self._docs[sid] for sid in seminar_ids if sid in self._docs}
+
+    def _prefix_ids(self, prefix):
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+        ids = set()
+        i = bisect.bisect_left(self._vocabulary, prefix)
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(prefix):
+            ids |= self._postings[self._vocabulary[i]]
+            i += 1
+        return ids
+
+    def _ordered(self):
+        """Seminar ids sorted by start time (undated seminars last)"""
+        if self._order_dirty:
+            self._order = sorted((start if start is not None else float('inf'), seminar_id)
+                                 for seminar_id, (_, start, _) in self._docs.items())
+            self._starts = [start for start, _ in self._order]
+            self._order_dirty = False
+        return self._order
+
+    def search(self, q=None, date_from=None, date_to=None, status=None, now=None, limit=50, offset=0):
+        """Return (total, rows). Every query term must prefix-match a title or speaker word."""
+        now = now if now is not None else time.time()
+
+        def keep(start, end):
+            if start is None:
+                return date_from is None and date_to is None and not status
+            if date_from is not None and start < date_from:
+                return False
+            if date_to is not None and start >= date_to:
+                return False
+            if status == 'upcoming':
+                return start > now
+            if status == 'ongoing':
+                return start <= now <= end
+            if status == 'past':
+                return end < now
+            return True
+
+        with self._lock:
+            candidates = None
+            for term in tokenize(q):
+                ids = self._prefix_ids(term)
+                candidates = ids if candidates is None else candidates & ids
+                if not candidates:
+                    return 0, []
+
+            if candidates is not None:
+                hits = sorted((start if start is not None else float('inf'), seminar_id)
+                              for seminar_id in candidates
+                              for _, start, end in (self._docs[seminar_id],) if keep(start, end))
+            else:
+                # Bisect the start-sorted list down to a window, then filter it exactly
+                order = self._ordered()
+                first, last = 0, len(order)
+                if date_from is not None:
+                    first = bisect.bisect_left(self._starts, date_from)
+                if status == 'upcoming':
+                    first = max(first, bisect.bisect_right(self._starts, now))
+                if date_to is not None:
+                    last = bisect.bisect_left(self._starts, date_to)
+                if status in ('ongoing', 'past'):
+                    last = min(last, bisect.bisect_right(self._starts, now))
+                hits = [h for h in order[first:last] if keep(*self._docs[h[1]][1:])]
+
+            # Past seminars read most-recent first; everything else chronologically
+            if status == 'past':
+                hits.reverse()
+            page = [self._docs[seminar_id][0] for _, seminar_id in hits[offset:offset + limit]]
+        return len(hits), page
+
+
+def parse_range_bound(value, end_of_day=False):
+    """Epoch seconds for a YYYY-MM-DD or ISO timestamp filter value"""
+    parsed = parse_timestamp(value)
+    if end_of_day and len(value.strip()) == 10:
+        parsed += timedelta(days=1)
+    return parsed.timestamp()
+
+
+seminar_index = SeminarIndex()
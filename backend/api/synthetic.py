@@ -0,0 +1,90 @@
+# Synthetic data for benchmarks and offline tooling
+# Deterministic for a given seed: seminars, registrants, scans and evaluation
+# answers shaped like the Supabase rows the views read and write. Sizes are
+# in registrant rows; a dataset of n rows has about n / 1000 seminars (at
+# least one), 0.8 n attendance rows and 0.4 n evaluations.
+
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+QUESTIONS = ('q1', 'q2', 'q3', 'q4', 'q5')
+COMMENTS = ('Great session', 'Too long', 'Very helpful', 'Audio was bad', '')
+
+
+def _iso(value):
+    return value.isoformat().replace('+00:00', 'Z')
+
+
+def _uuid(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def seminar(rng, index, start):
+    return {
+        'id': _uuid(rng),
+        'title': f'Seminar {index}: {rng.choice(("Research Methods", "Data Ethics", "Grant Writing", "Pedagogy"))}',
+        'speaker': f'Speaker {rng.randrange(200)}',
+        'duration': 120,
+        'capacity': rng.choice((50, 100, 300, None)),
+        'date': start.date().isoformat(),
+        'start_datetime': _iso(start),
+        'end_datetime': _iso(start + timedelta(hours=2)),
+        'start_time': start.strftime('%H:%M'),
+        'end_time': (start + timedelta(hours=2)).strftime('%H:%M'),
+        'questions': [{'id': q, 'type': 'rating'} for q in QUESTIONS],
+        'metadata': {'venue': f'Room {rng.randrange(1, 40)}'},
+        'certificate_template_url': None,
+        'created_at': _iso(start - timedelta(days=30)),
+        'updated_at': _iso(start - timedelta(days=30)),
+    }
+
+
+def seminar_body(rng, index):
+    """A create-seminar request body, as the admin frontend sends it"""
+    start = datetime(2025, 1, 1, 9, tzinfo=timezone.utc) + timedelta(days=index % 365)
+    row = seminar(rng, index, start)
+    body = {k: row[k] for k in ('title', 'speaker', 'date', 'start_datetime', 'end_datetime', 'start_time',
+                                'end_time', 'questions', 'metadata')}
+    body.update(duration=str(row['duration']), participants=str(row['capacity'] or 100))
+    return body
+
+
+def answers(rng):
+    return {**{q: rng.randint(1, 5) for q in QUESTIONS}, 'comments': rng.choice(COMMENTS)}
+
+
+def dataset(rows, seminars=None, seed=0):
+    """Tables for `rows` registrants spread over `seminars` seminars"""
+    rng = random.Random(seed)
+    count = seminars or max(1, rows // 1000)
+    base = datetime(2025, 1, 6, 9, tzinfo=timezone.utc)
+    tables = {'seminars': [seminar(rng, i, base + timedelta(days=i)) for i in range(count)],
+              'joined_participants': [], 'attendance': [], 'evaluations': []}
+    for i in range(rows):
+        s = tables['seminars'][i % count]
+        start = datetime.fromisoformat(s['start_datetime'].replace('Z', '+00:00'))
+        # Unique within a seminar; the same people register across seminars
+        email = f'participant{i // count}@example.edu'
+        joined_at = start - timedelta(minutes=rng.randrange(60 * 24 * 14))
+        present = rng.random() < 0.8
+        tables['joined_participants'].append({
+            'id': i + 1, 'seminar_id': s['id'], 'participant_email': email, 'participant_name': f'Participant {i}',
+            'metadata': None, 'joined_at': _iso(joined_at), 'updated_at': _iso(joined_at), 'present': present,
+            'check_in': _iso(start + timedelta(minutes=rng.randrange(-10, 30))) if present else None,
+            'check_out': None,
+        })
+        if present:
+            time_in = start + timedelta(minutes=rng.randrange(-10, 30))
+            time_out = time_in + timedelta(minutes=rng.randrange(30, 130)) if rng.random() < 0.9 else None
+            tables['attendance'].append({
+                'id': len(tables['attendance']) + 1, 'seminar_id': s['id'], 'participant_email': email,
+                'time_in': _iso(time_in), 'time_out': _iso(time_out) if time_out else None,
+                'created_at': _iso(time_in), 'updated_at': _iso(time_out or time_in),
+            })
+            if rng.random() < 0.5:
+                tables['evaluations'].append({
+                    'id': len(tables['evaluations']) + 1, 'seminar_id': s['id'], 'participant_email': email,
+                    'answers': answers(rng), 'created_at': _iso(start + timedelta(hours=3)),
+                })
+    return tables
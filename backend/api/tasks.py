@@ -0,0 +1,106 @@
+# Built-in background job handlers
+# Registered with api.jobs and run by `manage.py run_jobs`. Handlers must be
+# safe to retry: each one recomputes what is left to do from Supabase.
+
+import csv
+import os
+import re
+from datetime import datetime
+
+from django.conf import settings
+
+from . import analytics, archive, counters, qrcodes, reminders
+from .cache_utils import bump
+from .jobs import handler
+
+UPDATE_CHUNK = 200
+EXPORT_COLUMNS = ('participant_email', 'participant_name', 'joined_at', 'present', 'check_in', 'check_out',
+                  'time_in', 'time_out')
+
+
+def output_path(name):
+    return os.path.join(settings.JOBS_OUTPUT_DIR, os.path.basename(name))
+
+
+@handler('mass_time_out', required=('seminar_id',))
+def mass_time_out(ctx):
+    """Time out everyone who timed in to a seminar and has not timed out"""
+    seminar_id = ctx.params['seminar_id']
+    rows = analytics.fetch_all(lambda: ctx.client.table('attendance').select('id').eq('seminar_id', seminar_id)
+                               .not_.is_('time_in', 'null').is_('time_out', 'null').order('id'))
+    ids = [r['id'] for r in rows]
+    now_iso = datetime.utcnow().isoformat() + 'Z'
+    done = timed_out = 0
+    ctx.progress(0, len(ids), f'{len(ids)} participant(s) to time out')
+    for start in range(0, len(ids), UPDATE_CHUNK):
+        chunk = ids[start:start + UPDATE_CHUNK]
+        # The time_out filter keeps a retried chunk from overwriting earlier time-outs
+        updated = ctx.client.table('attendance').update({'time_out': now_iso}).in_('id', chunk) \
+            .is_('time_out', 'null').execute().data or []
+        counters.adjust(seminar_id, timed_out=len(updated))
+        timed_out += len(updated)
+        done += len(chunk)
+        ctx.progress(done, len(ids))
+    analytics.invalidate(seminar_id)
+    bump('participants')
+    # Rows timed out by a scan (or an earlier attempt) since the read are not counted
+    return {'seminar_id': seminar_id, 'candidates': len(ids), 'timed_out': timed_out}
+
+
+@handler('export_attendance', required=('seminar_id',))
+def export_attendance(ctx):
+    """Write a seminar's registrations and attendance to a CSV file"""
+    seminar_id = ctx.params['seminar_id']
+    if archive.is_archived(seminar_id):
+        joined = archive.read_rows(seminar_id, 'joined_participants')
+        attendance = archive.read_rows(seminar_id, 'attendance')
+    else:
+        joined = analytics.fetch_all(lambda: ctx.client.table('joined_participants').select('*').eq('seminar_id', seminar_id).order('id'))
+        attendance = analytics.fetch_all(lambda: ctx.client.table('attendance').select('*').eq('seminar_id', seminar_id).order('id'))
+
+    people = {}
+    for row in joined + attendance:
+        people.setdefault(row.get('participant_email'), {}).update({k: v for k, v in row.items() if v is not None})
+
+    name = f"attendance-{re.sub(r'[^A-Za-z0-9_-]', '_', seminar_id)}-{ctx.job.pk}.csv"
+    path = output_path(name)
+    os.makedirs(settings.JOBS_OUTPUT_DIR, exist_ok=True)
+    with open(path + '.tmp', 'w', newline='') as fh:
+        writer = csv.DictWriter(fh, fieldnames=EXPORT_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        for i, email in enumerate(sorted(people, key=lambda e: e or '')):
+            writer.writerow(people[email])
+            if i % 500 == 0:
+                ctx.progress(i, len(people))
+    os.replace(path + '.tmp', path)
+    return {'seminar_id': seminar_id, 'rows': len(people), 'file': name}
+
+
+@handler('qr_sheet', required=('seminar_id',))
+def qr_sheet(ctx):
+    """Render a seminar's printable QR badge sheet to a PDF file"""
+    seminar_id = ctx.params['seminar_id']
+    paper = ctx.params.get('paper', 'letter')
+    if archive.is_archived(seminar_id):
+        registrants = archive.read_rows(seminar_id, 'joined_participants')
+    else:
+        registrants = analytics.fetch_all(lambda: ctx.client.table('joined_participants')
+                                          .select('participant_email, participant_name').eq('seminar_id', seminar_id).order('id'))
+    badges = qrcodes.sheet_badges(seminar_id, registrants)
+    ctx.progress(0, len(badges), f'{len(badges)} badge(s) to render')
+    # Also caches the sheet, so the next GET of qr/sheet/ is served from it
+    _, pdf = qrcodes.sheet(badges, paper, ctx.params.get('title'), parallel=True)
+
+    name = f"qr-{re.sub(r'[^A-Za-z0-9_-]', '_', seminar_id)}-{ctx.job.pk}.pdf"
+    os.makedirs(settings.JOBS_OUTPUT_DIR, exist_ok=True)
+    with open(output_path(name) + '.tmp', 'wb') as fh:
+        fh.write(pdf)
+    os.replace(output_path(name) + '.tmp', output_path(name))
+    return {'seminar_id': seminar_id, 'badges': len(badges), 'file': name}
+
+
+@handler('evaluation_reminders', required=('seminar_id',))
+def evaluation_reminders(ctx):
+    """Email participants who timed out of a seminar and have not evaluated it"""
+    return reminders.send_reminders(ctx.client, ctx.params['seminar_id'], progress=ctx.progress,
+                                    dry_run=bool(ctx.params.get('dry_run')))
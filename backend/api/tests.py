@@ -1,7 +1,44 @@
-from django.test import TestCase, Client
-from django.urls import reverse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest.mock import patch
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from django.core.cache import cache
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError
+from django.http import HttpResponse
+from django.test import TestCase, TransactionTestCase, Client, RequestFactory, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+import httpx
 import json
 
+from . import (archive, audit, counters, jobs, logs, microbench, profiling, qrcodes, query_audit, reminders, routing,
+               synthetic, tasks, upstream, views)
+from .batching import MicroBatcher
+from .fakes import FakeAPIError, FakeQuery, FakeReplica, FakeSMTPServer, FakeSupabaseClient
+from .models import ApiLog, IdempotencyRecord, ReminderSent, SeminarCounter
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# Requests made by the tests stay out of the audit trail (AuditTestCase turns it back on)
+_audit_off = override_settings(API_LOG_BUFFER_SIZE=0)
+
+
+def setUpModule():
+    _audit_off.enable()
+
+
+def tearDownModule():
+    _audit_off.disable()
+
 
 class SeminarsAPITestCase(TestCase):
     """Test cases for seminars endpoints"""
@@ -40,3 +77,1570 @@ class AttendanceAPITestCase(TestCase):
             content_type='application/json'
         )
         self.assertIn(response.status_code, [400, 500])
+
+
+class ParticipantImportTestCase(TestCase):
+    """Test cases for bulk participant import"""
+
+    def setUp(self):
+        self.client = Client()
+        self.fake = FakeSupabaseClient()
+        patcher = patch.object(views, 'sb', self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = reverse('import_participants', args=['sem-1'])
+
+    def test_csv_import_is_idempotent(self):
+        """Test re-importing the same CSV does not duplicate registrations"""
+        csv_body = 'participant_email,participant_name\na@example.com,Ann\nb@example.com,Ben\n'
+        for _ in range(2):
+            response = self.client.post(self.url, data=csv_body, content_type='text/csv')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['data']['imported'], 2)
+        self.assertEqual(len(self.fake.tables['joined_participants']), 2)
+
+    def test_reimport_without_names_keeps_stored_values(self):
+        """Test a roster without a name column leaves stored names and metadata alone"""
+        first = 'participant_email,participant_name,metadata\nA@Example.com ,Ann,"{""dept"": ""CS""}"\nb@example.com,Ben,\n'
+        self.client.post(self.url, data=first, content_type='text/csv')
+        response = self.client.post(self.url, data='email\na@example.com\nB@EXAMPLE.COM\nc@example.com\n',
+                                    content_type='text/csv')
+        self.assertEqual(response.json()['data']['imported'], 3)
+        rows = {r['participant_email']: r for r in self.fake.tables['joined_participants']}
+        self.assertEqual(sorted(rows), ['a@example.com', 'b@example.com', 'c@example.com'])
+        self.assertEqual((rows['a@example.com']['participant_name'], rows['a@example.com']['metadata']),
+                         ('Ann', {'dept': 'CS'}))
+        self.assertEqual(rows['b@example.com']['participant_name'], 'Ben')
+        self.assertIsNone(rows['c@example.com'].get('participant_name'))
+
+    def test_invalid_rows_are_reported(self):
+        """Test per-row validation errors are returned with row numbers"""
+        rows = [{'participant_email': 'ok@example.com'}, {'participant_email': 'not-an-email'}, {}]
+        response = self.client.post(self.url, data=json.dumps(rows), content_type='application/json')
+        data = response.json()['data']
+        self.assertEqual(data['imported'], 1)
+        self.assertEqual([e['row'] for e in data['errors']], [2, 3])
+
+    def test_large_import_is_chunked(self):
+        """Test a 5,000-row NDJSON import is written in chunked upserts"""
+        body = '\n'.join(json.dumps({'email': f'user{i}@example.com'}) for i in range(5000))
+        response = self.client.post(self.url, data=body, content_type='application/x-ndjson')
+        data = response.json()['data']
+        self.assertEqual(data['imported'], 5000)
+        self.assertEqual(data['chunks'], 10)
+        self.assertEqual(self.fake.calls.count(('joined_participants', 'upsert')), 10)
+
+
+class IdempotencyTestCase(TestCase):
+    """Test cases for Idempotency-Key replay on write endpoints"""
+
+    def setUp(self):
+        self.client = Client()
+        self.fake = FakeSupabaseClient()
+        patcher = patch.object(views, 'sb', self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = reverse('save_evaluation', args=['sem-1'])
+        self.body = json.dumps({'participant_email': 'a@example.com', 'answers': {'q1': 5}})
+
+    def test_retry_is_replayed_without_second_write(self):
+        """Test a retried POST returns the stored response"""
+        first = self.client.post(self.url, data=self.body, content_type='application/json', HTTP_IDEMPOTENCY_KEY='k-1')
+        second = self.client.post(self.url, data=self.body, content_type='application/json', HTTP_IDEMPOTENCY_KEY='k-1')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(len(self.fake.tables['evaluations']), 1)
+
+    def test_key_reuse_with_different_body_is_rejected(self):
+        """Test reusing a key for a different payload returns 422"""
+        self.client.post(self.url, data=self.body, content_type='application/json', HTTP_IDEMPOTENCY_KEY='k-2')
+        other = json.dumps({'participant_email': 'b@example.com', 'answers': {}})
+        response = self.client.post(self.url, data=other, content_type='application/json', HTTP_IDEMPOTENCY_KEY='k-2')
+        self.assertEqual(response.status_code, 422)
+
+    def test_key_on_csv_import_is_rejected(self):
+        """Test a key on a streaming upload returns 400 instead of replaying another file"""
+        url = reverse('import_participants', args=['sem-1'])
+        first = self.client.post(url, data='email\na@example.com\n', content_type='text/csv',
+                                 HTTP_IDEMPOTENCY_KEY='k-csv')
+        second = self.client.post(url, data='email\nb@example.com\n', content_type='text/csv',
+                                  HTTP_IDEMPOTENCY_KEY='k-csv')
+        self.assertEqual((first.status_code, second.status_code), (400, 400))
+        self.assertNotIn('joined_participants', self.fake.tables)
+
+    def test_expired_records_are_pruned(self):
+        """Test TTL eviction removes expired records"""
+        from django.utils import timezone
+        from .idempotency import prune
+        from .models import IdempotencyRecord
+        IdempotencyRecord.objects.create(key='old', path='/api/x/', fingerprint='f', status_code=200,
+                                         expires_at=timezone.now())
+        prune()
+        self.assertFalse(IdempotencyRecord.objects.filter(key='old').exists())
+
+
+class EvaluationBatchingTestCase(TestCase):
+    """Test cases for the micro-batched evaluation writer"""
+
+    def _writer(self, fake, **kwargs):
+        return MicroBatcher(
+            lambda rows: [[r] for r in fake.table('evaluations').insert(rows).execute().data],
+            lambda row: fake.table('evaluations').insert(row).execute().data,
+            **kwargs
+        )
+
+    def test_concurrent_submissions_share_inserts(self):
+        """Test concurrent submissions are flushed as multi-row inserts"""
+        fake = FakeSupabaseClient(latency=0.01)
+        writer = self._writer(fake, window=0.02, max_size=50)
+        payloads = [{'seminar_id': 's', 'participant_email': f'u{i}@example.com', 'answers': {}} for i in range(40)]
+        with ThreadPoolExecutor(max_workers=40) as pool:
+            results = list(pool.map(writer.submit, payloads))
+        self.assertEqual([r[0]['participant_email'] for r in results], [p['participant_email'] for p in payloads])
+        self.assertEqual(len(fake.tables['evaluations']), 40)
+        self.assertLess(len(fake.calls), 40)
+
+    def test_lone_submission_skips_the_window(self):
+        """Test a submission with nothing else queued is not held for the window"""
+        fake = FakeSupabaseClient()
+        writer = self._writer(fake, window=5, max_size=50)
+        start = time.monotonic()
+        writer.submit({'seminar_id': 's', 'participant_email': 'a@example.com', 'answers': {}})
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(writer.stats['max_batch'], 1)
+
+    def test_failed_batch_falls_back_to_per_row_writes(self):
+        """Test a failing batch insert is retried row by row"""
+        fake = FakeSupabaseClient()
+
+        def write_many(rows):
+            raise RuntimeError('batch rejected')
+
+        writer = MicroBatcher(write_many, lambda row: fake.table('evaluations').insert(row).execute().data,
+                              window=0.01, max_size=10)
+        result = writer.submit({'seminar_id': 's', 'participant_email': 'a@example.com', 'answers': {}})
+        self.assertEqual(result[0]['participant_email'], 'a@example.com')
+        self.assertEqual(writer.stats['fallbacks'], 1)
+
+    def test_fallback_skips_rows_the_failed_batch_wrote(self):
+        """Test a batch that wrote its rows before failing is not written twice"""
+        fake = FakeSupabaseClient()
+
+        def write_many(rows):
+            fake.table('evaluations').insert(rows).execute()
+            raise RuntimeError('response lost')
+
+        with patch.object(views, 'sb', fake):
+            writer = MicroBatcher(write_many, views._insert_evaluation, window=0.01, max_size=10,
+                                  fallback=views._insert_evaluation_once)
+            result = writer.submit({'seminar_id': 's', 'participant_email': 'a@example.com', 'answers': {'q1': 5}})
+        self.assertEqual(result[0]['answers'], {'q1': 5})
+        self.assertEqual(len(fake.tables['evaluations']), 1)
+
+
+class EvaluationWriteTimeoutTestCase(TransactionTestCase):
+    """Test a submission that outlives the caller's wait keeps its Idempotency-Key"""
+
+    def test_timed_out_write_is_replayed_not_repeated(self):
+        fake = FakeSupabaseClient()
+        release = threading.Event()
+
+        def write_many(rows):
+            release.wait(5)
+            return [[r] for r in fake.table('evaluations').insert(rows).execute().data]
+
+        writer = MicroBatcher(write_many, views._insert_evaluation, window=0.001, max_size=10, timeout=0.05)
+
+        def post():
+            return Client().post(reverse('save_evaluation', args=['sem-1']), content_type='application/json',
+                                 data=json.dumps({'participant_email': 'a@x.com', 'answers': {'q1': 4}}),
+                                 HTTP_IDEMPOTENCY_KEY='eval-1')
+
+        with patch.object(views, 'sb', fake), patch.object(views, 'evaluation_writer', writer):
+            self.assertEqual(post().status_code, 503)
+            self.assertEqual(post().status_code, 409)
+            release.set()
+            for _ in range(200):
+                if IdempotencyRecord.objects.filter(key='eval-1', status_code=201).exists():
+                    break
+                time.sleep(0.01)
+            replay = post()
+        self.assertEqual((replay.status_code, replay['Idempotent-Replayed']), (201, 'true'))
+        self.assertEqual(len(fake.tables['evaluations']), 1)
+
+
+class DeltaSyncTestCase(TestCase):
+    """Test cases for since= delta sync on list endpoints"""
+
+    def setUp(self):
+        self.client = Client()
+        self.fake = FakeSupabaseClient({'seminars': [
+            {'id': 'old', 'title': 'Old', 'date': '2025-01-01', 'updated_at': '2025-01-01T00:00:00+00:00'},
+            {'id': 'new', 'title': 'New', 'date': '2025-02-01', 'updated_at': '2025-02-01T00:00:00+00:00'},
+        ]})
+        patcher = patch.object(views, 'sb', self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_full_list_returns_cursor(self):
+        """Test a plain list response carries next_since"""
+        body = self.client.get(reverse('seminars_list_create')).json()
+        self.assertEqual(len(body['data']), 2)
+        self.assertEqual(body['next_since'], '2025-02-01T00:00:00+00:00')
+        self.assertNotIn('deleted', body)
+
+    def test_since_returns_changed_rows_and_tombstones(self):
+        """Test since= returns only newer rows plus deletions"""
+        self.client.delete(reverse('seminar_detail', args=['old']))
+        body = self.client.get(reverse('seminars_list_create'), {'since': '2025-01-15T00:00:00Z'}).json()
+        self.assertEqual([r['id'] for r in body['data']], ['new'])
+        self.assertEqual([t['row_id'] for t in body['deleted']], ['old'])
+        self.assertGreater(body['next_since'], '2025-02-01T00:00:00+00:00')
+
+    def test_invalid_since_is_rejected(self):
+        """Test a malformed since parameter returns 400"""
+        response = self.client.get(reverse('seminars_list_create'), {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AnalyticsTestCase(TestCase):
+    """Test cases for server-side attendance analytics"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.fake = FakeSupabaseClient({
+            'seminars': [{'id': 's1', 'title': 'Talk', 'date': '2025-12-10',
+                          'start_datetime': '2025-12-10T10:00:00+00:00', 'end_datetime': '2025-12-10T11:00:00+00:00'}],
+            'joined_participants': [{'seminar_id': 's1', 'participant_email': e}
+                                    for e in ('a@x.com', 'b@x.com', 'c@x.com', 'd@x.com')],
+            'attendance': [
+                {'seminar_id': 's1', 'participant_email': 'a@x.com',
+                 'time_in': '2025-12-10T10:00:00Z', 'time_out': '2025-12-10T11:00:00Z'},
+                {'seminar_id': 's1', 'participant_email': 'b@x.com',
+                 'time_in': '2025-12-10T10:12:00Z', 'time_out': '2025-12-10T10:42:00Z'},
+            ],
+        })
+        patcher = patch.object(views, 'sb', self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = reverse('seminar_analytics', args=['s1'])
+
+    def test_seminar_analytics(self):
+        """Test durations, histograms and no-show rate"""
+        data = self.client.get(self.url).json()['data']
+        self.assertEqual(data['minutes_attended'], {'a@x.com': 60.0, 'b@x.com': 30.0})
+        self.assertEqual(data['mean_minutes'], 45.0)
+        self.assertEqual(data['no_show_rate'], 0.5)
+        self.assertEqual(data['late_arrival_histogram']['on_time'], 1)
+        self.assertEqual(data['late_arrival_histogram']['10-15'], 1)
+        self.assertEqual(data['early_leave_histogram']['15-30'], 1)
+        self.assertEqual(max(p['present'] for p in data['present_over_time']), 2)
+
+    def test_scan_invalidates_cached_analytics(self):
+        """Test a new time-in is reflected in the next analytics call"""
+        self.client.get(self.url)
+        self.client.post(reverse('seminar_time_in', args=['s1']), data=json.dumps({'participant_email': 'c@x.com'}),
+                         content_type='application/json')
+        data = self.client.get(self.url).json()['data']
+        self.assertEqual(data['attended'], 3)
+
+    def test_rollup(self):
+        """Test the date-range rollup"""
+        data = self.client.get(reverse('analytics_rollup'), {'from': '2025-12-01', 'to': '2025-12-31'}).json()['data']
+        self.assertEqual(data['seminars'], 1)
+        self.assertEqual(data['per_seminar'][0]['no_show_rate'], 0.5)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ParticipantHistoryTestCase(TestCase):
+    """Test cases for the participant history endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.fake = FakeSupabaseClient({
+            'seminars': [{'id': 's1', 'title': 'One', 'date': '2025-11-01'},
+                         {'id': 's2', 'title': 'Two', 'date': '2025-12-01'}],
+            'joined_participants': [{'seminar_id': 's1', 'participant_email': 'a@x.com'},
+                                    {'seminar_id': 's2', 'participant_email': 'a@x.com'}],
+            'attendance': [{'seminar_id': 's1', 'participant_email': 'a@x.com', 'time_in': '2025-11-01T10:00:00Z'}],
+            'evaluations': [{'seminar_id': 's1', 'participant_email': 'a@x.com', 'answers': {}}],
+        })
+        patcher = patch.object(views, 'sb', self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = reverse('participant_history', args=['a@x.com'])
+
+    def test_history_combines_joins_attendance_and_evaluations(self):
+        """Test history returns one entry per seminar, newest first"""
+        seminars = self.client.get(self.url).json()['data']['seminars']
+        self.assertEqual([s['id'] for s in seminars], ['s2', 's1'])
+        self.assertTrue(seminars[1]['evaluated'])
+        self.assertEqual(seminars[1]['time_in'], '2025-11-01T10:00:00Z')
+        self.assertFalse(seminars[0]['evaluated'])
+
+    def test_own_write_invalidates_cached_history(self):
+        """Test an evaluation submit is visible in the next history call"""
+        self.client.get(self.url)
+        calls = len(self.fake.calls)
+        self.client.get(self.url)
+        self.assertEqual(len(self.fake.calls), calls)
+        self.client.post(reverse('save_evaluation', args=['s2']),
+                         data=json.dumps({'participant_email': 'a@x.com', 'answers': {}}),
+                         content_type='application/json')
+        seminars = self.client.get(self.url).json()['data']['seminars']
+        self.assertTrue(all(s['evaluated'] for s in seminars))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ParticipantHomeTestCase(TestCase):
+    """Test cases for the participant home endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        stamp = '2020-01-01T00:00:00Z'
+        self.fake = FakeSupabaseClient({
+            'seminars': [
+                {'id': 'past', 'title': 'Past', 'start_datetime': '2020-03-01T09:00:00Z',
+                 'end_datetime': '2020-03-01T11:00:00Z', 'updated_at': stamp},
+                {'id': 'now', 'title': 'Now', 'start_datetime': '2020-06-01T09:00:00Z',
+                 'end_datetime': '2999-06-01T11:00:00Z', 'updated_at': stamp},
+                {'id': 'soon', 'title': 'Soon', 'start_datetime': '2999-01-01T09:00:00Z',
+                 'end_datetime': '2999-01-01T11:00:00Z', 'updated_at': stamp},
+            ],
+            'joined_participants': [{'seminar_id': 'now', 'participant_email': 'home@x.com', 'joined_at': stamp}],
+            'attendance': [
+                {'seminar_id': 'past', 'participant_email': 'home@x.com', 'time_in': '2020-03-01T09:05:00Z',
+                 'time_out': '2020-03-01T11:00:00Z'},
+                {'seminar_id': 'now', 'participant_email': 'home@x.com', 'time_in': '2020-06-01T09:05:00Z'},
+            ],
+            'evaluations': [],
+        })
+        patcher = patch.object(views, 'sb', self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        views.seminar_index.__init__()
+        self.url = reverse('participant_home', args=['home@x.com'])
+
+    def test_home_combines_seminars_with_participant_state(self):
+        """Test ongoing and upcoming seminars carry joined, attendance and evaluation-pending state"""
+        home = self.client.get(self.url).json()['data']
+        seminars = {s['id']: s for s in home['seminars']}
+        self.assertEqual([s['id'] for s in home['seminars']], ['now', 'soon'])
+        self.assertEqual((seminars['now']['joined'], seminars['now']['attendance'], seminars['now']['evaluation_pending']),
+                         (True, 'timed_in', True))
+        self.assertEqual((seminars['soon']['joined'], seminars['soon']['attendance'], seminars['soon']['evaluation_pending']),
+                         (False, None, False))
+        self.assertEqual([(s['id'], s['status'], s['attendance']) for s in home['pending_evaluations']],
+                         [('past', 'past', 'timed_out')])
+
+    def test_own_write_invalidates_cached_home(self):
+        """Test the home payload is cached until the participant's own scan changes it"""
+        self.client.get(self.url)
+        calls = len(self.fake.calls)
+        self.client.get(self.url)
+        self.assertEqual(len(self.fake.calls), calls)
+        self.client.post(reverse('seminar_time_out', args=['now']),
+                         data=json.dumps({'participant_email': 'home@x.com'}), content_type='application/json')
+        seminars = self.client.get(self.url).json()['data']['seminars']
+        self.assertEqual(seminars[0]['attendance'], 'timed_out')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SeminarSearchTestCase(TestCase):
+    """Test cases for the in-memory seminar search index"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.fake = FakeSupabaseClient({'seminars': [
+            {'id': 's1', 'title': 'Research Methods', 'speaker': 'Dr. Santos', 'date': '2020-03-01',
+             'updated_at': '2020-01-01T00:00:00Z'},
+            {'id': 's2', 'title': 'Responsible AI', 'speaker': 'Prof. Cruz', 'date': '2999-01-01',
+             'updated_at': '2020-01-01T00:00:00Z'},
+            {'id': 's3', 'title': 'Grant Writing', 'speaker': 'Dr. Reyes', 'date': '2999-06-01',
+             'updated_at': '2020-01-01T00:00:00Z'},
+        ]})
+        patcher = patch.object(views, 'sb', self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        views.seminar_index.__init__()
+        self.url = reverse('seminar_search')
+
+    def _ids(self, **params):
+        return [r['id'] for r in self.client.get(self.url, params).json()['data']]
+
+    def test_prefix_search_over_title_and_speaker(self):
+        """Test every term prefix-matches a title or speaker word"""
+        self.assertEqual(self._ids(q='res'), ['s1', 's2'])
+        self.assertEqual(self._ids(q='dr'), ['s1', 's3'])
+        self.assertEqual(self._ids(q='re meth'), ['s1'])
+        self.assertEqual(self._ids(q='cruz'), ['s2'])
+
+    def test_status_and_date_filters(self):
+        """Test status buckets and date ranges"""
+        self.assertEqual(self._ids(status='past'), ['s1'])
+        self.assertEqual(self._ids(status='upcoming'), ['s2', 's3'])
+        self.assertEqual(self._ids(**{'from': '2999-01-01', 'to': '2999-01-01'}), ['s2'])
+
+    def test_index_follows_seminar_writes(self):
+        """Test created and deleted seminars are reflected immediately"""
+        self._ids(q='x')
+        self.client.post(reverse('seminars_list_create'), data=json.dumps({'title': 'Research Ethics'}),
+                         content_type='application/json')
+        self.assertEqual(len(self._ids(q='research')), 2)
+        self.client.delete(reverse('seminar_detail', args=['s1']))
+        self.assertEqual(len(self._ids(q='research')), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SeminarPatchTestCase(TestCase):
+    """Test cases for partial seminar updates"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.fake = FakeSupabaseClient({'seminars': [
+            {'id': 's1', 'title': 'Research Methods', 'speaker': 'Dr. Santos', 'capacity': 30,
+             'start_datetime': '2999-03-01T09:00:00+00:00', 'questions': [{'q': 'Rate the talk'}],
+             'metadata': {'room': 'A'}, 'updated_at': '2020-01-01T00:00:00Z'},
+        ]})
+        patcher = patch.object(views, 'sb', self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        views.seminar_index.__init__()
+        self.url = reverse('seminar_detail', args=['s1'])
+
+    def _patch(self, body, **headers):
+        return self.client.patch(self.url, data=json.dumps(body), content_type='application/json', **headers)
+
+    def test_only_changed_fields_are_written(self):
+        """Test unchanged and omitted fields, including the question set, are not sent upstream"""
+        etag = self.client.get(self.url)['ETag']
+        with patch.object(FakeQuery, 'update', autospec=True, side_effect=FakeQuery.update) as update:
+            response = self._patch({'speaker': 'Dr. Reyes', 'title': 'Research Methods',
+                                    'start_datetime': '2999-03-01T09:00:00Z'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['changed'], ['speaker'])
+        self.assertEqual(set(update.call_args[0][1]), {'speaker', 'updated_at'})
+        row = response.json()['data']
+        self.assertEqual((row['speaker'], row['questions'], row['capacity']), ('Dr. Reyes', [{'q': 'Rate the talk'}], 30))
+        self.assertNotEqual(response['ETag'], etag)
+
+        writes = len(self.fake.calls)
+        self.assertEqual(self._patch({'speaker': 'Dr. Reyes'}).json()['changed'], [])
+        self.assertNotIn(('seminars', 'update'), self.fake.calls[writes:])
+
+    def test_stale_if_match_is_rejected(self):
+        """Test a write based on an old version fails with 412 and leaves the row alone"""
+        etag = self.client.get(self.url)['ETag']
+        self._patch({'title': 'Research Design'}, HTTP_IF_MATCH=etag)
+        response = self._patch({'speaker': 'Dr. Cruz'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response['ETag'], self.client.get(self.url)['ETag'])
+        self.assertEqual(self.fake.tables['seminars'][0]['speaker'], 'Dr. Santos')
+        self.assertEqual(self._patch({'capacity': 'many'}).status_code, 400)
+        self.assertEqual(self._patch({'unknown': 1}).status_code, 400)
+
+    def test_required_fields_cannot_be_cleared(self):
+        """Test a null or empty title is rejected with 400 before reaching the database"""
+        writes = len(self.fake.calls)
+        for title in (None, ''):
+            response = self._patch({'title': title, 'speaker': 'Dr. Cruz'})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['error'], 'title is required')
+        put = self.client.put(self.url, data=json.dumps({'speaker': 'Dr. Cruz'}), content_type='application/json')
+        self.assertEqual(put.status_code, 400)
+        self.assertEqual(self.fake.calls[writes:], [])
+        self.assertEqual(self.fake.tables['seminars'][0]['speaker'], 'Dr. Santos')
+
+    def test_invalidation_follows_changed_fields(self):
+        """Test question edits keep summary caches while title and capacity edits refresh them"""
+        seminars = views.generation('seminars')
+        self._patch({'questions': [{'q': 'Rate the speaker'}], 'metadata': {'room': 'B'}})
+        self.assertEqual(views.generation('seminars'), seminars)
+        self._patch({'title': 'Research Design'})
+        self.assertNotEqual(views.generation('seminars'), seminars)
+        with patch.object(counters, 'set_capacity') as set_capacity:
+            self._patch({'participants': 40})
+        set_capacity.assert_called_once_with('s1', 40)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SeminarArchiveTestCase(TestCase):
+    """Test cases for archiving finished seminars to Arrow files"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        settings_override = override_settings(ARCHIVE_DIR=archive_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.fake = FakeSupabaseClient({
+            'seminars': [
+                {'id': 'old', 'title': 'Old', 'date': '2020-01-01', 'end_datetime': '2020-01-01T12:00:00Z'},
+                {'id': 'new', 'title': 'New', 'date': '2999-01-01'},
+            ],
+            'joined_participants': [
+                {'id': 1, 'seminar_id': 'old', 'participant_email': 'a@x.com', 'joined_at': '2019-12-01T00:00:00Z'},
+                {'id': 2, 'seminar_id': 'old', 'participant_email': 'b@x.com', 'joined_at': '2019-12-02T00:00:00Z'},
+                {'id': 3, 'seminar_id': 'new', 'participant_email': 'a@x.com'},
+            ],
+            'attendance': [
+                {'id': 1, 'seminar_id': 'old', 'participant_email': 'a@x.com', 'time_in': '2020-01-01T09:00:00Z',
+                 'time_out': '2020-01-01T11:00:00Z', 'created_at': '2020-01-01T09:00:00Z',
+                 'updated_at': '2020-01-01T11:00:00Z'},
+            ],
+            'evaluations': [
+                {'id': 1, 'seminar_id': 'old', 'participant_email': 'a@x.com', 'answers': {'q1': 5, 'comments': ['great']},
+                 'created_at': '2020-01-02T00:00:00Z'},
+            ],
+        })
+        patcher = patch.object(views, 'sb', self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_archive_moves_rows_and_lists_read_them_back(self):
+        """Test archived rows leave Supabase but are still served by the list endpoints"""
+        # A row written after the archive was read is not deleted with the archived ones
+        original_write = archive.write_archive
+
+        def write_then_insert(seminar_id, tables):
+            self.fake.tables['attendance'].append({'id': 2, 'seminar_id': 'old', 'participant_email': 'late@x.com'})
+            return original_write(seminar_id, tables)
+
+        with patch.object(archive, 'write_archive', write_then_insert):
+            call_command('archive_seminars', '--delete-hot', stdout=io.StringIO())
+        self.assertEqual([r['seminar_id'] for r in self.fake.tables['joined_participants']], ['new'])
+        self.assertEqual([r['participant_email'] for r in self.fake.tables['attendance']], ['late@x.com'])
+
+        participants = self.client.get(reverse('joined_participants_list', args=['old'])).json()['data']
+        self.assertEqual([r['participant_email'] for r in participants], ['a@x.com', 'b@x.com'])
+        evaluations = self.client.get(reverse('fetch_evaluations', args=['old']), {'participant_email': 'a@x.com'}).json()
+        self.assertEqual(evaluations['data'][0]['answers'], {'q1': 5, 'comments': ['great']})
+        check = self.client.get(reverse('has_evaluated', args=['old']), {'participant_email': 'a@x.com'}).json()
+        self.assertTrue(check['evaluated'])
+
+        analytics = self.client.get(reverse('seminar_analytics', args=['old'])).json()['data']
+        self.assertEqual((analytics['registered'], analytics['attended']), (2, 1))
+        rollup = self.client.get(reverse('analytics_rollup'), {'to': '2020-12-31'}).json()['data']
+        self.assertEqual((rollup['per_seminar'][0]['registered'], rollup['per_seminar'][0]['attended']), (2, 1))
+        history = self.client.get(reverse('participant_history', args=['a@x.com'])).json()['data']['seminars']
+        old_entry = next(e for e in history if e['id'] == 'old')
+        self.assertTrue(old_entry['joined'] and old_entry['evaluated'])
+        self.assertEqual(old_entry['time_out'], '2020-01-01T11:00:00Z')
+
+    def test_dry_run_and_keep_hot(self):
+        """Test dry runs write nothing and --keep-hot leaves Supabase rows in place"""
+        call_command('archive_seminars', '--dry-run', stdout=io.StringIO())
+        self.assertFalse(archive.is_archived('old'))
+        call_command('archive_seminars', '--keep-hot', stdout=io.StringIO())
+        self.assertTrue(archive.is_archived('old'))
+        self.assertFalse(archive.is_archived('new'))
+        self.assertEqual(len(self.fake.tables['attendance']), 1)
+        self.assertEqual(archive.read_manifest('old')['row_counts']['joined_participants'], 2)
+
+    def test_archived_seminar_rejects_writes(self):
+        """Test writes to an archived seminar get 409 instead of landing in unread hot rows"""
+        call_command('archive_seminars', stdout=io.StringIO())
+        body = json.dumps({'participant_email': 'c@x.com', 'answers': {}})
+        for name in ('save_joined_participant', 'check_in_participant', 'seminar_time_in', 'save_evaluation'):
+            response = self.client.post(reverse(name, args=['old']), data=body, content_type='application/json')
+            self.assertEqual(response.status_code, 409, name)
+        response = self.client.post(reverse('import_participants', args=['old']), data='email\nc@x.com\n',
+                                    content_type='text/csv')
+        self.assertEqual(response.status_code, 409)
+        self.assertNotIn('c@x.com', [r['participant_email'] for r in self.fake.tables['joined_participants']])
+
+    def test_history_opens_only_archives_holding_the_email(self):
+        """Test the participant index limits history reads to matching archives"""
+        self.fake.tables['seminars'][1]['date'] = '2020-02-01'
+        call_command('archive_seminars', stdout=io.StringIO())
+        self.assertEqual(archive.load_index()['emails']['b@x.com'], ['old'])
+        with patch.object(archive, 'read_manifest', side_effect=AssertionError('manifest opened')), \
+                patch.object(archive, 'read_rows', wraps=archive.read_rows) as read_rows:
+            rows = archive.participant_rows('b@x.com')
+        self.assertEqual({call.args[0] for call in read_rows.call_args_list}, {'old'})
+        self.assertEqual([r['participant_email'] for r in rows['joined_participants']], ['b@x.com'])
+        # A missing index is rebuilt from the manifests
+        os.remove(os.path.join(settings.ARCHIVE_DIR, archive.INDEX))
+        self.assertEqual(archive.load_index()['emails']['a@x.com'], ['new', 'old'])
+
+    def test_default_keeps_hot_rows_and_delete_needs_persistent_dir(self):
+        """Test hot rows are kept unless asked, and never deleted with an in-tree ARCHIVE_DIR"""
+        call_command('archive_seminars', stdout=io.StringIO())
+        self.assertTrue(archive.is_archived('old'))
+        self.assertEqual(len(self.fake.tables['joined_participants']), 3)
+        with override_settings(ARCHIVE_DIR=os.path.join(settings.BASE_DIR, 'archive')):
+            with self.assertRaises(CommandError):
+                call_command('archive_seminars', '--delete-hot', stdout=io.StringIO())
+        self.assertEqual(len(self.fake.tables['joined_participants']), 3)
+
+
+class ProfilingTestCase(TestCase):
+    """Test cases for sampled and on-demand request profiling"""
+
+    def setUp(self):
+        profile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(profile_dir.cleanup)
+        self.dir = profile_dir.name
+        patcher = patch.object(views, 'sb', FakeSupabaseClient({'seminars': []}))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get(self, **headers):
+        # A fresh Client loads the middleware chain with the current settings
+        return Client().get(reverse('seminars_list_create'), **headers)
+
+    def test_header_with_token_writes_tagged_profile(self):
+        """Test an authorized X-Profile request is profiled for each engine"""
+        for engine, suffix in (('sampler', '.folded'), ('cprofile', '.prof')):
+            with override_settings(PROFILING_TOKEN='secret', PROFILING_ENGINE=engine, PROFILING_DIR=self.dir,
+                                   PROFILING_INTERVAL_MS=1):
+                response = self._get(HTTP_X_PROFILE='secret')
+            profiling.writer.join()
+            name = response[profiling.RESULT_HEADER]
+            self.assertIn('-seminars_list_create-GET-', name)
+            self.assertTrue(name.endswith(suffix))
+            self.assertTrue(os.path.exists(os.path.join(self.dir, name)))
+
+    def test_unsampled_and_unauthorized_requests_are_not_profiled(self):
+        """Test a wrong token or zero sample rate writes nothing"""
+        with override_settings(PROFILING_TOKEN='secret', PROFILING_DIR=self.dir):
+            response = self._get(HTTP_X_PROFILE='guess')
+        self.assertNotIn(profiling.RESULT_HEADER, response)
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_full_sample_rate_profiles_every_request(self):
+        """Test sampled requests are written and the directory stays bounded"""
+        with override_settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_DIR=self.dir, PROFILING_MAX_FILES=2):
+            client = Client()
+            for _ in range(4):
+                client.get(reverse('seminars_list_create'))
+            profiling.writer.join()
+        self.assertEqual(len(os.listdir(self.dir)), 2)
+
+    def test_profiles_are_written_off_the_request_thread(self):
+        """Test the response returns before the profile is written, and a full queue drops instead of blocking"""
+        release = threading.Event()
+        writer = profiling.ProfileWriter(1)
+        original_write = writer._write
+
+        def slow_write(*args):
+            release.wait(5)
+            original_write(*args)
+
+        with override_settings(PROFILING_TOKEN='secret', PROFILING_DIR=self.dir, PROFILING_INTERVAL_MS=1), \
+                patch.object(profiling, 'writer', writer), patch.object(writer, '_write', slow_write):
+            first = self._get(HTTP_X_PROFILE='secret')
+            self.assertEqual(os.listdir(self.dir), [])
+            responses = [self._get(HTTP_X_PROFILE='secret') for _ in range(3)]
+            release.set()
+            writer.join()
+        self.assertTrue(os.path.exists(os.path.join(self.dir, first[profiling.RESULT_HEADER])))
+        self.assertTrue(any(profiling.RESULT_HEADER not in r for r in responses))
+
+
+class UpstreamBreakerTestCase(TestCase):
+    """Test cases for Supabase deadlines, the circuit breaker and stale reads"""
+
+    def setUp(self):
+        self.client = Client()
+        self.fake = FakeSupabaseClient({'seminars': [{'id': 's1', 'title': 'Research Methods'}]})
+        self.breaker = upstream.CircuitBreaker(threshold=2, reset_timeout=30)
+        patcher = patch.object(views, 'sb', upstream.guard(self.fake, self.breaker))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = reverse('seminars_list_create')
+
+    def _outage(self):
+        return patch.object(FakeQuery, 'execute', side_effect=httpx.ReadTimeout('timed out'))
+
+    def test_breaker_opens_and_fails_fast_with_503(self):
+        """Test timeouts become 503s and an open breaker stops calling upstream"""
+        with self._outage() as execute:
+            for _ in range(3):
+                response = self.client.post(self.url, data=json.dumps({'title': 'x'}), content_type='application/json')
+                self.assertEqual(response.status_code, 503)
+                self.assertIn('Retry-After', response)
+            self.assertEqual(execute.call_count, 2)
+        snapshot = self.breaker.snapshot()
+        self.assertEqual((snapshot['state'], snapshot['trips'], snapshot['rejected']), ('open', 1, 1))
+
+    def test_half_open_probe_closes_breaker(self):
+        """Test a successful probe after the reset interval closes the breaker"""
+        self.breaker.reset_timeout = 0
+        with self._outage():
+            self.client.get(self.url, {'limit': 1})
+            self.client.get(self.url, {'limit': 1})
+        self.assertEqual(self.breaker.snapshot()['state'], 'open')
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(self.breaker.snapshot()['state'], 'closed')
+
+    def test_failed_reads_fall_back_to_last_good_response(self):
+        """Test GETs are answered from the last good copy during an outage"""
+        fresh = self.client.get(self.url)
+        with self._outage():
+            stale = self.client.get(self.url)
+        self.assertEqual(stale.status_code, 200)
+        self.assertIn(upstream.STALE_HEADER, stale)
+        self.assertEqual(stale.json(), fresh.json())
+
+    def test_stale_store_is_bounded_by_bytes_and_reuses_matching_etags(self):
+        """Test the stale store evicts by total size and does not recopy an unchanged body"""
+        store = upstream.StaleResponses(max_bytes=10)
+        first = HttpResponse(b'123456')
+        first['ETag'] = '"v1"'
+        store.put('/a', first)
+        self.assertTrue(store.refresh('/a', '"v1"'))
+        self.assertFalse(store.refresh('/a', '"v2"'))
+        store.put('/b', HttpResponse(b'abcdef'))
+        self.assertIsNone(store.get('/a', 60))
+        self.assertEqual(store.get('/b', 60).content, b'abcdef')
+        store.put('/c', HttpResponse(b'x' * 11))
+        self.assertIsNone(store.get('/c', 60))
+
+    def test_only_stale_safe_views_are_kept(self):
+        """Test responses of endpoints that may not be served stale are not stored"""
+        middleware = upstream.UpstreamFallbackMiddleware(lambda request: HttpResponse(b'{}'))
+        for url in (self.url, reverse('jobs_list_create')):
+            request = RequestFactory().get(url)
+            request.resolver_match = resolve(url)
+            middleware(request)
+        self.assertIsNotNone(middleware.responses.get(self.url, 60))
+        self.assertIsNone(middleware.responses.get(reverse('jobs_list_create'), 60))
+
+    def test_client_errors_do_not_trip_the_breaker(self):
+        """Test request errors from Supabase are not counted as outages"""
+        with patch.object(FakeQuery, 'execute', side_effect=FakeAPIError('duplicate key')):
+            for _ in range(3):
+                self.assertEqual(self.client.get(self.url).status_code, 500)
+        self.assertEqual(self.breaker.snapshot()['state'], 'closed')
+
+
+class DuplicateScanTestCase(TestCase):
+    """Test cases for repeat-scan suppression"""
+
+    def setUp(self):
+        self.client = Client()
+        self.fake = FakeSupabaseClient({'joined_participants': [
+            {'id': 1, 'seminar_id': 'sem-1', 'participant_email': 'a@x.com'},
+        ]})
+        patcher = patch.object(views, 'sb', self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        views.recent_scans.__init__(ttl=5, max_entries=2)
+
+    def _scan(self, action, email='a@x.com'):
+        url = reverse(action, args=['sem-1'])
+        return self.client.post(url, data=json.dumps({'participant_email': email}), content_type='application/json')
+
+    def test_repeat_scans_skip_upstream(self):
+        """Test repeats inside the window are answered from memory"""
+        first = self._scan('seminar_time_in')
+        calls = len(self.fake.calls)
+        for _ in range(3):
+            repeat = self._scan('seminar_time_in')
+            self.assertEqual(repeat['X-Duplicate-Scan'], 'true')
+            self.assertEqual(repeat.json(), first.json())
+        self.assertEqual(len(self.fake.calls), calls)
+        self.assertEqual(views.recent_scans.snapshot()['suppressed'], 3)
+
+    def test_other_action_supersedes_cached_scan(self):
+        """Test check-in, check-out, check-in all reach upstream"""
+        for action in ('check_in_participant', 'check_out_participant', 'check_in_participant'):
+            self.assertNotIn('X-Duplicate-Scan', self._scan(action))
+        self.assertEqual(self.fake.calls.count(('joined_participants', 'update')), 3)
+
+    def test_memory_is_bounded(self):
+        """Test the oldest entries are evicted past max_entries"""
+        for email in ('a@x.com', 'b@x.com', 'c@x.com'):
+            self._scan('seminar_time_in', email)
+        snapshot = views.recent_scans.snapshot()
+        self.assertEqual((snapshot['entries'], snapshot['evicted']), (2, 1))
+
+
+class SeminarCountersTestCase(TestCase):
+    """Test cases for live seminar counters and capacity enforcement"""
+
+    def setUp(self):
+        self.client = Client()
+        self.fake = FakeSupabaseClient({
+            'seminars': [{'id': 'sem-1', 'title': 'Small Room', 'capacity': 2}],
+            'joined_participants': [{'seminar_id': 'sem-1', 'participant_email': 'a@x.com', 'participant_name': 'Ana',
+                                     'present': False}],
+            'attendance': [{'seminar_id': 'sem-1', 'participant_email': 'a@x.com', 'time_in': '2025-11-01T09:00:00Z'}],
+        })
+        patcher = patch.object(views, 'sb', self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        views.recent_scans.__init__(ttl=0, max_entries=1)
+
+    def _post(self, name, email):
+        return self.client.post(reverse(name, args=['sem-1']), data=json.dumps({'participant_email': email}),
+                                content_type='application/json')
+
+    def _counters(self):
+        return self.client.get(reverse('seminar_counters', args=['sem-1'])).json()['data']
+
+    def test_counters_reconcile_and_track_writes(self):
+        """Test counters start from Supabase and follow check-ins and time-ins"""
+        self.assertEqual(self._counters()['registered'], 1)
+        self._post('check_in_participant', 'a@x.com')
+        self._post('check_in_participant', 'a@x.com')
+        self._post('seminar_time_out', 'a@x.com')
+        self._post('seminar_time_in', 'a@x.com')
+        counts = self._counters()
+        self.assertEqual((counts['present'], counts['timed_in'], counts['timed_out']), (1, 1, 1))
+        self._post('check_out_participant', 'a@x.com')
+        self.assertEqual(self._counters()['present'], 0)
+
+    def test_repeat_check_in_makes_one_write(self):
+        """Test a repeated check-in makes only its conditional write, then reads the row"""
+        first = self._post('check_in_participant', 'a@x.com').json()['data'][0]
+        writes = self.fake.calls.count(('joined_participants', 'update'))
+        repeat = self._post('check_in_participant', 'a@x.com').json()['data'][0]
+        self.assertEqual(self.fake.calls.count(('joined_participants', 'update')), writes + 1)
+        self.assertEqual(repeat['check_in'], first['check_in'])
+        self.assertEqual(self._counters()['present'], 1)
+
+    def test_import_reserves_seats_and_reports_overflow(self):
+        """Test an import cannot overbook and keeps the registered counter exact"""
+        self.assertEqual(self._counters()['registered'], 1)
+        response = self.client.post(reverse('import_participants', args=['sem-1']),
+                                    data='email\na@x.com\nb@x.com\nc@x.com\n', content_type='text/csv')
+        summary = response.json()['data']
+        self.assertEqual((summary['imported'], summary['over_capacity']), (2, 1))
+        self.assertEqual(summary['errors'], [{'row': 4, 'error': 'seminar is at capacity'}])
+        self.assertEqual(sorted(r['participant_email'] for r in self.fake.tables['joined_participants']),
+                         ['a@x.com', 'b@x.com'])
+        self.assertEqual(self._counters()['registered'], 2)
+
+    def test_capacity_is_enforced_on_join(self):
+        """Test joins beyond capacity are refused but registrants can re-join without losing their details"""
+        self.assertEqual(self._post('save_joined_participant', 'b@x.com').status_code, 201)
+        self.assertEqual(self._post('save_joined_participant', 'c@x.com').status_code, 409)
+        self.assertEqual(self._post('save_joined_participant', 'a@x.com').status_code, 201)
+        self.assertEqual(len(self.fake.tables['joined_participants']), 2)
+        self.assertEqual(self.fake.tables['joined_participants'][0]['participant_name'], 'Ana')
+        self.assertEqual(self._counters()['remaining'], 0)
+
+    def test_stale_counters_are_rebuilt(self):
+        """Test counters reconcile with Supabase once they are stale"""
+        self._counters()
+        self.fake.tables['joined_participants'].append({'seminar_id': 'sem-1', 'participant_email': 'z@x.com'})
+        self.assertEqual(self._counters()['registered'], 1)
+        with override_settings(SEMINAR_COUNTERS_RECONCILE_SECONDS=-1):
+            self.assertEqual(self._counters()['registered'], 2)
+
+    def test_locked_counters_answer_503(self):
+        """Test a counters table that stays locked is retried, then reported as retryable"""
+        self._counters()
+        locked = OperationalError('database table is locked: api_seminarcounter')
+        with patch.object(counters, 'LOCK_RETRY_DELAY', 0), \
+                patch.object(counters.SeminarCounter.objects, 'filter', side_effect=locked) as query:
+            response = self._post('save_joined_participant', 'new@x.com')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(query.call_count, counters.LOCK_RETRIES)
+        self.assertEqual(len(self.fake.tables['joined_participants']), 1)
+
+
+class SeminarCapacityRaceTestCase(TransactionTestCase):
+    """Test capacity holds when joins race"""
+
+    def test_concurrent_joins_do_not_overbook(self):
+        fake = FakeSupabaseClient({'seminars': [{'id': 'sem-1', 'title': 'Tiny', 'capacity': 5}]}, latency=0.002)
+        with patch.object(views, 'sb', fake):
+            counters.reconcile(fake, 'sem-1')
+
+            def join(i):
+                return Client().post(reverse('save_joined_participant', args=['sem-1']),
+                                     data=json.dumps({'participant_email': f'p{i}@x.com'}),
+                                     content_type='application/json').status_code
+
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                statuses = list(pool.map(join, range(20)))
+        self.assertEqual(statuses.count(201), 5)
+        self.assertEqual(statuses.count(409), 15)
+        self.assertEqual(len(fake.tables['joined_participants']), 5)
+        self.assertEqual(SeminarCounter.objects.get(pk='sem-1').registered, 5)
+
+
+@override_settings(JOB_RETRY_BACKOFF_SECONDS=0)
+class BackgroundJobsTestCase(TestCase):
+    """Test cases for the background job runner"""
+
+    def setUp(self):
+        self.client = Client()
+        output_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(output_dir.cleanup)
+        settings_override = override_settings(JOBS_OUTPUT_DIR=output_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.fake = FakeSupabaseClient({
+            'joined_participants': [
+                {'id': 1, 'seminar_id': 'sem-1', 'participant_email': 'a@x.com', 'participant_name': 'Ana'},
+            ],
+            'attendance': [
+                {'id': 1, 'seminar_id': 'sem-1', 'participant_email': 'a@x.com', 'time_in': '2025-11-01T09:00:00Z'},
+                {'id': 2, 'seminar_id': 'sem-1', 'participant_email': 'b@x.com', 'time_in': '2025-11-01T09:05:00Z',
+                 'time_out': '2025-11-01T10:00:00Z'},
+                {'id': 3, 'seminar_id': 'sem-2', 'participant_email': 'a@x.com', 'time_in': '2025-11-02T09:00:00Z'},
+            ],
+        })
+        patcher = patch.object(views, 'sb', self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for registry in (jobs.HANDLERS, jobs.REQUIRED_PARAMS):
+            patcher = patch.dict(registry)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.worker = jobs.Worker(self.fake, name='test-worker')
+
+    def _queue(self, kind, **params):
+        response = self.client.post(reverse('jobs_list_create'), data=json.dumps({'kind': kind, 'params': params}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        return response.json()['data']['id']
+
+    def _job(self, job_id):
+        return self.client.get(reverse('job_detail', args=[job_id])).json()['data']
+
+    def test_mass_time_out_runs_outside_the_request(self):
+        """Test a queued job waits for a worker and reports its result"""
+        job_id = self._queue('mass_time_out', seminar_id='sem-1')
+        self.assertEqual(self._job(job_id)['status'], 'queued')
+        self.assertEqual(self.worker.run_pending(), 1)
+        job = self._job(job_id)
+        self.assertEqual((job['status'], job['result']['timed_out'], job['progress']['fraction']), ('succeeded', 1, 1.0))
+        self.assertIsNotNone(self.fake.tables['attendance'][0]['time_out'])
+        self.assertIsNone(self.fake.tables['attendance'][2].get('time_out'))
+
+    def test_mass_time_out_reports_rows_it_changed(self):
+        """Test rows timed out after the job read them are not counted as its own"""
+        fetch_all = tasks.analytics.fetch_all
+
+        def fetch_then_scan(query):
+            rows = fetch_all(query)
+            self.fake.tables['attendance'][0]['time_out'] = '2025-11-01T10:30:00Z'
+            return rows
+
+        job_id = self._queue('mass_time_out', seminar_id='sem-1')
+        with patch.object(tasks.analytics, 'fetch_all', fetch_then_scan):
+            self.worker.run_pending()
+        result = self._job(job_id)['result']
+        self.assertEqual((result['candidates'], result['timed_out']), (1, 0))
+        self.assertEqual(self.fake.tables['attendance'][0]['time_out'], '2025-11-01T10:30:00Z')
+
+    def test_export_can_be_downloaded(self):
+        """Test an export job produces a downloadable CSV"""
+        job_id = self._queue('export_attendance', seminar_id='sem-1')
+        self.worker.run_pending()
+        response = self.client.get(reverse('job_download', args=[job_id]))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn('a@x.com,Ana', lines[1])
+
+    def test_failed_jobs_are_retried_then_failed(self):
+        """Test retries up to max_attempts"""
+        calls = []
+
+        @jobs.handler('test_flaky')
+        def flaky(ctx):
+            calls.append(1)
+            if len(calls) < 2:
+                raise RuntimeError('upstream hiccup')
+            return {'ok': True}
+
+        @jobs.handler('test_broken')
+        def broken(ctx):
+            raise RuntimeError('always broken')
+
+        flaky_id = self._queue('test_flaky')
+        broken_id = jobs.enqueue('test_broken', max_attempts=2).pk
+        self.worker.run_pending()
+        self.assertEqual((self._job(flaky_id)['status'], self._job(flaky_id)['attempts']), ('succeeded', 2))
+        self.assertEqual((self._job(broken_id)['status'], self._job(broken_id)['error']), ('failed', 'always broken'))
+
+    def test_worker_loop_survives_a_failed_poll(self):
+        """Test a claim that raises is logged and backed off, and the loop keeps running jobs"""
+        job_id = self._queue('mass_time_out', seminar_id='sem-1')
+        stop = threading.Event()
+        claim = jobs.claim
+        calls = []
+
+        def flaky_claim(worker_id):
+            calls.append(worker_id)
+            if len(calls) == 1:
+                raise OperationalError('disk I/O error')
+            job = claim(worker_id)
+            if job is None:
+                stop.set()
+            return job
+
+        worker = jobs.Worker(self.fake, poll_interval=0.001, name='test-worker')
+        with patch.object(jobs, 'claim', flaky_claim), self.assertLogs('api.jobs', 'ERROR'):
+            worker._loop(stop)
+        self.assertEqual(self._job(job_id)['status'], 'succeeded')
+        self.assertEqual(len(calls), 3)
+
+    def test_locked_status_writes_are_retried(self):
+        """Test a queue write that finds SQLite locked is retried instead of failing the worker"""
+        job = jobs.enqueue('mass_time_out', params={'seminar_id': 'sem-1'})
+        attempts = []
+
+        def locked_once():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise OperationalError('database is locked')
+            return jobs.Job.objects.filter(pk=job.pk).update(status=jobs.CANCELLED)
+
+        self.assertEqual(jobs._retrying(locked_once), 1)
+        self.assertEqual(len(attempts), 2)
+
+        def broken():
+            attempts.append(1)
+            raise OperationalError('no such table: api_job')
+
+        # Other database errors are not retried
+        with self.assertRaises(OperationalError):
+            jobs._retrying(broken)
+        self.assertEqual(len(attempts), 3)
+
+    def test_cancellation(self):
+        """Test queued jobs cancel at once and running jobs stop at their next progress report"""
+        queued_id = self._queue('mass_time_out', seminar_id='sem-1')
+        self.assertEqual(self.client.post(reverse('job_cancel', args=[queued_id])).json()['data']['status'], 'cancelled')
+
+        @jobs.handler('test_long')
+        def long_running(ctx):
+            self.client.post(reverse('job_cancel', args=[ctx.job.pk]))
+            for i in range(10):
+                ctx.progress(i, 10)
+            return {'finished': True}
+
+        running_id = jobs.enqueue('test_long').pk
+        self.worker.run_pending()
+        self.assertEqual(self._job(running_id)['status'], 'cancelled')
+
+    def test_unknown_kind_and_missing_params_are_rejected(self):
+        """Test job validation"""
+        url = reverse('jobs_list_create')
+        for body in ({'kind': 'nope'}, {'kind': 'mass_time_out', 'params': {}}):
+            response = self.client.post(url, data=json.dumps(body), content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_stats_report_throughput_and_latency(self):
+        """Test queue statistics"""
+        self._queue('mass_time_out', seminar_id='sem-1')
+        self._queue('mass_time_out', seminar_id='sem-2')
+        self.worker.run_pending()
+        stats = self.client.get(reverse('job_stats')).json()['data']
+        self.assertEqual((stats['counts']['succeeded'], stats['finished']), (2, 2))
+        self.assertIsNotNone(stats['queue_latency_seconds']['p95'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, FRONTEND_URL='https://app.example.com', QR_RENDER_PROCESSES=1)
+class QRCodeTestCase(TestCase):
+    """Test cases for server-rendered QR codes and badge sheets"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.fake = FakeSupabaseClient({
+            'seminars': [{'id': 'sem-1', 'title': 'Intro (Part 1)'}],
+            'joined_participants': [
+                {'id': i, 'seminar_id': 'sem-1', 'participant_email': f'p{i}@x.com', 'participant_name': f'Person {i}'}
+                for i in range(1, 15)
+            ] + [{'id': 99, 'seminar_id': 'sem-2', 'participant_email': 'other@x.com'}],
+        })
+        patcher = patch.object(views, 'sb', self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_participant_payload_matches_frontend(self):
+        """Test the encoded URL is what ParticipantQRCode.jsx builds"""
+        self.assertEqual(
+            qrcodes.participant_url('sem-1', 'a+b@x.com'),
+            'https://app.example.com/qr?data=%7B%22seminar_id%22%3A%22sem-1%22%2C%22participant_email%22%3A%22a%2Bb%40x.com%22%7D',
+        )
+
+    def test_png_and_svg_are_cached_and_revalidated(self):
+        """Test images carry cache headers, honour If-None-Match and change with FRONTEND_URL"""
+        url = reverse('seminar_qr_code', args=['sem-1'])
+        png = self.client.get(url, {'participant_email': 'p1@x.com'})
+        self.assertEqual(png.status_code, 200)
+        self.assertEqual(png['Content-Type'], 'image/png')
+        self.assertTrue(png.content.startswith(b'\x89PNG'))
+        self.assertNotIn('immutable', png['Cache-Control'])
+        with override_settings(FRONTEND_URL='https://new.example.com'):
+            moved = self.client.get(url, {'participant_email': 'p1@x.com'}, HTTP_IF_NONE_MATCH=png['ETag'])
+        self.assertEqual(moved.status_code, 200)
+        self.assertNotEqual(moved['ETag'], png['ETag'])
+
+        again = self.client.get(url, {'participant_email': 'p1@x.com'}, HTTP_IF_NONE_MATCH=png['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b'')
+
+        svg = self.client.get(url, {'format': 'svg'})
+        self.assertEqual(svg['Content-Type'], 'image/svg+xml')
+        self.assertNotEqual(svg['ETag'], png['ETag'])
+        self.assertEqual(self.client.get(url, {'format': 'gif'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'scale': '0'}).status_code, 400)
+
+    def test_sheet_has_one_badge_per_registrant(self):
+        """Test the PDF sheet pages, labels and caching"""
+        url = reverse('seminar_qr_sheet', args=['sem-1'])
+        response = self.client.get(url, {'paper': 'a4'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        pdf = response.content
+        self.assertTrue(pdf.startswith(b'%PDF-1.4') and pdf.rstrip().endswith(b'%%EOF'))
+        # 14 registrants at 12 per page
+        self.assertIn(b'/Type /Pages /Kids [', pdf)
+        self.assertIn(b'/Count 2 >>', pdf)
+        self.assertEqual(pdf.count(b'/ImageMask true'), 14)
+        self.assertIn(b'/MediaBox [0 0 595 842]', pdf)
+
+        with patch.object(qrcodes, '_encode', side_effect=AssertionError('re-encoded')):
+            cached = self.client.get(url, {'paper': 'a4'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(self.client.get(url, {'paper': 'legal'}).status_code, 400)
+
+    def test_large_sheets_are_queued_as_a_job(self):
+        """Test an uncached sheet above the sync limit becomes a qr_sheet job whose output is then served"""
+        url = reverse('seminar_qr_sheet', args=['sem-1'])
+        with override_settings(QR_SHEET_SYNC_MAX_BADGES=10), \
+                patch.object(qrcodes, '_encode', side_effect=AssertionError('encoded in the request')):
+            queued = self.client.get(url)
+            again = self.client.get(url)
+        self.assertEqual(queued.status_code, 202)
+        job = queued.json()['data']
+        self.assertEqual((job['kind'], job['params']['seminar_id']), ('qr_sheet', 'sem-1'))
+        self.assertEqual(queued['Location'], reverse('job_detail', args=[job['id']]))
+        self.assertEqual(again.json()['data']['id'], job['id'])
+
+        output_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(output_dir.cleanup)
+        with override_settings(JOBS_OUTPUT_DIR=output_dir.name):
+            self.assertEqual(jobs.Worker(self.fake).run_pending(), 1)
+        with override_settings(QR_SHEET_SYNC_MAX_BADGES=10):
+            ready = self.client.get(url)
+        self.assertEqual(ready.status_code, 200)
+        self.assertEqual(ready.content.count(b'/ImageMask true'), 14)
+
+    def test_matrices_are_shared_between_sheets(self):
+        """Test a registrant joining only encodes the new code"""
+        badges = qrcodes.sheet_badges('sem-1', self.fake.tables['joined_participants'][:14])
+        qrcodes.sheet(badges)
+        with patch.object(qrcodes, '_encode', wraps=qrcodes._encode) as encode:
+            qrcodes.sheet(badges + [{'data': qrcodes.participant_url('sem-1', 'new@x.com'), 'name': 'New'}])
+        self.assertEqual(encode.call_count, 1)
+        self.assertEqual(qrcodes._pdf_text('a (b) \\ é'), b'a \\(b\\) \\\\ \xe9')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ReadRoutingTestCase(TestCase):
+    """Test cases for read-replica routing"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.primary = FakeSupabaseClient({
+            'joined_participants': [{'id': 1, 'seminar_id': 'sem-1', 'participant_email': 'r@x.com'}],
+            'attendance': [],
+        })
+        self.replica = FakeReplica(self.primary)
+        router = routing.ReadRouter(upstream.guard(self.replica, upstream.CircuitBreaker(2, 60, name='replica')),
+                                    sticky_seconds=10, max_lag=5, lag_check_interval=0)
+        for target, name, value in ((views, 'sb', self.primary), (views, 'router', router), (routing, 'router', router)):
+            patcher = patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.router = router
+
+    def _attendance(self, client_id):
+        return self.client.get(reverse('seminar_attendance_list', args=['sem-1']), HTTP_X_CLIENT_ID=client_id)
+
+    def test_writer_reads_its_own_writes(self):
+        """Test a client that just wrote reads from the primary while others use the replica"""
+        response = self.client.post(reverse('seminar_time_in', args=['sem-1']), HTTP_X_CLIENT_ID='scanner',
+                                    data=json.dumps({'participant_email': 'r@x.com'}), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+        own = self._attendance('scanner')
+        self.assertEqual(own['X-Read-From'], 'primary')
+        self.assertEqual(len(own.json()['data']), 1)
+
+        primary_calls = len(self.primary.calls)
+        dashboard = self._attendance('dashboard')
+        self.assertEqual(dashboard['X-Read-From'], 'replica')
+        self.assertEqual(dashboard.json()['data'], [])
+        self.replica.catch_up()
+        self.assertEqual(len(self._attendance('dashboard').json()['data']), 1)
+        self.assertEqual(len(self.primary.calls), primary_calls)
+
+    def test_lagging_or_unmeasurable_replica_is_skipped(self):
+        """Test reads go to the primary while lag exceeds the limit or cannot be read"""
+        self.replica.lag = 30
+        self.assertEqual(self._attendance('dashboard')['X-Read-From'], 'primary')
+        self.replica.lag = 0.5
+        self.assertEqual(self._attendance('dashboard')['X-Read-From'], 'replica')
+        del self.replica.functions['replica_lag_seconds']
+        self.assertEqual(self._attendance('dashboard')['X-Read-From'], 'primary')
+        self.assertEqual(self.router.snapshot()['reads']['lagging'], 2)
+
+    def test_failed_replica_read_is_retried_on_primary(self):
+        """Test an unavailable replica costs a retry, then trips its own breaker"""
+        self.router.lag_check_interval = 3600
+        self.primary.tables['attendance'].append({'id': 9, 'seminar_id': 'sem-1', 'participant_email': 'r@x.com'})
+        original = FakeQuery.execute
+
+        def execute(query):
+            if query._client is self.replica and query._table == 'attendance':
+                raise httpx.ConnectError('replica down')
+            return original(query)
+
+        with patch.object(FakeQuery, 'execute', execute):
+            for _ in range(3):
+                response = self._attendance('dashboard')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['data']), 1)
+        self.assertEqual(response['X-Read-From'], 'primary')
+        self.assertEqual(self.router.snapshot()['reads']['fallbacks'], 2)
+        self.assertEqual(upstream.breaker.snapshot()['state'], 'closed')
+
+
+@override_settings(CACHES=LOCMEM_CACHES, EVALUATION_BATCH_WINDOW_MS=0)
+class QueryAuditTestCase(TestCase):
+    """Test cases for the query-shape catalogue and plan audit"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.fake = FakeSupabaseClient({
+            'seminars': [{'id': 's1', 'title': 'Audit', 'date': '2025-12-10', 'capacity': 10,
+                          'start_datetime': '2025-12-10T10:00:00Z', 'end_datetime': '2025-12-10T12:00:00Z'}],
+            'joined_participants': [{'id': 1, 'seminar_id': 's1', 'participant_email': 'q@x.com', 'participant_name': 'Q'}],
+            'attendance': [],
+            'evaluations': [{'id': 1, 'seminar_id': 's1', 'participant_email': 'e@x.com', 'answers': {}}],
+        })
+        patcher = patch.object(views, 'sb', self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_catalogue_covers_view_queries(self):
+        """Test every query the main endpoints issue has a catalogued shape"""
+        since = {'since': '2025-01-01T00:00:00Z'}
+        gets = [
+            (reverse('seminars_list_create'), {}), (reverse('seminars_list_create'), since),
+            (reverse('seminar_detail', args=['s1']), {}), (reverse('seminar_search'), {'q': 'aud'}),
+            (reverse('seminar_attendance_list', args=['s1']), since), (reverse('joined_participants_list', args=['s1']), {}),
+            (reverse('fetch_evaluations', args=['s1']), {'participant_email': 'q@x.com'}),
+            (reverse('fetch_evaluations', args=['s1']), since),
+            (reverse('has_evaluated', args=['s1']), {'participant_email': 'e@x.com'}),
+            (reverse('participant_history', args=['q@x.com']), {}), (reverse('seminar_analytics', args=['s1']), {}),
+            (reverse('analytics_rollup'), {'from': '2025-01-01'}), (reverse('seminar_counters', args=['s1']), {}),
+            (reverse('seminar_qr_sheet', args=['s1']), {}),
+        ]
+        for url, params in gets:
+            self.assertEqual(self.client.get(url, params).status_code, 200, url)
+        body = json.dumps({'participant_email': 'q@x.com', 'answers': {'q1': 5}})
+        for name in ('seminar_time_in', 'seminar_time_out', 'check_in_participant', 'check_out_participant',
+                     'save_joined_participant', 'save_evaluation'):
+            self.assertLess(self.client.post(reverse(name, args=['s1']), data=body,
+                                             content_type='application/json').status_code, 300, name)
+        self.assertEqual(query_audit.uncatalogued(self.fake.shapes), [])
+
+    def test_new_shape_is_reported(self):
+        """Test an uncatalogued filter combination is flagged"""
+        self.fake.table('attendance').select('*').eq('participant_email', 'q@x.com').order('time_in').execute()
+        self.assertEqual(query_audit.uncatalogued(self.fake.shapes),
+                         [('attendance', frozenset({'participant_email'}), frozenset(), ('time_in',))])
+
+    def test_plan_audit_recommends_composite_index(self):
+        """Test a sequential scan is reported with DDL, and an existing composite index is recognised"""
+        shape = query_audit.CATALOGUE[query_audit.shape_key('evaluations', ('seminar_id', 'participant_email'), (), ())]
+        plan = [{'Plan': {'Node Type': 'Seq Scan', 'Relation Name': 'evaluations', 'Actual Rows': 1,
+                          'Rows Removed by Filter': 40000}, 'Execution Time': 6.2}]
+        report = query_audit.audit(shape, plan, {'evaluations': {'evaluations_pkey': ['id'],
+                                                                 'idx_evaluations_seminar': ['seminar_id']}})
+        self.assertTrue(report['seq_scan'])
+        self.assertEqual(report['ddl'], 'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_evaluations_seminar_id_participant_email '
+                                        'ON evaluations(seminar_id, participant_email);')
+
+        indexed = [{'Plan': {'Node Type': 'Limit', 'Plans': [
+            {'Node Type': 'Index Scan', 'Index Name': 'idx_evaluations_seminar_email', 'Relation Name': 'evaluations'}]}}]
+        report = query_audit.audit(shape, indexed, {'evaluations': {
+            'idx_evaluations_seminar_email': ['participant_email', 'seminar_id', 'created_at']}})
+        self.assertEqual((report['seq_scan'], report['covered_by'], report['ddl']),
+                         (False, 'idx_evaluations_seminar_email', None))
+
+    def test_recommended_ddl_drops_prefixes(self):
+        """Test an index that is a prefix of another recommended one is not emitted twice"""
+        by_name = {shape.name: shape for shape in query_audit.SHAPES}
+        reports = [query_audit.audit(by_name[name], [{'Plan': {'Node Type': 'Seq Scan', 'Relation Name': 'change_log'}}], {})
+                   for name in ('tombstones_by_seminar', 'tombstones_by_table', 'tombstones_by_seminar')]
+        self.assertEqual(query_audit.recommended_ddl(reports), [
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_change_log_seminar_id_deleted_at ON change_log(seminar_id, deleted_at);',
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_change_log_table_name_deleted_at ON change_log(table_name, deleted_at);',
+        ])
+
+
+
+class MicrobenchTestCase(TestCase):
+    """Test cases for the synthetic data generator and view micro-benchmarks"""
+
+    def test_dataset_is_deterministic(self):
+        """Test the same seed gives the same tables, with unique registrations per seminar"""
+        tables = synthetic.dataset(2000, seed=7)
+        self.assertEqual(tables, synthetic.dataset(2000, seed=7))
+        self.assertEqual(len(tables['seminars']), 2)
+        self.assertEqual(len(tables['joined_participants']), 2000)
+        pairs = {(r['seminar_id'], r['participant_email']) for r in tables['joined_participants']}
+        self.assertEqual(len(pairs), 2000)
+        self.assertTrue(0 < len(tables['evaluations']) < len(tables['attendance']) < 2000)
+
+    def test_run_and_compare(self):
+        """Test every benchmark runs at a small size and regressions are reported against a baseline"""
+        results = microbench.run(sizes=(50,), budget=0)
+        self.assertEqual(set(results['results']), set(microbench.BENCHMARKS))
+        for by_size in results['results'].values():
+            self.assertGreaterEqual(by_size['50']['runs'], microbench.MIN_RUNS)
+            self.assertGreater(by_size['50']['min_ms'], 0)
+        self.assertEqual(microbench.compare(results, results), [])
+
+        faster = json.loads(json.dumps(results))
+        faster['results']['success_response']['50']['min_ms'] /= 2
+        regressions = microbench.compare(results, faster)
+        self.assertEqual([r[:3] for r in regressions], [('success_response', '50', 'min_ms')])
+
+
+class BatchTestCase(TestCase):
+    """Test cases for POST /api/batch/"""
+
+    def setUp(self):
+        self.fake = FakeSupabaseClient({'seminars': [{'id': 'batch-seminar', 'title': 'Batch'}]})
+        patcher = patch.object(views, 'sb', self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _batch(self, requests):
+        return self.client.post('/api/batch/', data=json.dumps({'requests': requests}), content_type='application/json')
+
+    def test_dependent_requests_use_earlier_results(self):
+        """Test sub-requests run through the normal routes and can reference each other's results"""
+        response = self._batch([
+            {'id': 'seminar', 'path': '/api/seminars/batch-seminar/'},
+            {'id': 'in', 'method': 'POST', 'path': '/api/seminars/{{seminar.data.id}}/attendance/time_in/',
+             'body': {'participant_email': 'batch@x.com'}},
+            {'id': 'attendance', 'path': '/api/seminars/batch-seminar/attendance/', 'depends_on': ['in']},
+            {'id': 'missing', 'path': '/api/nothing-here/'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = {r['id']: r for r in response.json()['data']}
+        self.assertEqual([r['id'] for r in response.json()['data']], ['seminar', 'in', 'attendance', 'missing'])
+        self.assertEqual(results['seminar']['body']['data']['title'], 'Batch')
+        self.assertEqual(results['in']['status'], 201)
+        self.assertEqual([r['participant_email'] for r in results['attendance']['body']['data']], ['batch@x.com'])
+        self.assertEqual(results['missing']['status'], 404)
+
+    def test_qr_scan_batch_includes_evaluation_check(self):
+        """Test the QR scan's seminar, evaluation check and time-in come back from one batch"""
+        self.fake.tables['evaluations'] = [{'id': 1, 'seminar_id': 'batch-seminar', 'participant_email': 'qr@x.com',
+                                            'answers': {}}]
+        response = self._batch([
+            {'id': 'seminar', 'path': '/api/seminars/batch-seminar/'},
+            {'id': 'evaluated', 'path': '/api/seminars/batch-seminar/evaluations/check/?participant_email=qr%40x.com'},
+            {'id': 'in', 'method': 'POST', 'path': '/api/seminars/batch-seminar/attendance/time_in/',
+             'body': {'participant_email': 'qr@x.com'}},
+        ])
+        results = {r['id']: r for r in response.json()['data']}
+        self.assertEqual(results['evaluated']['body'], {'evaluated': True})
+        self.assertEqual(results['in']['status'], 201)
+
+    def test_failed_dependency_skips_dependents(self):
+        """Test a request whose dependency failed is answered with 424 and never sent"""
+        response = self._batch([
+            {'id': 'in', 'method': 'POST', 'path': '/api/seminars/batch-seminar/attendance/time_in/', 'body': {}},
+            {'id': 'out', 'method': 'POST', 'path': '/api/seminars/batch-seminar/attendance/time_out/',
+             'body': {'participant_email': '{{in.data.participant_email}}'}},
+        ])
+        self.assertEqual([(r['id'], r['status']) for r in response.json()['data']], [('in', 400), ('out', 424)])
+        self.assertEqual(self.fake.tables.get('attendance', []), [])
+
+    def test_invalid_batches_are_rejected(self):
+        """Test cycles, unknown references and nested batches"""
+        cycle = self._batch([{'id': 'a', 'path': '/api/seminars/', 'depends_on': ['b']},
+                             {'id': 'b', 'path': '/api/seminars/', 'depends_on': ['a']}])
+        self.assertEqual((cycle.status_code, cycle.json()['error']), (400, 'Request dependencies form a cycle'))
+        unknown = self._batch([{'id': 'a', 'path': '/api/seminars/{{nope.data.id}}/'}])
+        self.assertEqual(unknown.status_code, 400)
+        self.assertEqual(self._batch([{'path': '/admin/'}]).status_code, 400)
+        nested = self._batch([{'method': 'POST', 'path': '/api/batch/', 'body': {'requests': []}}])
+        self.assertEqual(nested.json()['data'][0]['status'], 400)
+
+
+class LoggingTestCase(TestCase):
+    """Test cases for queued logging, upstream sampling and request ids"""
+
+    def _record(self, exc=None, lineno=10, msg='Error fetching attendance for seminar %s', args=('s1',)):
+        return logging.LogRecord('api.views', logging.ERROR, 'views.py', lineno, msg, args,
+                                 (type(exc), exc, None) if exc else None)
+
+    def test_background_handler_rotates_and_drops_when_full(self):
+        """Test records are written by the writer thread with rotation, and a full queue drops instead of blocking"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'api.log')
+            handler = logs.BackgroundHandler(path, max_bytes=2000, backup_count=2, fmt='json', console_level='CRITICAL')
+            for i in range(100):
+                handler.handle(self._record(args=(f's{i}',)))
+            handler.stop()
+            # One file per process, named with its pid
+            self.assertFalse(os.path.exists(path))
+            path = logs.process_filename(path)
+            self.assertEqual(path, os.path.join(tmp, f'api.{os.getpid()}.log'))
+            self.assertTrue(os.path.exists(path + '.1'))
+            with open(path) as fh:
+                last = json.loads(fh.read().splitlines()[-1])
+            self.assertEqual((last['message'], last['request_id']), ('Error fetching attendance for seminar s99', '-'))
+
+            full = logs.BackgroundHandler(os.path.join(tmp, 'full.log'), queue_size=2, console_level='CRITICAL')
+            full.listener.stop()
+            for i in range(5):
+                full.handle(self._record())
+            self.assertEqual(full.dropped, 3)
+            full.stop()
+
+    def test_upstream_failures_are_sampled_per_call_site(self):
+        """Test repeated upstream-failure records are cut to a burst and the drop count is reported"""
+        sampler = logs.UpstreamSampler(window=60, burst=2)
+        down = ConnectionError('Supabase unreachable')
+        self.assertEqual([sampler.filter(self._record(down)) for _ in range(5)], [True, True, False, False, False])
+        self.assertTrue(sampler.filter(self._record(down, lineno=11)))
+        self.assertTrue(all(sampler.filter(self._record(ValueError('bad input'))) for _ in range(5)))
+
+        sampler._sites[('views.py', 10)][0] -= 61
+        record = self._record(down)
+        self.assertTrue(sampler.filter(record))
+        self.assertEqual(record.getMessage(), 'Error fetching attendance for seminar s1 [3 similar record(s) suppressed]')
+
+    def test_request_id_header(self):
+        """Test a caller's request id is echoed back and an unusable one replaced"""
+        response = self.client.get('/', HTTP_X_REQUEST_ID='trace-123')
+        self.assertEqual(response[logs.REQUEST_ID_HEADER], 'trace-123')
+        response = self.client.get('/', HTTP_X_REQUEST_ID='bad id with spaces')
+        self.assertRegex(response[logs.REQUEST_ID_HEADER], r'^[0-9a-f]{32}$')
+
+
+@override_settings(API_LOG_BUFFER_SIZE=100, API_LOG_SAMPLE_RATE=0, API_LOG_SLOW_MS=1000)
+class AuditTestCase(TestCase):
+    """Test cases for the batched API audit trail"""
+
+    def setUp(self):
+        self.client = Client()
+        patcher = patch.object(views, 'sb', FakeSupabaseClient({'seminars': []}))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Flushed by the tests themselves rather than by the background thread
+        flusher = patch.object(audit.trail, '_ensure_flusher')
+        flusher.start()
+        self.addCleanup(flusher.stop)
+        audit.trail.buffer.clear()
+
+    def test_errors_are_buffered_then_bulk_written(self):
+        """Test errors are recorded without a database write until the flush"""
+        self.client.get(reverse('seminars_list_create'))
+        self.client.post(reverse('seminars_list_create'), data='not json', content_type='application/json',
+                         HTTP_X_REQUEST_ID='req-1')
+        self.assertEqual(ApiLog.objects.count(), 0)
+        self.assertEqual(audit.trail.flush(), 1)
+        row = ApiLog.objects.get()
+        self.assertEqual((row.endpoint, row.method, row.status_code, row.request_id, row.error_message),
+                         ('/api/seminars/', 'POST', 400, 'req-1', 'Invalid JSON in request body'))
+        self.assertIsNotNone(row.latency_ms)
+
+    def test_slow_and_sampled_requests(self):
+        """Test slow calls are always recorded and the sample rate covers the rest"""
+        with override_settings(API_LOG_SLOW_MS=0):
+            Client().get(reverse('seminars_list_create'))
+        with override_settings(API_LOG_SAMPLE_RATE=1):
+            Client().get(reverse('seminars_list_create'))
+        self.client.get('/')
+        self.assertEqual(audit.trail.flush(), 2)
+
+    def test_compaction_keeps_errors_and_slow_calls_longer(self):
+        """Test sampled rows expire first and everything expires after the retention period"""
+        now = timezone.now()
+        for days, status, latency in ((1, 200, 5), (10, 200, 5), (10, 200, 5000), (10, 500, 5), (100, 500, 5)):
+            ApiLog.objects.create(timestamp=now - timedelta(days=days), endpoint='/api/seminars/', method='GET',
+                                  status_code=status, latency_ms=latency)
+        with override_settings(API_LOG_COMPACT_AFTER_DAYS=7, API_LOG_RETENTION_DAYS=90):
+            self.assertEqual(audit.compact(now), {'expired': 1, 'sampled': 1})
+        self.assertEqual(sorted(ApiLog.objects.values_list('status_code', 'latency_ms')),
+                         [(200, 5.0), (200, 5000.0), (500, 5.0)])
+
+
+@override_settings(REMINDER_BATCH_SIZE=2, REMINDER_SMTP_CONNECTIONS=2, REMINDER_RATE_PER_SECOND=0)
+class EvaluationReminderTestCase(TestCase):
+    """Test cases for evaluation reminder emails"""
+
+    def setUp(self):
+        timed_out = '2025-11-01T10:00:00Z'
+        self.fake = FakeSupabaseClient({
+            'seminars': [{'id': 'sem-r', 'title': 'Research Methods'}],
+            'attendance': [{'id': i, 'seminar_id': 'sem-r', 'participant_email': f'r{i}@x.com',
+                            'time_in': '2025-11-01T09:00:00Z', 'time_out': timed_out if i <= 5 else None}
+                           for i in range(1, 7)],
+            'evaluations': [{'id': 1, 'seminar_id': 'sem-r', 'participant_email': 'R2@x.com'}],
+            'joined_participants': [{'id': 1, 'seminar_id': 'sem-r', 'participant_email': 'R1@X.com',
+                                     'participant_name': 'Rina'}],
+        })
+        self.smtp = FakeSMTPServer()
+        self.smtp.__enter__()
+        self.addCleanup(self.smtp.__exit__)
+        settings_override = override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                                              EMAIL_HOST=self.smtp.host, EMAIL_PORT=self.smtp.port, EMAIL_USE_TLS=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_job_mails_pending_participants_over_reused_connections(self):
+        """Test only timed-out participants without an evaluation are mailed, over at most two connections"""
+        with patch.object(views, 'sb', self.fake):
+            response = Client().post(reverse('jobs_list_create'), content_type='application/json',
+                                     data=json.dumps({'kind': 'evaluation_reminders', 'params': {'seminar_id': 'sem-r'}}))
+            jobs.Worker(self.fake, name='test-worker').run_pending()
+            job = Client().get(reverse('job_detail', args=[response.json()['data']['id']])).json()['data']
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual((job['result']['pending'], job['result']['sent']), (4, 4))
+        self.assertEqual(sorted(self.smtp.recipients), ['r1@x.com', 'r3@x.com', 'r4@x.com', 'r5@x.com'])
+        self.assertLessEqual(self.smtp.connections, 2)
+        message = next(data for _, to, data in self.smtp.messages if to == ['r1@x.com'])
+        self.assertIn(b'Hi Rina', message)
+        self.assertIn(qrcodes.evaluation_url('sem-r').encode(), message)
+
+    def test_reruns_skip_the_ledger_and_retry_refusals(self):
+        """Test refused addresses stay out of the ledger and a rerun mails only them"""
+        self.smtp.refuse.add('r4@x.com')
+        result = reminders.send_reminders(self.fake, 'sem-r')
+        self.assertEqual((result['sent'], result['failed']), (3, 1))
+        self.assertEqual(ReminderSent.objects.filter(seminar_id='sem-r').count(), 3)
+
+        self.smtp.refuse.clear()
+        result = reminders.send_reminders(self.fake, 'sem-r')
+        self.assertEqual((result['already_reminded'], result['sent'], result['failed']), (3, 1, 0))
+        self.assertEqual(self.smtp.recipients.count('r4@x.com'), 1)
+        self.assertEqual(reminders.send_reminders(self.fake, 'sem-r')['to_send'], 0)
+
+        # Addresses match whatever their case in attendance, evaluations or the ledger
+        self.fake.tables['attendance'][2]['participant_email'] = 'R3@X.COM'
+        ReminderSent.objects.filter(participant_email='r5@x.com').update(participant_email='R5@x.com')
+        self.assertEqual(reminders.send_reminders(self.fake, 'sem-r')['to_send'], 0)
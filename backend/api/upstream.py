@@ -0,0 +1,258 @@
+# Deadlines and a circuit breaker around Supabase calls
+# Every query built from the guarded client runs its `execute()` through one
+# per-process breaker. Timeouts, connection errors and 5xx-class upstream
+# errors count as failures; after UPSTREAM_BREAKER_THRESHOLD consecutive
+# failures the breaker opens and calls fail immediately with
+# UpstreamUnavailable until UPSTREAM_BREAKER_RESET_SECONDS have passed, when a
+# single probe call is let through. The per-call deadline itself is the
+# PostgREST client timeout (SUPABASE_TIMEOUT_SECONDS), set where the client
+# is created. Views turn upstream failures into 503s, and
+# UpstreamFallbackMiddleware answers failed GETs with the last good response.
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.http import HttpResponse
+
+try:
+    import httpx
+except Exception:
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+STALE_HEADER = 'X-Served-Stale'
+# Larger responses are not kept for stale reads
+STALE_MAX_BYTES = 1 << 20
+# Read endpoints whose last good response may stand in during an outage, by URL
+# name. Writes, job state, QR images and exports are never answered stale.
+STALE_VIEWS = frozenset({
+    'seminars_list_create', 'seminar_search', 'seminar_detail', 'seminar_attendance_list',
+    'joined_participants_list', 'seminar_counters', 'fetch_evaluations', 'has_evaluated',
+    'participant_history', 'participant_home', 'seminar_analytics', 'analytics_rollup',
+})
+
+# PostgreSQL/PostgREST error codes that mean the database, not the request, failed:
+# 08 connection exceptions, 53 insufficient resources, 57 operator intervention
+# (57014 is statement_timeout), PGRST000-003 connection and pool errors
+_UPSTREAM_CODE_PREFIXES = ('08', '53', '57', 'PGRST000', 'PGRST001', 'PGRST002', 'PGRST003')
+
+
+class UpstreamUnavailable(Exception):
+    """Raised without calling Supabase while the circuit breaker is open"""
+
+    def __init__(self, retry_after):
+        self.retry_after = max(1, int(retry_after + 0.999))
+        super().__init__(f'Supabase is unavailable; retry in {self.retry_after}s')
+
+
+def is_upstream_failure(exc):
+    """True for errors that say Supabase is unhealthy rather than the request bad"""
+    if isinstance(exc, UpstreamUnavailable):
+        return True
+    if httpx is not None and isinstance(exc, (httpx.TimeoutException, httpx.TransportError)):
+        return True
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(exc, 'code', None)
+    if isinstance(code, int) or (isinstance(code, str) and code.isdigit() and len(code) == 3):
+        # Non-JSON error bodies (gateway errors) carry the HTTP status as the code
+        return int(code) >= 500
+    return isinstance(code, str) and code.startswith(_UPSTREAM_CODE_PREFIXES)
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe"""
+
+    def __init__(self, threshold, reset_timeout, name='supabase'):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.stats = {'trips': 0, 'rejected': 0, 'failures': 0, 'last_trip_at': None}
+
+    def _allow(self):
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if self._state == OPEN and remaining <= 0:
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self.stats['rejected'] += 1
+            raise UpstreamUnavailable(max(remaining, 1))
+
+    def _record(self, failed):
+        with self._lock:
+            self._probing = False
+            if not failed:
+                if self._state != CLOSED:
+                    logger.info("%s circuit closed", self.name)
+                self._state = CLOSED
+                self._failures = 0
+                return
+            self.stats['failures'] += 1
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.threshold:
+                if self._state != OPEN:
+                    self.stats['trips'] += 1
+                    self.stats['last_trip_at'] = datetime.now(timezone.utc).isoformat()
+                    logger.warning("%s circuit opened after %s consecutive failure(s)", self.name, self._failures)
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def call(self, fn, *args, **kwargs):
+        self._allow()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self._record(is_upstream_failure(e))
+            raise
+        self._record(False)
+        return result
+
+    def is_open(self):
+        """True while calls are being rejected and no probe is due yet"""
+        with self._lock:
+            return self._state == OPEN and time.monotonic() - self._opened_at < self.reset_timeout
+
+    def snapshot(self):
+        with self._lock:
+            return {'state': self._state, 'consecutive_failures': self._failures, **self.stats}
+
+
+class _GuardedQuery:
+    """Proxy over a PostgREST request builder whose execute() goes through the breaker"""
+
+    def __init__(self, builder, breaker):
+        self._builder = builder
+        self._breaker = breaker
+
+    def execute(self):
+        return self._breaker.call(self._builder.execute)
+
+    def _wrap(self, value):
+        return _GuardedQuery(value, self._breaker) if hasattr(value, 'execute') else value
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return self._wrap(attr)
+
+        def method(*args, **kwargs):
+            return self._wrap(attr(*args, **kwargs))
+        return method
+
+
+class GuardedClient:
+    """Supabase client whose table queries are guarded by a circuit breaker"""
+
+    def __init__(self, client, breaker):
+        self._client = client
+        self.breaker = breaker
+
+    def table(self, name):
+        return _GuardedQuery(self._client.table(name), self.breaker)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+breaker = CircuitBreaker(settings.UPSTREAM_BREAKER_THRESHOLD, settings.UPSTREAM_BREAKER_RESET_SECONDS)
+
+
+def guard(client, circuit=None):
+    return GuardedClient(client, circuit or breaker)
+
+
+def retry_after(exc):
+    """Seconds a client should wait before retrying after `exc`"""
+    return exc.retry_after if isinstance(exc, UpstreamUnavailable) else breaker.reset_timeout
+
+
+# ---- stale reads ----
+
+class StaleResponses:
+    """In-process LRU of the last successful response per GET URL, bounded by total body bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def refresh(self, key, etag):
+        """Mark a stored entry current again if it has this ETag; no body copy"""
+        if not etag:
+            return False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[4] != etag:
+                return False
+            self._entries[key] = (time.monotonic(),) + entry[1:]
+            self._entries.move_to_end(key)
+            return True
+
+    def put(self, key, response):
+        content = response.content
+        if len(content) > min(STALE_MAX_BYTES, self.max_bytes):
+            return
+        entry = (time.monotonic(), response.status_code, content,
+                 response.get('Content-Type', 'application/json'), response.get('ETag'))
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[2])
+            self._entries[key] = entry
+            self._bytes += len(content)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted[2])
+
+    def get(self, key, max_age):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > max_age:
+            return None
+        stored_at, status, content, content_type, etag = entry
+        response = HttpResponse(content, status=status, content_type=content_type)
+        if etag:
+            response['ETag'] = etag
+        response[STALE_HEADER] = f'{int(time.monotonic() - stored_at)}s'
+        return response
+
+
+class UpstreamFallbackMiddleware:
+    """Serve the last good copy of a GET when Supabase is failing"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.responses = StaleResponses(settings.UPSTREAM_STALE_MAX_BYTES)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method != 'GET' or getattr(response, 'streaming', False):
+            return response
+        match = getattr(request, 'resolver_match', None)
+        if match is None or match.url_name not in STALE_VIEWS:
+            return response
+        key = request.get_full_path()
+        if response.status_code == 200:
+            if not self.responses.refresh(key, response.get('ETag')):
+                self.responses.put(key, response)
+        elif getattr(response, 'upstream_failure', False):
+            stale = self.responses.get(key, settings.UPSTREAM_STALE_SECONDS)
+            if stale is not None:
+                return stale
+        return response
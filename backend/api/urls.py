@@ -4,6 +4,7 @@ from . import views
 urlpatterns = [
     # Seminars
     path('seminars/', views.seminars_list_create, name='seminars_list_create'),
+    path('seminars/search/', views.seminar_search, name='seminar_search'),
     path('seminars/<str:seminar_id>/', views.seminar_detail, name='seminar_detail'),
 
     # Attendance (time in/out)
@@ -13,7 +14,11 @@ urlpatterns = [
 
     # Joined Participants
     path('seminars/<str:seminar_id>/participants/', views.joined_participants_list, name='joined_participants_list'),
+    path('seminars/<str:seminar_id>/counters/', views.seminar_counters, name='seminar_counters'),
+    path('seminars/<str:seminar_id>/qr/', views.seminar_qr_code, name='seminar_qr_code'),
+    path('seminars/<str:seminar_id>/qr/sheet/', views.seminar_qr_sheet, name='seminar_qr_sheet'),
     path('seminars/<str:seminar_id>/participants/join/', views.save_joined_participant, name='save_joined_participant'),
+    path('seminars/<str:seminar_id>/participants/import/', views.import_participants, name='import_participants'),
     path('seminars/<str:seminar_id>/participants/check_in/', views.check_in_participant, name='check_in_participant'),
     path('seminars/<str:seminar_id>/participants/check_out/', views.check_out_participant, name='check_out_participant'),
 
@@ -21,4 +26,22 @@ urlpatterns = [
     path('seminars/<str:seminar_id>/evaluations/', views.fetch_evaluations, name='fetch_evaluations'),
     path('seminars/<str:seminar_id>/evaluations/submit/', views.save_evaluation, name='save_evaluation'),
     path('seminars/<str:seminar_id>/evaluations/check/', views.has_evaluated, name='has_evaluated'),
+
+    # Participants
+    path('participants/<str:email>/history/', views.participant_history, name='participant_history'),
+    path('participants/<str:email>/home/', views.participant_home, name='participant_home'),
+
+    # Analytics
+    path('seminars/<str:seminar_id>/analytics/', views.seminar_analytics, name='seminar_analytics'),
+    path('analytics/', views.analytics_rollup, name='analytics_rollup'),
+
+    # Several requests in one round trip
+    path('batch/', views.batch_requests, name='batch_requests'),
+
+    # Background jobs
+    path('jobs/', views.jobs_list_create, name='jobs_list_create'),
+    path('jobs/stats/', views.job_stats, name='job_stats'),
+    path('jobs/<int:job_id>/', views.job_detail, name='job_detail'),
+    path('jobs/<int:job_id>/cancel/', views.job_cancel, name='job_cancel'),
+    path('jobs/<int:job_id>/download/', views.job_download, name='job_download'),
 ]
@@ -1,15 +1,32 @@
 import os
+import sys
 import json
 import logging
 from datetime import datetime
-from django.http import JsonResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.http import FileResponse, HttpResponse, JsonResponse
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
+from . import analytics, archive, batch, counters, idempotency, jobs, qrcodes, tasks
+from .batching import MicroBatcher, WriteTimeout
+from .cache_utils import bump, cached, email_scope, generation
+from .delta import (CHANGE_COLUMNS, apply_since, fetch_tombstones, high_water_mark, parse_since, parse_timestamp,
+                    record_tombstone)
+from .history import SEMINAR_COLUMNS, build_history
+from .home import build_home
+from .imports import ImportFormatError, import_registrants, iter_upload
+from .scans import recent_scans
+from .routing import router
+from .search import INDEX_FIELDS, STATUSES, parse_range_bound, seminar_index
+from . import upstream
+
 # Redeploy trigger
 
 try:
-    from supabase import create_client
+    from supabase import ClientOptions, create_client
 except Exception:
     create_client = None
 
@@ -19,21 +36,71 @@ SUPABASE_URL = os.environ.get('SUPABASE_URL')
 SUPABASE_SERVICE_ROLE_KEY = os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
 
 if create_client and SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY:
-    sb = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+    # The PostgREST timeout is the per-call deadline; the breaker stops callers
+    # from queueing up behind it while Supabase is unhealthy
+    sb = upstream.guard(create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY, options=ClientOptions(
+        postgrest_client_timeout=settings.SUPABASE_TIMEOUT_SECONDS)))
 else:
     sb = None
 
 
 def _error(msg, status=400):
     """Helper to return JSON error responses"""
+    # Handlers call this from their except blocks; upstream outages become 503s
+    if status == 500 and upstream.is_upstream_failure(sys.exc_info()[1]):
+        return _upstream_error(sys.exc_info()[1])
+    if status == 500 and isinstance(sys.exc_info()[1], counters.CountersBusy):
+        response = JsonResponse({'error': 'Too many concurrent registrations; please retry'}, status=503)
+        response['Retry-After'] = str(counters.CountersBusy.retry_after)
+        return response
     return JsonResponse({'error': str(msg)}, status=status)
 
 
+def _upstream_error(exc):
+    message = str(exc) if isinstance(exc, upstream.UpstreamUnavailable) else 'Supabase did not respond in time; please retry'
+    response = JsonResponse({'error': message}, status=503)
+    response['Retry-After'] = str(upstream.retry_after(exc))
+    # Lets UpstreamFallbackMiddleware answer GETs with the last good copy
+    response.upstream_failure = True
+    return response
+
+
 def _success(data, status=200):
     """Helper to return JSON success responses"""
     return JsonResponse({'data': data}, status=status)
 
 
+def _delta_success(rows, table, since, tombstones=None):
+    """List response carrying a `next_since` cursor (and tombstones for delta requests)"""
+    tombstones = tombstones or []
+    body = {'data': rows, 'next_since': high_water_mark(since, rows, CHANGE_COLUMNS[table], tombstones)}
+    if since is not None:
+        body['deleted'] = tombstones
+    return JsonResponse(body)
+
+
+def _archived_list(seminar_id, table, since, order, participant_email=None):
+    """List response served from the cold archive, or None if the seminar is not archived"""
+    if not archive.is_archived(seminar_id):
+        return None
+    column = CHANGE_COLUMNS[table]
+    rows = archive.query_rows(seminar_id, table, since, column, participant_email, order=column if since else order)
+    tombstones = fetch_tombstones(sb, since, seminar_id=seminar_id) if since else None
+    return _delta_success(rows, table, since, tombstones)
+
+
+def _archived_write(seminar_id):
+    """409 for writes to an archived seminar, whose reads are served from the archive"""
+    if archive.is_archived(seminar_id):
+        return _error('Seminar is archived and read-only', 409)
+    return None
+
+
+def _reader(request):
+    """Client for a request's reads: the replica when it is safe, else the primary"""
+    return router.client(request, sb)
+
+
 def _ensure_client():
     """Verify Supabase client is configured"""
     if sb is None:
@@ -48,13 +115,83 @@ def _parse_json_body(request):
             return json.loads(request.body.decode('utf-8'))
         return {}
     except json.JSONDecodeError as e:
-        logger.warning(f"JSON decode error: {str(e)}")
+        logger.warning("JSON decode error: %s", e)
         return None
 
 
+def _int_param(request, name, default, lo, hi):
+    try:
+        value = int(request.GET.get(name, default))
+    except (TypeError, ValueError):
+        return None
+    return value if lo <= value <= hi else None
+
+
+def _seminar_payload(body):
+    """Seminar row to insert or update, built from a create/update request body"""
+    return {
+        'title': body.get('title'),
+        'duration': int(body['duration']) if body.get('duration') else None,
+        'speaker': body.get('speaker'),
+        'capacity': int(body['participants']) if body.get('participants') else body.get('capacity'),
+        'date': body.get('date'),
+        'start_datetime': body.get('start_datetime'),
+        'end_datetime': body.get('end_datetime'),
+        'start_time': body.get('start_time'),
+        'end_time': body.get('end_time'),
+        'questions': body.get('questions'),
+        'metadata': body.get('metadata'),
+        'certificate_template_url': body.get('certificate_template_url'),
+    }
+
+
+# Timestamp columns compared as instants, so '...Z' and '...+00:00' are not a change
+_SEMINAR_TIMESTAMPS = ('start_datetime', 'end_datetime')
+
+
+def _seminar_changes(body):
+    """Only the seminar columns present in a PATCH body, normalized as _seminar_payload does"""
+    present = set(body) | ({'capacity'} if 'participants' in body else set())
+    return {column: value for column, value in _seminar_payload(body).items() if column in present}
+
+
+def _same_value(column, old, new):
+    if old == new:
+        return True
+    if column in _SEMINAR_TIMESTAMPS and old and new:
+        try:
+            return parse_timestamp(old) == parse_timestamp(new)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _seminar_etag(row):
+    """Strong ETag for a seminar row: its updated_at, which every write moves"""
+    stamp = (row or {}).get('updated_at')
+    return f'"{stamp}"' if stamp else None
+
+
+def _if_match(request, etag):
+    """False if the request's If-Match precondition does not hold for `etag`"""
+    header = request.headers.get('If-Match')
+    if header is None:
+        return True
+    tags = [t.strip() for t in header.split(',')]
+    return etag is not None and ('*' in tags or etag in tags)
+
+
+def _with_etag(response, row):
+    etag = _seminar_etag(row)
+    if etag:
+        response['ETag'] = etag
+    return response
+
+
 def _validate_seminar_data(data, is_create=False):
     """Validate seminar data"""
-    if is_create and not data.get('title'):
+    # title is NOT NULL; an update that sends it must not clear it
+    if (is_create or 'title' in data) and not data.get('title'):
         return None, 'title is required'
     
     try:
@@ -169,11 +306,11 @@ def seminar_detail(request, seminar_id):
                 sb.table('seminars').delete().eq('id', seminar_id).execute()
                 return JsonResponse({'message': 'Seminar deleted'}, status=204)
             except Exception as e:
-                logger.exception(f"Error deleting seminar {seminar_id}")
+                logger.exception("Error deleting seminar %s", seminar_id)
                 return _error(f"Failed to delete seminar: {str(e)}", 500)
 
     except Exception as e:
-        logger.exception(f"Error in seminar_detail for {seminar_id}")
+        logger.exception("Error in seminar_detail for %s", seminar_id)
         return _error(f"Operation failed: {str(e)}", 500)
 
 
@@ -201,7 +338,7 @@ def seminar_time_in(request, seminar_id):
             sel = sb.table('attendance').select('*').eq('seminar_id', seminar_id).eq('participant_email', participant_email).maybe_single().execute()
             existing = sel.data
         except Exception as e:
-            logger.warning(f"Attendance table check failed: {str(e)}")
+            logger.warning("Attendance table check failed: %s", e)
             existing = None
 
         now_iso = datetime.utcnow().isoformat() + 'Z'
@@ -216,7 +353,7 @@ def seminar_time_in(request, seminar_id):
                 }).select('*').execute()
                 return _success(ins.data, 201)
             except Exception as e:
-                logger.exception(f"Failed to insert attendance record: {str(e)}")
+                logger.exception("Failed to insert attendance record: %s", e)
                 return _error(f"Failed to record time-in: {str(e)}", 500)
         else:
             # Update existing record if time_in not set
@@ -226,7 +363,7 @@ def seminar_time_in(request, seminar_id):
             return _success(existing)
 
     except Exception as e:
-        logger.exception(f"Error recording time_in for {participant_email}")
+        logger.exception("Error recording time_in for %s", participant_email)
         return _error(f"Failed to record time-in: {str(e)}", 500)
 
 
@@ -252,7 +389,7 @@ def seminar_time_out(request, seminar_id):
             sel = sb.table('attendance').select('*').eq('seminar_id', seminar_id).eq('participant_email', participant_email).maybe_single().execute()
             existing = sel.data
         except Exception as e:
-            logger.warning(f"Attendance table check failed: {str(e)}")
+            logger.warning("Attendance table check failed: %s", e)
             existing = None
 
         now_iso = datetime.utcnow().isoformat() + 'Z'
@@ -267,7 +404,7 @@ def seminar_time_out(request, seminar_id):
                 }).select('*').execute()
                 return _success(ins.data, 201)
             except Exception as e:
-                logger.exception(f"Failed to insert attendance record: {str(e)}")
+                logger.exception("Failed to insert attendance record: %s", e)
                 return _error(f"Failed to record time-out: {str(e)}", 500)
         else:
             # Update existing record if time_out not set
@@ -277,7 +414,7 @@ def seminar_time_out(request, seminar_id):
             return _success(existing)
 
     except Exception as e:
-        logger.exception(f"Error recording time_out for {participant_email}")
+        logger.exception("Error recording time_out for %s", participant_email)
         return _error(f"Failed to record time-out: {str(e)}", 500)
 
 
@@ -293,7 +430,7 @@ def seminar_attendance_list(request, seminar_id):
         res = sb.table('attendance').select('*').eq('seminar_id', seminar_id).order('created_at').execute()
         return _success(res.data)
     except Exception as e:
-        logger.exception(f"Error fetching attendance for seminar {seminar_id}")
+        logger.exception("Error fetching attendance for seminar %s", seminar_id)
         return _error(f"Failed to fetch attendance: {str(e)}", 500)
 
 
@@ -325,7 +462,7 @@ def save_joined_participant(request, seminar_id):
         res = sb.table('joined_participants').insert(payload).select('*').execute()
         return _success(res.data, 201)
     except Exception as e:
-        logger.exception(f"Error saving joined participant for seminar {seminar_id}")
+        logger.exception("Error saving joined participant for seminar %s", seminar_id)
         return _error(f"Failed to save participant: {str(e)}", 500)
 
 
@@ -341,7 +478,7 @@ def joined_participants_list(request, seminar_id):
         res = sb.table('joined_participants').select('*').eq('seminar_id', seminar_id).order('joined_at').execute()
         return _success(res.data)
     except Exception as e:
-        logger.exception(f"Error fetching joined participants for seminar {seminar_id}")
+        logger.exception("Error fetching joined participants for seminar %s", seminar_id)
         return _error(f"Failed to fetch participants: {str(e)}", 500)
 
 
@@ -371,7 +508,7 @@ def check_in_participant(request, seminar_id):
             return _error('Participant not found for this seminar', 404)
         return _success(res.data)
     except Exception as e:
-        logger.exception(f"Error checking in participant {participant_email}")
+        logger.exception("Error checking in participant %s", participant_email)
         return _error(f"Failed to check in participant: {str(e)}", 500)
 
 
@@ -401,7 +538,7 @@ def check_out_participant(request, seminar_id):
             return _error('Participant not found for this seminar', 404)
         return _success(res.data)
     except Exception as e:
-        logger.exception(f"Error checking out participant {participant_email}")
+        logger.exception("Error checking out participant %s", participant_email)
         return _error(f"Failed to check out participant: {str(e)}", 500)
 
 
@@ -436,7 +573,7 @@ def save_evaluation(request, seminar_id):
         res = sb.table('evaluations').insert(payload).select('*').execute()
         return _success(res.data, 201)
     except Exception as e:
-        logger.exception(f"Error saving evaluation for {participant_email}")
+        logger.exception("Error saving evaluation for %s", participant_email)
         return _error(f"Failed to save evaluation: {str(e)}", 500)
 
 
@@ -457,7 +594,7 @@ def fetch_evaluations(request, seminar_id):
         res = query.execute()
         return _success(res.data)
     except Exception as e:
-        logger.exception(f"Error fetching evaluations for seminar {seminar_id}")
+        logger.exception("Error fetching evaluations for seminar %s", seminar_id)
         return _error(f"Failed to fetch evaluations: {str(e)}", 500)
 
 
@@ -482,7 +619,7 @@ def has_evaluated(request, seminar_id):
         error_str = str(e).lower()
         if 'no rows' in error_str or 'single' in error_str:
             return JsonResponse({'evaluated': False})
-        logger.exception(f"Error checking evaluation for {participant_email}")
+        logger.exception("Error checking evaluation for %s", participant_email)
         return _error(f"Failed to check evaluation status: {str(e)}", 500)
 
 
@@ -497,9 +634,16 @@ def seminars_list_create(request):
         return err
 
     if request.method == 'GET':
+        since, since_err = parse_since(request)
+        if since_err:
+            return _error(since_err, 400)
         try:
-            res = sb.table('seminars').select('*').order('date').execute()
-            return _success(res.data)
+            db = _reader(request)
+            if since is None:
+                res = db.table('seminars').select('*').order('date').execute()
+                return _delta_success(res.data, 'seminars', since)
+            res = apply_since(db.table('seminars').select('*'), 'seminars', since).order('updated_at').execute()
+            return _delta_success(res.data, 'seminars', since, fetch_tombstones(db, since, table='seminars'))
         except Exception as e:
             logger.exception("Error fetching seminars")
             return _error(f"Failed to fetch seminars: {str(e)}", 500)
@@ -510,21 +654,9 @@ def seminars_list_create(request):
             return _error('Invalid JSON in request body', 400)
 
         try:
-            payload = {
-                'title': body.get('title'),
-                'duration': int(body['duration']) if body.get('duration') else None,
-                'speaker': body.get('speaker'),
-                'capacity': int(body['participants']) if body.get('participants') else body.get('capacity'),
-                'date': body.get('date'),
-                'start_datetime': body.get('start_datetime'),
-                'end_datetime': body.get('end_datetime'),
-                'start_time': body.get('start_time'),
-                'end_time': body.get('end_time'),
-                'questions': body.get('questions'),
-                'metadata': body.get('metadata'),
-                'certificate_template_url': body.get('certificate_template_url'),
-            }
+            payload = _seminar_payload(body)
             res = sb.table('seminars').insert(payload).select('*').execute()
+            _on_seminar_change(rows=res.data)
             return _success(res.data, 201)
         except Exception as e:
             logger.exception("Error creating seminar")
@@ -532,52 +664,171 @@ def seminars_list_create(request):
 
 
 @csrf_exempt
-@require_http_methods(["GET", "PUT", "DELETE"])
+@require_http_methods(["GET", "PUT", "PATCH", "DELETE"])
 def seminar_detail(request, seminar_id):
-    """GET: fetch seminar | PUT: update seminar | DELETE: delete seminar"""
+    """GET: fetch seminar | PUT: replace seminar | PATCH: update given fields | DELETE: delete seminar"""
     ok, err = _ensure_client()
     if not ok:
         return err
 
     try:
         if request.method == 'GET':
-            res = sb.table('seminars').select('*').eq('id', seminar_id).single().execute()
-            return _success(res.data)
+            res = _reader(request).table('seminars').select('*').eq('id', seminar_id).single().execute()
+            return _with_etag(_success(res.data), res.data)
 
         elif request.method == 'PUT':
             body = _parse_json_body(request)
             if body is None:
                 return _error('Invalid JSON in request body', 400)
+            # A replace writes every column, so it is validated like a create
+            _, error = _validate_seminar_data(body, is_create=True)
+            if error:
+                return _error(error, 400)
 
-            payload = {
-                'title': body.get('title'),
-                'duration': int(body['duration']) if body.get('duration') else None,
-                'speaker': body.get('speaker'),
-                'capacity': int(body['participants']) if body.get('participants') else body.get('capacity'),
-                'date': body.get('date'),
-                'start_datetime': body.get('start_datetime'),
-                'end_datetime': body.get('end_datetime'),
-                'start_time': body.get('start_time'),
-                'end_time': body.get('end_time'),
-                'questions': body.get('questions'),
-                'metadata': body.get('metadata'),
-                'certificate_template_url': body.get('certificate_template_url'),
-                'updated_at': datetime.utcnow().isoformat() + 'Z',
-            }
+            payload = dict(_seminar_payload(body), updated_at=datetime.utcnow().isoformat() + 'Z')
             res = sb.table('seminars').update(payload).eq('id', seminar_id).select('*').execute()
-            return _success(res.data)
+            _on_seminar_change(seminar_id, rows=res.data)
+            return _with_etag(_success(res.data), (res.data or [None])[0])
+
+        elif request.method == 'PATCH':
+            return _patch_seminar(request, seminar_id)
 
         elif request.method == 'DELETE':
             sb.table('seminars').delete().eq('id', seminar_id).execute()
+            _on_seminar_change(seminar_id, deleted=True)
+            # Attendance, participants and evaluations cascade with the seminar,
+            # so one tombstone covers them for delta-sync clients
+            try:
+                record_tombstone(sb, 'seminars', seminar_id, seminar_id)
+            except Exception:
+                logger.exception("Failed to record tombstone for seminar %s", seminar_id)
             return JsonResponse({'message': 'Seminar deleted'}, status=204)
 
     except Exception as e:
-        logger.exception(f"Error in seminar_detail for {seminar_id}")
+        logger.exception("Error in seminar_detail for %s", seminar_id)
         return _error(f"Operation failed: {str(e)}", 500)
 
 
+def _patch_seminar(request, seminar_id):
+    """Write only the fields that differ from the stored row, if it is still the version the client read"""
+    body = _parse_json_body(request)
+    if not isinstance(body, dict):
+        return _error('Invalid JSON in request body', 400)
+    _, error = _validate_seminar_data(body)
+    if error:
+        return _error(error, 400)
+    changes = _seminar_changes(body)
+    if not changes:
+        return _error('No seminar fields to update', 400)
+
+    rows = sb.table('seminars').select('*').eq('id', seminar_id).limit(1).execute().data
+    if not rows:
+        return _error('Seminar not found', 404)
+    current = rows[0]
+    if not _if_match(request, _seminar_etag(current)):
+        return _with_etag(_error('Seminar was modified since it was read; fetch it again and reapply the change', 412),
+                          current)
+
+    changed = sorted(column for column, value in changes.items() if not _same_value(column, current.get(column), value))
+    if not changed:
+        return _with_etag(JsonResponse({'data': current, 'changed': []}), current)
+
+    # Conditional on the version just read, so a write that lands in between is not overwritten
+    query = sb.table('seminars').update(
+        dict({column: changes[column] for column in changed}, updated_at=datetime.utcnow().isoformat() + 'Z')
+    ).eq('id', seminar_id)
+    stamp = current.get('updated_at')
+    query = query.eq('updated_at', stamp) if stamp else query.is_('updated_at', 'null')
+    res = query.select('*').execute()
+    if not res.data:
+        return _error('Seminar was modified since it was read; fetch it again and reapply the change', 412)
+    _on_seminar_change(seminar_id, rows=res.data, changed=changed)
+    return _with_etag(JsonResponse({'data': res.data[0], 'changed': changed}), res.data[0])
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def seminar_search(request):
+    """Search seminars by title/speaker prefix, date range and status bucket"""
+    ok, err = _ensure_client()
+    if not ok:
+        return err
+
+    q = request.GET.get('q', '')
+    status = request.GET.get('status') or None
+    if status and status not in STATUSES:
+        return _error(f"status must be one of: {', '.join(STATUSES)}", 400)
+    try:
+        date_from = parse_range_bound(request.GET['from']) if request.GET.get('from') else None
+        date_to = parse_range_bound(request.GET['to'], end_of_day=True) if request.GET.get('to') else None
+    except ValueError:
+        return _error('from and to must be YYYY-MM-DD dates or ISO-8601 timestamps', 400)
+    limit = _int_param(request, 'limit', 50, 1, 500)
+    offset = _int_param(request, 'offset', 0, 0, 10 ** 6)
+    if limit is None or offset is None:
+        return _error('limit must be 1-500 and offset must be non-negative', 400)
+
+    try:
+        seminar_index.ensure_fresh(sb)
+        total, rows = seminar_index.search(q, date_from, date_to, status, limit=limit, offset=offset)
+        return JsonResponse({'data': rows, 'total': total})
+    except Exception as e:
+        logger.exception("Error searching seminars")
+        return _error(f"Failed to search seminars: {str(e)}", 500)
+
+
 # ============ Attendance (Time In/Out) ============
 
+def _on_attendance_change(seminar_id, participant_email, **counts):
+    """Update live counters and invalidate derived data after a scan is recorded"""
+    counters.adjust(seminar_id, **counts)
+    analytics.invalidate(seminar_id)
+    bump(email_scope(participant_email))
+
+
+def _on_participant_change(seminar_id, participant_email):
+    """Invalidate derived data after a registration or evaluation is written"""
+    bump(email_scope(participant_email))
+
+
+# Seminar columns embedded in cached history, home, search and rollup results;
+# a PATCH touching only other columns (questions, metadata) leaves those valid
+SEMINAR_SUMMARY_FIELDS = (frozenset(INDEX_FIELDS) | frozenset(SEMINAR_COLUMNS.split(','))) - {'id', 'updated_at'}
+
+
+def _on_seminar_change(seminar_id=None, rows=None, deleted=False, changed=None):
+    """Invalidate derived data that embeds seminar details; `changed` narrows it to the columns a PATCH wrote"""
+    if changed is None or SEMINAR_SUMMARY_FIELDS.intersection(changed):
+        bump('seminars')
+    if deleted:
+        seminar_index.remove(seminar_id)
+        counters.forget(seminar_id)
+    else:
+        seminar_index.apply(rows)
+        if changed is None or 'capacity' in changed:
+            for row in rows or []:
+                if row and row.get('id') and 'capacity' in row:
+                    counters.set_capacity(row['id'], row['capacity'])
+
+
+DUPLICATE_SCAN_HEADER = 'X-Duplicate-Scan'
+
+
+def _repeat_scan(seminar_id, participant_email, action):
+    """Answer a repeat scan inside the dedup window without an upstream call"""
+    result = recent_scans.get(seminar_id, participant_email, action)
+    if result is None:
+        return None
+    response = _success(result)
+    response[DUPLICATE_SCAN_HEADER] = 'true'
+    return response
+
+
+def _scan_success(seminar_id, participant_email, action, data, status=200):
+    recent_scans.record(seminar_id, participant_email, action, data)
+    return _success(data, status)
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def seminar_time_in(request, seminar_id):
@@ -586,6 +837,10 @@ def seminar_time_in(request, seminar_id):
     if not ok:
         return err
 
+    archived = _archived_write(seminar_id)
+    if archived is not None:
+        return archived
+
     body = _parse_json_body(request)
     if body is None:
         return _error('Invalid JSON in request body', 400)
@@ -594,6 +849,10 @@ def seminar_time_in(request, seminar_id):
     if not participant_email:
         return _error('participant_email is required', 400)
 
+    repeat = _repeat_scan(seminar_id, participant_email, 'time_in')
+    if repeat is not None:
+        return repeat
+
     try:
         # Check if attendance record exists
         sel = sb.table('attendance').select('*').eq('seminar_id', seminar_id).eq('participant_email', participant_email).maybe_single().execute()
@@ -608,16 +867,18 @@ def seminar_time_in(request, seminar_id):
                 'participant_email': participant_email,
                 'time_in': now_iso
             }).select('*').execute()
-            return _success(ins.data, 201)
+            _on_attendance_change(seminar_id, participant_email, timed_in=1)
+            return _scan_success(seminar_id, participant_email, 'time_in', ins.data, 201)
         else:
             # Update existing record if time_in not set
             if not existing.get('time_in'):
                 upd = sb.table('attendance').update({'time_in': now_iso}).eq('id', existing.get('id')).select('*').execute()
-                return _success(upd.data)
-            return _success(existing)
+                _on_attendance_change(seminar_id, participant_email, timed_in=1)
+                return _scan_success(seminar_id, participant_email, 'time_in', upd.data)
+            return _scan_success(seminar_id, participant_email, 'time_in', existing)
 
     except Exception as e:
-        logger.exception(f"Error recording time_in for {participant_email}")
+        logger.exception("Error recording time_in for %s", participant_email)
         return _error(f"Failed to record time-in: {str(e)}", 500)
 
 
@@ -629,6 +890,10 @@ def seminar_time_out(request, seminar_id):
     if not ok:
         return err
 
+    archived = _archived_write(seminar_id)
+    if archived is not None:
+        return archived
+
     body = _parse_json_body(request)
     if body is None:
         return _error('Invalid JSON in request body', 400)
@@ -637,6 +902,10 @@ def seminar_time_out(request, seminar_id):
     if not participant_email:
         return _error('participant_email is required', 400)
 
+    repeat = _repeat_scan(seminar_id, participant_email, 'time_out')
+    if repeat is not None:
+        return repeat
+
     try:
         # Check if attendance record exists
         sel = sb.table('attendance').select('*').eq('seminar_id', seminar_id).eq('participant_email', participant_email).maybe_single().execute()
@@ -651,16 +920,18 @@ def seminar_time_out(request, seminar_id):
                 'participant_email': participant_email,
                 'time_out': now_iso
             }).select('*').execute()
-            return _success(ins.data, 201)
+            _on_attendance_change(seminar_id, participant_email, timed_out=1)
+            return _scan_success(seminar_id, participant_email, 'time_out', ins.data, 201)
         else:
             # Update existing record if time_out not set
             if not existing.get('time_out'):
                 upd = sb.table('attendance').update({'time_out': now_iso}).eq('id', existing.get('id')).select('*').execute()
-                return _success(upd.data)
-            return _success(existing)
+                _on_attendance_change(seminar_id, participant_email, timed_out=1)
+                return _scan_success(seminar_id, participant_email, 'time_out', upd.data)
+            return _scan_success(seminar_id, participant_email, 'time_out', existing)
 
     except Exception as e:
-        logger.exception(f"Error recording time_out for {participant_email}")
+        logger.exception("Error recording time_out for %s", participant_email)
         return _error(f"Failed to record time-out: {str(e)}", 500)
 
 
@@ -672,11 +943,21 @@ def seminar_attendance_list(request, seminar_id):
     if not ok:
         return err
 
+    since, since_err = parse_since(request)
+    if since_err:
+        return _error(since_err, 400)
+
     try:
-        res = sb.table('attendance').select('*').eq('seminar_id', seminar_id).order('created_at').execute()
-        return _success(res.data)
+        archived = _archived_list(seminar_id, 'attendance', since, 'created_at')
+        if archived is not None:
+            return archived
+        db = _reader(request)
+        query = apply_since(db.table('attendance').select('*').eq('seminar_id', seminar_id), 'attendance', since)
+        res = query.order(CHANGE_COLUMNS['attendance'] if since else 'created_at').execute()
+        tombstones = fetch_tombstones(db, since, seminar_id=seminar_id) if since else None
+        return _delta_success(res.data, 'attendance', since, tombstones)
     except Exception as e:
-        logger.exception(f"Error fetching attendance for seminar {seminar_id}")
+        logger.exception("Error fetching attendance for seminar %s", seminar_id)
         return _error(f"Failed to fetch attendance: {str(e)}", 500)
 
 
@@ -690,24 +971,76 @@ def save_joined_participant(request, seminar_id):
     if not ok:
         return err
 
+    archived = _archived_write(seminar_id)
+    if archived is not None:
+        return archived
+
     body = _parse_json_body(request)
     if body is None:
         return _error('Invalid JSON in request body', 400)
 
+    participant_email = body.get('participant_email')
+    if not participant_email:
+        return _error('participant_email is required', 400)
+
     try:
-        payload = {
-            'seminar_id': seminar_id,
-            'participant_email': body.get('participant_email'),
-            'participant_name': body.get('participant_name'),
-            'metadata': body.get('metadata'),
-        }
-        res = sb.table('joined_participants').insert(payload).select('*').execute()
+        payload = {'seminar_id': seminar_id, 'participant_email': participant_email}
+        # Only columns the caller sent, so a re-join cannot null out a stored name or metadata
+        payload.update({k: body[k] for k in ('participant_name', 'metadata') if k in body})
+        res = None
+        if counters.reserve_seat(sb, seminar_id):
+            try:
+                # Insert-if-absent returns no row when the participant already holds a seat
+                res = sb.table('joined_participants').upsert(payload, on_conflict='seminar_id,participant_email', ignore_duplicates=True).execute()
+            except Exception:
+                counters.adjust(seminar_id, registered=-1)
+                raise
+            if not res.data:
+                counters.adjust(seminar_id, registered=-1)
+        else:
+            # Full: only participants who already hold a seat may re-join
+            existing = sb.table('joined_participants').select('id').eq('seminar_id', seminar_id).eq('participant_email', participant_email).limit(1).execute()
+            if not existing.data:
+                return _error('Seminar is at capacity', 409)
+        if res is None or not res.data:
+            # Upsert on the (seminar_id, participant_email) unique index so a
+            # repeated join updates the registration instead of duplicating it
+            res = sb.table('joined_participants').upsert(payload, on_conflict='seminar_id,participant_email').execute()
+        _on_participant_change(seminar_id, participant_email)
         return _success(res.data, 201)
     except Exception as e:
-        logger.exception(f"Error saving joined participant for seminar {seminar_id}")
+        logger.exception("Error saving joined participant for seminar %s", seminar_id)
         return _error(f"Failed to save participant: {str(e)}", 500)
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def import_participants(request, seminar_id):
+    """Bulk-register participants from a CSV, NDJSON or JSON upload"""
+    ok, err = _ensure_client()
+    if not ok:
+        return err
+
+    archived = _archived_write(seminar_id)
+    if archived is not None:
+        return archived
+
+    try:
+        rows = iter_upload(request)
+        summary = import_registrants(sb, seminar_id, rows, chunk_size=settings.BULK_IMPORT_CHUNK_SIZE)
+        # Too many addresses to invalidate one by one
+        bump('participants')
+    except ImportFormatError as e:
+        return _error(str(e), 400)
+    except Exception as e:
+        logger.exception("Error importing participants for seminar %s", seminar_id)
+        return _error(f"Failed to import participants: {str(e)}", 500)
+
+    if summary['received'] == 0:
+        return _error('No participant rows found in upload', 400)
+    return _success(summary)
+
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def joined_participants_list(request, seminar_id):
@@ -716,14 +1049,121 @@ def joined_participants_list(request, seminar_id):
     if not ok:
         return err
 
+    since, since_err = parse_since(request)
+    if since_err:
+        return _error(since_err, 400)
+
     try:
-        res = sb.table('joined_participants').select('*').eq('seminar_id', seminar_id).order('joined_at').execute()
-        return _success(res.data)
+        archived = _archived_list(seminar_id, 'joined_participants', since, 'joined_at')
+        if archived is not None:
+            return archived
+        db = _reader(request)
+        query = apply_since(db.table('joined_participants').select('*').eq('seminar_id', seminar_id), 'joined_participants', since)
+        res = query.order(CHANGE_COLUMNS['joined_participants'] if since else 'joined_at').execute()
+        tombstones = fetch_tombstones(db, since, seminar_id=seminar_id) if since else None
+        return _delta_success(res.data, 'joined_participants', since, tombstones)
     except Exception as e:
-        logger.exception(f"Error fetching joined participants for seminar {seminar_id}")
+        logger.exception("Error fetching joined participants for seminar %s", seminar_id)
         return _error(f"Failed to fetch participants: {str(e)}", 500)
 
 
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def seminar_counters(request, seminar_id):
+    """Live registered / present / timed-in / timed-out counts and remaining capacity"""
+    ok, err = _ensure_client()
+    if not ok:
+        return err
+
+    try:
+        return _success(counters.as_dict(counters.get(sb, seminar_id)))
+    except Exception as e:
+        logger.exception("Error fetching counters for seminar %s", seminar_id)
+        return _error(f"Failed to fetch counters: {str(e)}", 500)
+
+
+def _qr_response(request, content, content_type, etag, cache_control):
+    etag = f'"{etag}"'
+    if etag in [t.strip() for t in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(content, content_type=content_type)
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def seminar_qr_code(request, seminar_id):
+    """QR code image for a participant (?participant_email=) or for joining the seminar"""
+    if qrcodes.segno is None:
+        return _error('QR code rendering is not available (segno is not installed)', 501)
+    fmt = request.GET.get('format', 'png').lower()
+    if fmt not in qrcodes.FORMATS:
+        return _error(f"format must be one of: {', '.join(qrcodes.FORMATS)}", 400)
+    scale = _int_param(request, 'scale', 8, 1, 40)
+    if scale is None:
+        return _error('scale must be an integer between 1 and 40', 400)
+
+    email = request.GET.get('participant_email')
+    data = qrcodes.participant_url(seminar_id, email) if email else qrcodes.seminar_url(seminar_id)
+    image = qrcodes.render(data, fmt, scale)
+    # The ETag hashes the encoded URL, FRONTEND_URL included, so a changed frontend revalidates to a new image
+    return _qr_response(request, image, qrcodes.FORMATS[fmt], qrcodes.digest(data, fmt, scale),
+                        qrcodes.IMAGE_CACHE_CONTROL)
+
+
+def _queue_sheet(seminar_id, paper, title):
+    """202 with a qr_sheet job for this sheet, reusing one that is already queued or running"""
+    params = {'seminar_id': seminar_id, 'paper': paper, 'title': title}
+    pending = jobs.Job.objects.filter(kind='qr_sheet', status__in=(jobs.QUEUED, jobs.RUNNING)).order_by('id')
+    job = next((j for j in pending if j.params == params), None) or jobs.enqueue('qr_sheet', params)
+    response = _success(jobs.as_dict(job), 202)
+    response['Location'] = reverse('job_detail', args=[job.pk])
+    response['Retry-After'] = '5'
+    return response
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def seminar_qr_sheet(request, seminar_id):
+    """Printable PDF of every registrant's QR code, labelled with name and email"""
+    ok, err = _ensure_client()
+    if not ok:
+        return err
+    if qrcodes.segno is None:
+        return _error('QR code rendering is not available (segno is not installed)', 501)
+    paper = request.GET.get('paper', 'letter').lower()
+    if paper not in qrcodes.PAPER_SIZES:
+        return _error(f"paper must be one of: {', '.join(qrcodes.PAPER_SIZES)}", 400)
+
+    db = _reader(request)
+    try:
+        if archive.is_archived(seminar_id):
+            registrants = archive.read_rows(seminar_id, 'joined_participants')
+        else:
+            registrants = analytics.fetch_all(lambda: db.table('joined_participants').select('participant_email, participant_name')
+                                              .eq('seminar_id', seminar_id).order('id'))
+        title = (db.table('seminars').select('title').eq('id', seminar_id).limit(1).execute().data or [{}])[0].get('title')
+    except Exception as e:
+        logger.exception("Error fetching registrants for QR sheet of seminar %s", seminar_id)
+        return _error(f"Failed to fetch participants: {str(e)}", 500)
+
+    badges = qrcodes.sheet_badges(seminar_id, registrants)
+    etag = qrcodes.sheet_etag(badges, paper, title)
+    pdf = qrcodes.cached_sheet(etag)
+    if pdf is None and len(badges) > settings.QR_SHEET_SYNC_MAX_BADGES:
+        # Too slow to encode within a request; the job caches the sheet for the next GET
+        return _queue_sheet(seminar_id, paper, title)
+    if pdf is None:
+        _, pdf = qrcodes.sheet(badges, paper, title)
+    response = _qr_response(request, pdf, 'application/pdf', etag, 'private, no-cache')
+    response['Content-Disposition'] = f'inline; filename="qr-{seminar_id}.pdf"'
+    return response
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def check_in_participant(request, seminar_id):
@@ -732,6 +1172,10 @@ def check_in_participant(request, seminar_id):
     if not ok:
         return err
 
+    archived = _archived_write(seminar_id)
+    if archived is not None:
+        return archived
+
     body = _parse_json_body(request)
     if body is None:
         return _error('Invalid JSON in request body', 400)
@@ -740,15 +1184,25 @@ def check_in_participant(request, seminar_id):
     if not participant_email:
         return _error('participant_email is required', 400)
 
+    repeat = _repeat_scan(seminar_id, participant_email, 'check_in')
+    if repeat is not None:
+        return repeat
+
     try:
         payload = {
             'present': True,
             'check_in': datetime.utcnow().isoformat() + 'Z'
         }
-        res = sb.table('joined_participants').update(payload).eq('seminar_id', seminar_id).eq('participant_email', participant_email).select('*').execute()
-        return _success(res.data)
+        # One conditional write; it only matches when presence actually changes
+        res = sb.table('joined_participants').update(payload).eq('seminar_id', seminar_id).eq('participant_email', participant_email).not_.is_('present', 'true').select('*').execute()
+        changed = bool(res.data)
+        if not changed:
+            # Already checked in: keep the first check-in time and return the row as it is
+            res = sb.table('joined_participants').select('*').eq('seminar_id', seminar_id).eq('participant_email', participant_email).execute()
+        _on_attendance_change(seminar_id, participant_email, present=1 if changed else 0)
+        return _scan_success(seminar_id, participant_email, 'check_in', res.data)
     except Exception as e:
-        logger.exception(f"Error checking in participant {participant_email}")
+        logger.exception("Error checking in participant %s", participant_email)
         return _error(f"Failed to check in participant: {str(e)}", 500)
 
 
@@ -760,6 +1214,10 @@ def check_out_participant(request, seminar_id):
     if not ok:
         return err
 
+    archived = _archived_write(seminar_id)
+    if archived is not None:
+        return archived
+
     body = _parse_json_body(request)
     if body is None:
         return _error('Invalid JSON in request body', 400)
@@ -768,20 +1226,61 @@ def check_out_participant(request, seminar_id):
     if not participant_email:
         return _error('participant_email is required', 400)
 
+    repeat = _repeat_scan(seminar_id, participant_email, 'check_out')
+    if repeat is not None:
+        return repeat
+
     try:
         payload = {
             'present': False,
             'check_out': datetime.utcnow().isoformat() + 'Z'
         }
-        res = sb.table('joined_participants').update(payload).eq('seminar_id', seminar_id).eq('participant_email', participant_email).select('*').execute()
-        return _success(res.data)
+        # One conditional write; it only matches when presence actually changes
+        res = sb.table('joined_participants').update(payload).eq('seminar_id', seminar_id).eq('participant_email', participant_email).is_('present', 'true').select('*').execute()
+        changed = bool(res.data)
+        if not changed:
+            # Already checked out: keep the first check-out time and return the row as it is
+            res = sb.table('joined_participants').select('*').eq('seminar_id', seminar_id).eq('participant_email', participant_email).execute()
+        _on_attendance_change(seminar_id, participant_email, present=-1 if changed else 0)
+        return _scan_success(seminar_id, participant_email, 'check_out', res.data)
     except Exception as e:
-        logger.exception(f"Error checking out participant {participant_email}")
+        logger.exception("Error checking out participant %s", participant_email)
         return _error(f"Failed to check out participant: {str(e)}", 500)
 
 
 # ============ Evaluations ============
 
+def _insert_evaluations(payloads):
+    """Multi-row insert used by the evaluation micro-batcher"""
+    res = sb.table('evaluations').insert(payloads).execute()
+    return [[row] for row in res.data]
+
+
+def _insert_evaluation(payload):
+    """Single-row insert used when batching is disabled"""
+    return sb.table('evaluations').insert(payload).select('*').execute().data
+
+
+def _insert_evaluation_once(payload):
+    """Batch fallback: the failed insert may have written this row before erroring"""
+    existing = sb.table('evaluations').select('*').eq('seminar_id', payload['seminar_id']) \
+        .eq('participant_email', payload['participant_email']).execute().data or []
+    for row in existing:
+        if row.get('answers') == payload['answers']:
+            return [row]
+    return _insert_evaluation(payload)
+
+
+evaluation_writer = MicroBatcher(
+    _insert_evaluations,
+    _insert_evaluation,
+    window=settings.EVALUATION_BATCH_WINDOW_MS / 1000.0,
+    max_size=settings.EVALUATION_BATCH_MAX_SIZE,
+    name='evaluation-writer',
+    fallback=_insert_evaluation_once,
+)
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def save_evaluation(request, seminar_id):
@@ -790,6 +1289,10 @@ def save_evaluation(request, seminar_id):
     if not ok:
         return err
 
+    archived = _archived_write(seminar_id)
+    if archived is not None:
+        return archived
+
     body = _parse_json_body(request)
     if body is None:
         return _error('Invalid JSON in request body', 400)
@@ -806,10 +1309,17 @@ def save_evaluation(request, seminar_id):
             'participant_email': participant_email,
             'answers': answers,
         }
-        res = sb.table('evaluations').insert(payload).select('*').execute()
-        return _success(res.data, 201)
+        data = evaluation_writer.submit(payload)
+        _on_participant_change(seminar_id, participant_email)
+        return _success(data, 201)
+    except WriteTimeout as e:
+        # The insert may still land, so the Idempotency-Key stays claimed until it does
+        e.future.add_done_callback(lambda f: f.exception() or _on_participant_change(seminar_id, participant_email))
+        response = _error('Evaluation is still being saved; retry with the same Idempotency-Key', 503)
+        response['Retry-After'] = '5'
+        return idempotency.settle_later(response, e.future, lambda data: _success(data, 201))
     except Exception as e:
-        logger.exception(f"Error saving evaluation for {participant_email}")
+        logger.exception("Error saving evaluation for %s", participant_email)
         return _error(f"Failed to save evaluation: {str(e)}", 500)
 
 
@@ -822,15 +1332,25 @@ def fetch_evaluations(request, seminar_id):
         return err
 
     participant_email = request.GET.get('participant_email')
+    since, since_err = parse_since(request)
+    if since_err:
+        return _error(since_err, 400)
 
     try:
-        query = sb.table('evaluations').select('*').eq('seminar_id', seminar_id)
+        archived = _archived_list(seminar_id, 'evaluations', since, None, participant_email)
+        if archived is not None:
+            return archived
+        db = _reader(request)
+        query = db.table('evaluations').select('*').eq('seminar_id', seminar_id)
         if participant_email:
             query = query.eq('participant_email', participant_email)
+        if since:
+            query = apply_since(query, 'evaluations', since).order('created_at')
         res = query.execute()
-        return _success(res.data)
+        tombstones = fetch_tombstones(db, since, seminar_id=seminar_id) if since else None
+        return _delta_success(res.data, 'evaluations', since, tombstones)
     except Exception as e:
-        logger.exception(f"Error fetching evaluations for seminar {seminar_id}")
+        logger.exception("Error fetching evaluations for seminar %s", seminar_id)
         return _error(f"Failed to fetch evaluations: {str(e)}", 500)
 
 
@@ -847,12 +1367,257 @@ def has_evaluated(request, seminar_id):
         return _error('participant_email query parameter is required', 400)
 
     try:
-        res = sb.table('evaluations').select('id').eq('seminar_id', seminar_id).eq('participant_email', participant_email).single().execute()
+        if archive.is_archived(seminar_id):
+            rows = archive.query_rows(seminar_id, 'evaluations', participant_email=participant_email)
+            return JsonResponse({'evaluated': bool(rows)})
+        res = _reader(request).table('evaluations').select('id').eq('seminar_id', seminar_id).eq('participant_email', participant_email).single().execute()
         evaluated = bool(res.data)
         return JsonResponse({'evaluated': evaluated})
     except Exception as e:
         # No rows found is expected, not an error
         if 'single() call returned no rows' in str(e).lower():
             return JsonResponse({'evaluated': False})
-        logger.exception(f"Error checking evaluation for {participant_email}")
+        logger.exception("Error checking evaluation for %s", participant_email)
         return _error(f"Failed to check evaluation status: {str(e)}", 500)
+
+
+# ============ Participant History ============
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def participant_history(request, email):
+    """Every seminar a participant joined, with attendance and evaluation status"""
+    ok, err = _ensure_client()
+    if not ok:
+        return err
+
+    email = (email or '').strip()
+    if '@' not in email:
+        return _error('A valid participant email is required', 400)
+
+    scope = email_scope(email)
+    key = f'history:{scope}:{generation(scope)}:{generation("participants")}:{generation("seminars")}'
+    db = _reader(request)
+    timeout = router.cache_seconds(request.read_from, settings.HISTORY_CACHE_SECONDS)
+    try:
+        return _success(cached(key, timeout, lambda: build_history(db, email)))
+    except Exception as e:
+        logger.exception("Error fetching history for %s", email)
+        return _error(f"Failed to fetch participant history: {str(e)}", 500)
+
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def participant_home(request, email):
+    """Landing screen for a participant: upcoming and ongoing seminars with their joined,
+    attendance and evaluation state"""
+    ok, err = _ensure_client()
+    if not ok:
+        return err
+
+    email = (email or '').strip()
+    if '@' not in email:
+        return _error('A valid participant email is required', 400)
+    limit = _int_param(request, 'limit', 50, 1, 200)
+    if limit is None:
+        return _error('limit must be an integer between 1 and 200', 400)
+
+    scope = email_scope(email)
+    key = f'home:{scope}:{generation(scope)}:{generation("participants")}:{generation("seminars")}:{limit}'
+    db = _reader(request)
+    try:
+        payload = cache.get(key)
+        if payload is None:
+            seminar_index.ensure_fresh(sb)
+            payload, valid_for = build_home(db, seminar_index, email, limit=limit)
+            timeout = router.cache_seconds(request.read_from, settings.HOME_CACHE_SECONDS)
+            # Expire when a listed seminar starts or ends and changes bucket
+            if valid_for is not None:
+                timeout = max(1, min(timeout, int(valid_for) + 1))
+            cache.set(key, payload, timeout)
+        return _success(payload)
+    except Exception as e:
+        logger.exception("Error building home screen for %s", email)
+        return _error(f"Failed to load participant home: {str(e)}", 500)
+
+
+# ============ Analytics ============
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def seminar_analytics(request, seminar_id):
+    """Attendance analytics for one seminar, computed server-side"""
+    ok, err = _ensure_client()
+    if not ok:
+        return err
+    if analytics.np is None:
+        return _error('NumPy is required for analytics. Run pip install -r requirements.txt.', 500)
+
+    bucket_minutes = _int_param(request, 'bucket_minutes', 5, 1, 240)
+    if bucket_minutes is None:
+        return _error('bucket_minutes must be an integer between 1 and 240', 400)
+
+    db = _reader(request)
+
+    def compute():
+        seminar = db.table('seminars').select('id,start_datetime,end_datetime').eq('id', seminar_id).single().execute().data
+        if archive.is_archived(seminar_id):
+            attendance = archive.read_rows(seminar_id, 'attendance')
+            joined = archive.read_rows(seminar_id, 'joined_participants')
+        else:
+            attendance = analytics.fetch_all(lambda: db.table('attendance').select('participant_email,time_in,time_out').eq('seminar_id', seminar_id).order('id'))
+            joined = analytics.fetch_all(lambda: db.table('joined_participants').select('participant_email').eq('seminar_id', seminar_id).order('id'))
+        return analytics.summarize_seminar(seminar, attendance, [r['participant_email'] for r in joined], bucket_minutes)
+
+    try:
+        return _success(analytics.cached(analytics.seminar_cache_key(seminar_id, bucket_minutes), compute,
+                                         router.cache_seconds(request.read_from, settings.ANALYTICS_CACHE_SECONDS)))
+    except Exception as e:
+        if 'no rows' in str(e).lower():
+            return _error(f'Seminar {seminar_id} not found', 404)
+        logger.exception("Error computing analytics for seminar %s", seminar_id)
+        return _error(f"Failed to compute analytics: {str(e)}", 500)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def analytics_rollup(request):
+    """Attendance totals across all seminars dated within ?from=&to="""
+    ok, err = _ensure_client()
+    if not ok:
+        return err
+    if analytics.np is None:
+        return _error('NumPy is required for analytics. Run pip install -r requirements.txt.', 500)
+
+    date_from = request.GET.get('from')
+    date_to = request.GET.get('to')
+    try:
+        for value in (date_from, date_to):
+            if value:
+                datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return _error('from and to must be dates in YYYY-MM-DD format', 400)
+
+    db = _reader(request)
+
+    def compute():
+        query = db.table('seminars').select('id,title,date')
+        if date_from:
+            query = query.gte('date', date_from)
+        if date_to:
+            query = query.lte('date', date_to)
+        seminars = query.order('date').execute().data or []
+        archived = [s['id'] for s in seminars if archive.is_archived(s['id'])]
+        ids = [s['id'] for s in seminars if s['id'] not in archived]
+        attendance, joined = [], []
+        if ids:
+            attendance = analytics.fetch_all(lambda: db.table('attendance').select('seminar_id,participant_email,time_in,time_out').in_('seminar_id', ids).order('id'))
+            joined = analytics.fetch_all(lambda: db.table('joined_participants').select('seminar_id,participant_email').in_('seminar_id', ids).order('id'))
+        for seminar_id in archived:
+            attendance += archive.read_rows(seminar_id, 'attendance')
+            joined += archive.read_rows(seminar_id, 'joined_participants')
+        return analytics.summarize_rollup(seminars, attendance, joined)
+
+    try:
+        return _success(analytics.cached(analytics.rollup_cache_key(date_from, date_to), compute,
+                                         router.cache_seconds(request.read_from, settings.ANALYTICS_CACHE_SECONDS)))
+    except Exception as e:
+        logger.exception("Error computing analytics rollup")
+        return _error(f"Failed to compute analytics: {str(e)}", 500)
+
+
+# ============ Background Jobs ============
+
+def _get_job(job_id):
+    return jobs.Job.objects.filter(pk=job_id).first()
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+def jobs_list_create(request):
+    """GET: list recent jobs | POST: queue a job ({"kind": ..., "params": {...}})"""
+    if request.method == 'GET':
+        status = request.GET.get('status')
+        if status and status not in jobs.STATUSES:
+            return _error(f"status must be one of: {', '.join(jobs.STATUSES)}", 400)
+        limit = _int_param(request, 'limit', 50, 1, 500)
+        if limit is None:
+            return _error('limit must be an integer between 1 and 500', 400)
+        queryset = jobs.Job.objects.all()
+        if status:
+            queryset = queryset.filter(status=status)
+        if request.GET.get('kind'):
+            queryset = queryset.filter(kind=request.GET['kind'])
+        return _success([jobs.as_dict(job) for job in queryset[:limit]])
+
+    body = _parse_json_body(request)
+    if body is None:
+        return _error('Invalid JSON in request body', 400)
+    params = body.get('params') or {}
+    if not isinstance(params, dict):
+        return _error('params must be an object', 400)
+    try:
+        job = jobs.enqueue(body.get('kind'), params, body.get('max_attempts'))
+    except ValueError as e:
+        return _error(str(e), 400)
+    return _success(jobs.as_dict(job), 202)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def job_detail(request, job_id):
+    """Status, progress and result of one job"""
+    job = _get_job(job_id)
+    if job is None:
+        return _error('Job not found', 404)
+    return _success(jobs.as_dict(job))
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def job_cancel(request, job_id):
+    """Cancel a queued job, or ask a running one to stop"""
+    job = _get_job(job_id)
+    if job is None:
+        return _error('Job not found', 404)
+    if job.status in jobs.FINISHED:
+        return _error(f'Job already {job.status}', 409)
+    return _success(jobs.as_dict(jobs.cancel(job)), 202)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def job_download(request, job_id):
+    """Download the file produced by an export job"""
+    job = _get_job(job_id)
+    if job is None:
+        return _error('Job not found', 404)
+    name = (job.result or {}).get('file') if job.status == jobs.SUCCEEDED else None
+    if not name or not os.path.exists(tasks.output_path(name)):
+        return _error('Job has no file to download', 404)
+    return FileResponse(open(tasks.output_path(name), 'rb'), as_attachment=True, filename=name)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def job_stats(request):
+    """Queue depth, throughput and queue latency"""
+    window = _int_param(request, 'window', 3600, 60, 7 * 86400)
+    if window is None:
+        return _error('window must be a number of seconds between 60 and 604800', 400)
+    return _success(jobs.stats(window))
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def batch_requests(request):
+    """Run several API requests in one round trip; see api/batch.py"""
+    body = _parse_json_body(request)
+    if body is None:
+        return _error('Invalid JSON in request body', 400)
+    try:
+        items = batch.parse(body)
+    except batch.BatchError as e:
+        return _error(str(e), 400)
+    return _success(batch.run(request, items))
@@ -19,8 +19,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.logs.RequestIdMiddleware',
+    'api.audit.AuditMiddleware',
+    'api.profiling.ProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'api.upstream.UpstreamFallbackMiddleware',
+    'api.idempotency.IdempotencyMiddleware',
+    'api.routing.ReadRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -37,6 +43,17 @@ DATABASES = {
     }
 }
 
+# Shared cache for derived data. The file backend is visible to every gunicorn
+# worker on the host, so an invalidation in one worker is seen by the others.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('DJANGO_CACHE_DIR', str(BASE_DIR / '.cache')),
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('DJANGO_CACHE_MAX_ENTRIES', '5000'))},
+    }
+}
+
 # Static files (for completeness)
 STATIC_URL = '/static/'
 
@@ -61,12 +78,139 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'idempotency-key',
+    'x-profile',
+    'x-client-id',
+    'x-request-id',
+    'if-match',
 ]
 
+# Seminar responses carry an ETag that PATCH takes back in If-Match
+CORS_EXPOSE_HEADERS = ['etag']
+
 # Supabase service role envs
 SUPABASE_URL = os.environ.get('SUPABASE_URL')
 SUPABASE_SERVICE_ROLE_KEY = os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
 
+# Per-call deadline for Supabase (PostgREST) requests, well under gunicorn's
+# 60 s worker timeout
+SUPABASE_TIMEOUT_SECONDS = float(os.environ.get('SUPABASE_TIMEOUT_SECONDS', '5'))
+
+# Circuit breaker: open after N consecutive upstream failures, probe again after
+# the reset interval. Failed GETs fall back to the last good response this
+# worker served for the same URL, if it is at most UPSTREAM_STALE_SECONDS old.
+# Those copies are capped at UPSTREAM_STALE_MAX_BYTES of bodies per worker.
+UPSTREAM_BREAKER_THRESHOLD = int(os.environ.get('UPSTREAM_BREAKER_THRESHOLD', '5'))
+UPSTREAM_BREAKER_RESET_SECONDS = float(os.environ.get('UPSTREAM_BREAKER_RESET_SECONDS', '15'))
+UPSTREAM_STALE_SECONDS = int(os.environ.get('UPSTREAM_STALE_SECONDS', '600'))
+UPSTREAM_STALE_MAX_BYTES = int(os.environ.get('UPSTREAM_STALE_MAX_BYTES', str(16 << 20)))
+
+# Optional read replica (see api/routing.py). Dashboard and list GETs read from
+# it unless the client wrote within READ_STICKY_SECONDS or the replica lags by
+# more than REPLICA_MAX_LAG_SECONDS (measured every REPLICA_LAG_CHECK_SECONDS).
+SUPABASE_READ_URL = os.environ.get('SUPABASE_READ_URL')
+SUPABASE_READ_KEY = os.environ.get('SUPABASE_READ_KEY') or SUPABASE_SERVICE_ROLE_KEY
+READ_STICKY_SECONDS = float(os.environ.get('READ_STICKY_SECONDS', '10'))
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '5'))
+REPLICA_LAG_CHECK_SECONDS = float(os.environ.get('REPLICA_LAG_CHECK_SECONDS', '5'))
+
+# Rows per upstream upsert when bulk-importing participants
+BULK_IMPORT_CHUNK_SIZE = int(os.environ.get('BULK_IMPORT_CHUNK_SIZE', '500'))
+
+# Stored responses for POSTs sent with an Idempotency-Key header
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', '900'))
+IDEMPOTENCY_MAX_ENTRIES = int(os.environ.get('IDEMPOTENCY_MAX_ENTRIES', '10000'))
+
+# Evaluation submissions arriving within the window are written as one insert.
+# Off (0) by default: it only pays off when the upstream pool is the bottleneck.
+EVALUATION_BATCH_WINDOW_MS = float(os.environ.get('EVALUATION_BATCH_WINDOW_MS', '0'))
+EVALUATION_BATCH_MAX_SIZE = int(os.environ.get('EVALUATION_BATCH_MAX_SIZE', '50'))
+
+# Repeat scans of the same QR code (same seminar, email and action) within this
+# many seconds are answered from memory. 0 disables suppression.
+SCAN_DEDUP_SECONDS = float(os.environ.get('SCAN_DEDUP_SECONDS', '5'))
+SCAN_DEDUP_MAX_ENTRIES = int(os.environ.get('SCAN_DEDUP_MAX_ENTRIES', '10000'))
+
+# Live seminar counters are rebuilt from Supabase this often (and on first use)
+SEMINAR_COUNTERS_RECONCILE_SECONDS = int(os.environ.get('SEMINAR_COUNTERS_RECONCILE_SECONDS', '300'))
+
+# Cached analytics results; scans invalidate them immediately
+ANALYTICS_CACHE_SECONDS = int(os.environ.get('ANALYTICS_CACHE_SECONDS', '300'))
+
+# Cached per-participant history; the participant's own writes invalidate it
+HISTORY_CACHE_SECONDS = int(os.environ.get('HISTORY_CACHE_SECONDS', '300'))
+
+# Cached participant home screen; also expires when a listed seminar starts or ends
+HOME_CACHE_SECONDS = int(os.environ.get('HOME_CACHE_SECONDS', '300'))
+
+# Upper bound on how long the in-memory seminar search index goes without a
+# delta refresh (it also refreshes as soon as another worker writes a seminar)
+SEMINAR_SEARCH_MAX_STALENESS = int(os.environ.get('SEMINAR_SEARCH_MAX_STALENESS', '30'))
+
+# Background jobs (see api/jobs.py and `manage.py run_jobs`)
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+JOB_RETRY_BACKOFF_SECONDS = int(os.environ.get('JOB_RETRY_BACKOFF_SECONDS', '10'))
+JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', '120'))
+JOB_WORKER_CONCURRENCY = int(os.environ.get('JOB_WORKER_CONCURRENCY', '2'))
+JOBS_OUTPUT_DIR = os.environ.get('JOBS_OUTPUT_DIR', str(BASE_DIR / 'job_output'))
+
+# Cold archive for finished seminars (see `manage.py archive_seminars`).
+# Point ARCHIVE_DIR at a persistent volume in production.
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', str(BASE_DIR / 'archive'))
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '365'))
+
+# Server-rendered QR codes (see api/qrcodes.py). FRONTEND_URL must match the
+# frontend that handles /qr scans. An uncached badge sheet with more than
+# QR_SHEET_SYNC_MAX_BADGES badges is queued as a qr_sheet job; the job worker encodes
+# them on up to QR_RENDER_PROCESSES processes (1 keeps encoding in its thread).
+FRONTEND_URL = os.environ.get('FRONTEND_URL', 'https://finalws.vercel.app').rstrip('/')
+QR_SHEET_SYNC_MAX_BADGES = int(os.environ.get('QR_SHEET_SYNC_MAX_BADGES', '240'))
+QR_RENDER_PROCESSES = int(os.environ.get('QR_RENDER_PROCESSES', str(min(os.cpu_count() or 1, 4))))
+
+# Request profiling (see api/profiling.py). Disabled unless a sample rate or a
+# token for the X-Profile header is set. Engine is 'sampler' (folded stacks
+# for flame graphs) or 'cprofile' (pstats).
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN', '')
+PROFILING_ENGINE = os.environ.get('PROFILING_ENGINE', 'sampler')
+PROFILING_INTERVAL_MS = float(os.environ.get('PROFILING_INTERVAL_MS', '5'))
+PROFILING_DIR = os.environ.get('PROFILING_DIR', str(BASE_DIR / 'profiles'))
+PROFILING_MAX_FILES = int(os.environ.get('PROFILING_MAX_FILES', '200'))
+
+# POST /api/batch/ (see api/batch.py): sub-requests per batch, and how many
+# of the independent ones run at once
+BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', '20'))
+BATCH_MAX_CONCURRENCY = int(os.environ.get('BATCH_MAX_CONCURRENCY', '4'))
+
+# API audit trail (see api/audit.py): errors and calls slower than
+# API_LOG_SLOW_MS are always kept, other requests at API_LOG_SAMPLE_RATE.
+# Buffered records are bulk-inserted into ApiLog every API_LOG_FLUSH_SECONDS;
+# a full buffer overwrites the oldest. A buffer size of 0 disables the trail.
+API_LOG_BUFFER_SIZE = int(os.environ.get('API_LOG_BUFFER_SIZE', '10000'))
+API_LOG_SAMPLE_RATE = float(os.environ.get('API_LOG_SAMPLE_RATE', '0.01'))
+API_LOG_SLOW_MS = float(os.environ.get('API_LOG_SLOW_MS', '1000'))
+API_LOG_FLUSH_SECONDS = float(os.environ.get('API_LOG_FLUSH_SECONDS', '5'))
+API_LOG_COMPACT_AFTER_DAYS = int(os.environ.get('API_LOG_COMPACT_AFTER_DAYS', '7'))
+API_LOG_RETENTION_DAYS = int(os.environ.get('API_LOG_RETENTION_DAYS', '90'))
+
+# Outgoing email. Without EMAIL_HOST, messages are printed to the console.
+EMAIL_HOST = os.environ.get('EMAIL_HOST', '')
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend' if EMAIL_HOST
+                               else 'django.core.mail.backends.console.EmailBackend')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', '587'))
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'True') == 'True'
+EMAIL_TIMEOUT = int(os.environ.get('EMAIL_TIMEOUT', '30'))
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'no-reply@localhost')
+
+# Evaluation reminders (the 'evaluation_reminders' job, see api/reminders.py):
+# messages per ledger write, SMTP connections kept open in parallel, and the
+# overall send rate across them (0 for no limit)
+REMINDER_BATCH_SIZE = int(os.environ.get('REMINDER_BATCH_SIZE', '100'))
+REMINDER_SMTP_CONNECTIONS = int(os.environ.get('REMINDER_SMTP_CONNECTIONS', '2'))
+REMINDER_RATE_PER_SECOND = float(os.environ.get('REMINDER_RATE_PER_SECOND', '25'))
+
 # REST framework settings
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': (
@@ -75,45 +219,56 @@ REST_FRAMEWORK = {
 }
 
 # Logging configuration
+# Records go on a queue and a background thread writes them (see api/logs.py),
+# so requests never wait on log I/O. Each process writes LOG_FILE with its pid
+# inserted (debug.<pid>.log), rotated at LOG_MAX_BYTES.
+# LOG_FORMAT is 'text' or 'json'. Upstream-failure records are sampled: at most
+# LOG_SAMPLE_BURST per call site every LOG_SAMPLE_WINDOW_SECONDS (0 disables).
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'DEBUG')
+LOG_FILE = os.environ.get('LOG_FILE', str(BASE_DIR / 'debug.log'))
+LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', '5'))
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+LOG_SAMPLE_WINDOW_SECONDS = float(os.environ.get('LOG_SAMPLE_WINDOW_SECONDS', '10'))
+LOG_SAMPLE_BURST = int(os.environ.get('LOG_SAMPLE_BURST', '5'))
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
-    'formatters': {
-        'verbose': {
-            'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
-            'style': '{',
-        },
-        'simple': {
-            'format': '{levelname} {message}',
-            'style': '{',
+    'filters': {
+        'sample_upstream': {
+            '()': 'api.logs.UpstreamSampler',
+            'window': LOG_SAMPLE_WINDOW_SECONDS,
+            'burst': LOG_SAMPLE_BURST,
         },
     },
     'handlers': {
-        'console': {
-            'level': 'INFO',
-            'class': 'logging.StreamHandler',
-            'formatter': 'simple',
-        },
-        'file': {
-            'level': 'DEBUG',
-            'class': 'logging.FileHandler',
-            'filename': BASE_DIR / 'debug.log',
-            'formatter': 'verbose',
+        'background': {
+            '()': 'api.logs.BackgroundHandler',
+            'filename': LOG_FILE,
+            'max_bytes': LOG_MAX_BYTES,
+            'backup_count': LOG_BACKUP_COUNT,
+            'fmt': LOG_FORMAT,
+            'console_level': 'INFO',
+            'file_level': 'DEBUG',
+            'queue_size': LOG_QUEUE_SIZE,
+            'filters': ['sample_upstream'],
         },
     },
     'root': {
-        'handlers': ['console', 'file'],
+        'handlers': ['background'],
         'level': 'INFO',
     },
     'loggers': {
         'django': {
-            'handlers': ['console', 'file'],
+            'handlers': ['background'],
             'level': os.getenv('DJANGO_LOG_LEVEL', 'INFO'),
             'propagate': False,
         },
         'api': {
-            'handlers': ['console', 'file'],
-            'level': 'DEBUG',
+            'handlers': ['background'],
+            'level': LOG_LEVEL,
             'propagate': False,
         },
     },
@@ -1,6 +1,10 @@
 from django.urls import path, include
 from django.http import JsonResponse
 
+from api import audit, logs, upstream
+from api.routing import router
+from api.scans import recent_scans
+
 
 def root_view(request):
     """Root endpoint - API status"""
@@ -8,6 +12,11 @@ def root_view(request):
         'message': 'VPAA Seminar Management API',
         'version': '1.0',
         'status': 'running',
+        'upstream': upstream.breaker.snapshot(),
+        'duplicate_scans': recent_scans.snapshot(),
+        'read_routing': router.snapshot(),
+        'logging': logs.snapshot(),
+        'audit': audit.trail.snapshot(),
         'endpoints': {
             'seminars': '/api/seminars/',
             'attendance': '/api/seminars/<id>/attendance/',
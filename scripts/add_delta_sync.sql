@@ -0,0 +1,54 @@
+-- Migration: change tracking for delta sync (`?since=` on list endpoints)
+-- Run this in Supabase SQL editor. List endpoints filter on updated_at (seminars,
+-- attendance, joined_participants) or created_at (evaluations), and report
+-- deletions from the change_log table.
+
+-- joined_participants had no change timestamp; check-ins update rows in place.
+-- The column is added without a default so existing rows stay NULL and are
+-- backfilled from their own timestamps; only then do default and NOT NULL apply.
+ALTER TABLE IF EXISTS joined_participants
+  ADD COLUMN IF NOT EXISTS updated_at timestamptz;
+UPDATE joined_participants SET updated_at = coalesce(check_out, check_in, joined_at, now())
+WHERE updated_at IS NULL;
+ALTER TABLE IF EXISTS joined_participants
+  ALTER COLUMN updated_at SET DEFAULT now(),
+  ALTER COLUMN updated_at SET NOT NULL;
+
+-- Keep updated_at current for writes from the API and from the browser client
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+BEGIN
+  NEW.updated_at = now();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_seminars_updated_at ON seminars;
+CREATE TRIGGER trg_seminars_updated_at BEFORE UPDATE ON seminars
+  FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+DROP TRIGGER IF EXISTS trg_attendance_updated_at ON attendance;
+CREATE TRIGGER trg_attendance_updated_at BEFORE UPDATE ON attendance
+  FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+DROP TRIGGER IF EXISTS trg_joined_participants_updated_at ON joined_participants;
+CREATE TRIGGER trg_joined_participants_updated_at BEFORE UPDATE ON joined_participants
+  FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+-- Tombstones for deleted rows. Deleting a seminar cascades to its attendance,
+-- participants and evaluations, so a single 'seminars' entry covers them.
+CREATE TABLE IF NOT EXISTS change_log (
+  id bigint GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+  table_name text NOT NULL,
+  row_id text NOT NULL,
+  seminar_id uuid NULL,
+  deleted_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_change_log_table_deleted ON change_log(table_name, deleted_at);
+CREATE INDEX IF NOT EXISTS idx_change_log_seminar_deleted ON change_log(seminar_id, deleted_at);
+
+-- Indexes for the delta queries
+CREATE INDEX IF NOT EXISTS idx_seminars_updated_at ON seminars(updated_at);
+CREATE INDEX IF NOT EXISTS idx_attendance_seminar_updated ON attendance(seminar_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_joined_participants_seminar_updated ON joined_participants(seminar_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_evaluations_seminar_created ON evaluations(seminar_id, created_at);
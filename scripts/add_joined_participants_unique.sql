@@ -0,0 +1,14 @@
+-- Migration: one registration per participant per seminar
+-- Run this in Supabase SQL editor before using the bulk participant import.
+-- Bulk imports and /participants/join/ upsert on (seminar_id, participant_email),
+-- which requires a unique index on those columns.
+
+-- Remove duplicate registrations, keeping the earliest row for each participant
+DELETE FROM joined_participants a
+USING joined_participants b
+WHERE a.seminar_id = b.seminar_id
+  AND a.participant_email = b.participant_email
+  AND (a.joined_at, a.id) > (b.joined_at, b.id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_joined_participants_unique
+  ON joined_participants(seminar_id, participant_email);
@@ -0,0 +1,7 @@
+-- Migration: indexes for lookups by participant email
+-- Run this in Supabase SQL editor. Used by /api/participants/<email>/history/
+-- and the per-seminar "has evaluated" check.
+
+CREATE INDEX IF NOT EXISTS idx_joined_participants_email ON joined_participants(participant_email);
+CREATE INDEX IF NOT EXISTS idx_evaluations_email ON evaluations(participant_email);
+CREATE INDEX IF NOT EXISTS idx_evaluations_seminar_email ON evaluations(seminar_id, participant_email);
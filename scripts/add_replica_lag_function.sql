@@ -0,0 +1,16 @@
+-- Migration: replication lag probe for read-replica routing
+-- Run this in Supabase SQL editor; it replicates to read replicas like any other
+-- function. The API calls it on the replica (POST /rest/v1/rpc/replica_lag_seconds)
+-- and sends reads back to the primary while the lag exceeds REPLICA_MAX_LAG_SECONDS.
+-- Returns 0 on a primary, and on a replica that has replayed everything it received
+-- (an idle primary would otherwise look like a lagging replica).
+
+CREATE OR REPLACE FUNCTION replica_lag_seconds() RETURNS double precision AS $$
+  SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+  END;
+$$ LANGUAGE sql STABLE;
+
+GRANT EXECUTE ON FUNCTION replica_lag_seconds() TO service_role;
@@ -29,7 +29,8 @@ create table if not exists joined_participants (
   participant_email text,
   participant_name text,
   metadata jsonb,
-  joined_at timestamptz default now()
+  joined_at timestamptz default now(),
+  updated_at timestamptz default now()
 );
 
 -- evaluations: stores evaluation responses per seminar / participant
@@ -41,7 +42,15 @@ create table if not exists evaluations (
   created_at timestamptz default now()
 );
 
+-- For delta sync (updated_at triggers and the change_log tombstone table),
+-- also run scripts/add_delta_sync.sql
+
 -- Indexes for faster lookups
 create index if not exists idx_seminars_date on seminars(date);
 create index if not exists idx_joined_seminars on joined_participants(seminar_id);
+-- one registration per participant per seminar (required for upserts)
+create unique index if not exists idx_joined_participants_unique on joined_participants(seminar_id, participant_email);
 create index if not exists idx_evaluations_seminar on evaluations(seminar_id);
+create index if not exists idx_joined_participants_email on joined_participants(participant_email);
+create index if not exists idx_evaluations_email on evaluations(participant_email);
+create index if not exists idx_evaluations_seminar_email on evaluations(seminar_id, participant_email);
@@ -2,7 +2,7 @@ import React, { useState, useEffect } from "react";
 import "../App.css";
 import { saveEvaluation, fetchEvaluations } from "../lib/db";
 
-function Evaluation() {
+function Evaluation({ seminars: loadedSeminars, initialSeminarId }) {
   const [seminars, setSeminars] = useState([]);
   const [selectedSeminar, setSelectedSeminar] = useState(null);
   const [answers, setAnswers] = useState({});
@@ -11,10 +11,18 @@ function Evaluation() {
   const [submitted, setSubmitted] = useState(false);
   const [showCheckmark, setShowCheckmark] = useState(false);
 
+  // Prefer the list the dashboard just loaded; the stored one may be from an earlier visit
   useEffect(() => {
     const storedSeminars = JSON.parse(localStorage.getItem("seminars")) || [];
-    setSeminars(storedSeminars);
-  }, []);
+    setSeminars(loadedSeminars?.length ? loadedSeminars : storedSeminars);
+  }, [loadedSeminars]);
+
+  // Opened from a link to one seminar's evaluation: select it once the list has it
+  useEffect(() => {
+    if (!initialSeminarId || selectedSeminar) return;
+    const linked = seminars.find((s) => s.id === initialSeminarId);
+    if (linked) handleSelectSeminar(linked);
+  }, [initialSeminarId, seminars]);
 
   useEffect(() => {
     if (selectedSeminar?.questions?.length) {
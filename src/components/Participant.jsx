@@ -1,15 +1,23 @@
 import React, { useState, useEffect } from "react";
+import { useLocation } from "react-router-dom";
 import html2canvas from "html2canvas";
 import jsPDF from "jspdf";
 import "../App.css";
 import Evaluation from "./Evalution.jsx";
 import AttendanceScanner from "./AttendanceScanner.jsx";
 import ParticipantQRCode from "./ParticipantQRCode.jsx";
-import { fetchSeminars as dbFetchSeminars, saveJoinedParticipant, checkInParticipant } from "../lib/db";
+import { fetchSeminars as dbFetchSeminars, fetchParticipantHome, saveJoinedParticipant, checkInParticipant } from "../lib/db";
 import HamburgerToggle from './HamburgerToggle';
 
+const SECTIONS = ["seminars", "attendance", "certificates", "evaluation"];
+
 function ParticipantDashboard({ onLogout }) {
-  const [activeSection, setActiveSection] = useState("seminars");
+  // Links such as the evaluation reminder email open a section, and optionally a seminar:
+  // /participant?seminar=<id>&section=evaluation
+  const linkParams = new URLSearchParams(useLocation().search);
+  const linkedSection = linkParams.get("section");
+  const linkedSeminarId = linkParams.get("seminar");
+  const [activeSection, setActiveSection] = useState(SECTIONS.includes(linkedSection) ? linkedSection : "seminars");
   const [joinedSeminars, setJoinedSeminars] = useState([]);
   const [availableSeminars, setAvailableSeminars] = useState([]);
   const [completedEvaluations, setCompletedEvaluations] = useState([]);
@@ -19,22 +27,57 @@ function ParticipantDashboard({ onLogout }) {
   useEffect(() => {
     let mounted = true;
 
-    async function load() {
+    // The full seminar rows: the evaluation form and certificates read them from 'seminars'
+    async function loadSeminars() {
       try {
         const { data, error } = await dbFetchSeminars();
         if (!error && data) {
-          if (mounted) {
-            setAvailableSeminars(data);
-            localStorage.setItem('seminars', JSON.stringify(data));
-          }
-        } else {
-          const storedSeminars = JSON.parse(localStorage.getItem("seminars")) || [];
-          if (mounted) setAvailableSeminars(storedSeminars);
+          localStorage.setItem('seminars', JSON.stringify(data));
+          return data;
         }
       } catch (err) {
-        const storedSeminars = JSON.parse(localStorage.getItem("seminars")) || [];
-        if (mounted) setAvailableSeminars(storedSeminars);
+        console.warn('Seminars unavailable, using the stored list:', err);
+      }
+      return JSON.parse(localStorage.getItem("seminars")) || [];
+    }
+
+    // Joined, attendance and evaluation state in one request when the participant is known.
+    // Home rows are summaries of upcoming seminars only, so they are kept under their own
+    // key, and joined entries take the full row from the seminar list.
+    function applyHome(data, seminars) {
+      localStorage.setItem('participantHome', JSON.stringify(data));
+      const storedJoined = JSON.parse(localStorage.getItem("joinedSeminars")) || [];
+      const storedCompletedEvals = JSON.parse(localStorage.getItem("completedEvaluations")) || [];
+      const fullRows = new Map(seminars.map((s) => [s.id, s]));
+      const serverJoined = [...data.seminars.filter((s) => s.joined), ...data.pending_evaluations]
+        .map((s) => ({ ...fullRows.get(s.id), ...s, completed: !!s.time_in }));
+      const joined = [
+        ...serverJoined,
+        ...storedJoined.filter((s) => !serverJoined.find((j) => j.title === s.title)),
+      ];
+      const evaluated = data.seminars.filter((s) => s.evaluated).map((s) => s.title);
+      const completedEvals = [...new Set([...storedCompletedEvals, ...evaluated])];
+      if (mounted) {
+        setJoinedSeminars(joined);
+        setCompletedEvaluations(completedEvals);
+        localStorage.setItem('joinedSeminars', JSON.stringify(joined));
+        localStorage.setItem('completedEvaluations', JSON.stringify(completedEvals));
+      }
+    }
+
+    async function load() {
+      const email = localStorage.getItem('participantEmail');
+      // Both requests run at once; the home payload only needs the list to fill in joined rows
+      const homeRequest = email ? fetchParticipantHome(email).catch((err) => ({ error: err })) : null;
+      const seminars = await loadSeminars();
+      if (mounted) setAvailableSeminars(seminars);
+
+      const home = homeRequest ? await homeRequest : null;
+      if (home && !home.error && home.data) {
+        applyHome(home.data, seminars);
+        return;
       }
+      if (home) console.warn('Participant home unavailable, using stored state:', home.error);
 
       const storedJoined = JSON.parse(localStorage.getItem("joinedSeminars")) || [];
       const storedCompletedEvals = JSON.parse(localStorage.getItem("completedEvaluations")) || [];
@@ -764,7 +807,7 @@ function ParticipantDashboard({ onLogout }) {
       case "evaluation":
         return (
           <div className="section-content">
-            <Evaluation />
+            <Evaluation seminars={availableSeminars} initialSeminarId={linkedSeminarId} />
           </div>
         );
 
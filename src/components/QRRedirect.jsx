@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { useLocation, useNavigate } from 'react-router-dom';
-import { recordTimeIn, recordTimeOut, fetchSeminars } from '../lib/db';
+import { batchRequests, recordTimeOut } from '../lib/db';
 
 export default function QRRedirect() {
   const location = useLocation();
@@ -12,6 +12,7 @@ export default function QRRedirect() {
   const [seminarEndTime, setSeminarEndTime] = useState(null);
   const [attendanceData, setAttendanceData] = useState(null);
   const [timeUntilTimeout, setTimeUntilTimeout] = useState(null);
+  const [alreadyEvaluated, setAlreadyEvaluated] = useState(false);
 
   // Parse QR data
   const parseQRData = () => {
@@ -32,30 +33,18 @@ export default function QRRedirect() {
     return null;
   };
 
-  // Get seminar end time
-  const getSeminarEndTime = async (seminarId) => {
-    try {
-      const res = await fetchSeminars();
-      if (res.error) return null;
-      
-      const seminars = Array.isArray(res.data) ? res.data : [res.data];
-      const seminar = seminars.find(s => s.id === seminarId);
-      
-      if (!seminar) return null;
-      
-      // Use end_datetime or end_time
-      if (seminar.end_datetime) {
-        return new Date(seminar.end_datetime);
-      }
-      if (seminar.end_time) {
-        const today = new Date();
-        const [hours, minutes] = seminar.end_time.split(':').map(Number);
-        const endDate = new Date(today);
-        endDate.setHours(hours, minutes, 0);
-        return endDate;
-      }
-    } catch (err) {
-      console.error('Error fetching seminar:', err);
+  // Seminar end time, from end_datetime or today's end_time
+  const getSeminarEndTime = (seminar) => {
+    if (!seminar) return null;
+    if (seminar.end_datetime) {
+      return new Date(seminar.end_datetime);
+    }
+    if (seminar.end_time) {
+      const today = new Date();
+      const [hours, minutes] = seminar.end_time.split(':').map(Number);
+      const endDate = new Date(today);
+      endDate.setHours(hours, minutes, 0);
+      return endDate;
     }
     return null;
   };
@@ -74,15 +63,29 @@ export default function QRRedirect() {
 
         setMessage(`Processing attendance for ${payload.participant_email}...`);
 
-        // Get seminar details to check end time
-        const endTime = await getSeminarEndTime(payload.seminar_id);
+        // Fetch the seminar (for its end time), check for an earlier evaluation and
+        // record time IN in one round trip; none of them needs another's result
+        const seminarPath = `/seminars/${encodeURIComponent(payload.seminar_id)}`;
+        const email = encodeURIComponent(payload.participant_email);
+        const batch = await batchRequests([
+          { id: 'seminar', path: `${seminarPath}/` },
+          { id: 'evaluated', path: `${seminarPath}/evaluations/check/?participant_email=${email}` },
+          {
+            id: 'in',
+            method: 'POST',
+            path: `${seminarPath}/attendance/time_in/`,
+            body: { participant_email: payload.participant_email },
+          },
+        ]);
+        const inRes = batch.error ? { data: null, error: batch.error } : batch.data.in;
+
+        const endTime = batch.error ? null : getSeminarEndTime(batch.data.seminar.data);
         if (endTime) {
           setSeminarEndTime(endTime);
         }
+        // A failed check leaves the evaluation link in place; the form checks again on submit
+        setAlreadyEvaluated(!batch.error && !!batch.data.evaluated.body?.evaluated);
 
-        // Record time IN
-        const inRes = await recordTimeIn(payload.seminar_id, payload.participant_email);
-        
         if (inRes.error) {
           console.error('Time IN error:', inRes.error);
           setStatus('error');
@@ -212,9 +215,9 @@ export default function QRRedirect() {
         seminarId: attendanceData.seminar_id
       });
 
-      // Redirect to evaluation after 2 seconds
+      // Redirect to evaluation after 2 seconds (home if it was already submitted)
       setTimeout(() => {
-        navigate(`/evaluation/${attendanceData.seminar_id}?email=${attendanceData.participant_email}`);
+        navigate(alreadyEvaluated ? '/' : `/evaluation/${attendanceData.seminar_id}?email=${attendanceData.participant_email}`);
       }, 2000);
     } catch (err) {
       console.error('Error during time-out:', err);
@@ -233,15 +236,15 @@ export default function QRRedirect() {
     }
   }, [status, result, navigate]);
 
-  // Auto-redirect after check-out to evaluation
+  // Auto-redirect after check-out to evaluation, unless it was already submitted
   useEffect(() => {
     if (status === 'success' && result?.type === 'out') {
       const timer = setTimeout(() => {
-        navigate(`/evaluation/${result.seminarId}?email=${result.email}`);
+        navigate(alreadyEvaluated ? '/' : `/evaluation/${result.seminarId}?email=${result.email}`);
       }, 2000);
       return () => clearTimeout(timer);
     }
-  }, [status, result, navigate]);
+  }, [status, result, alreadyEvaluated, navigate]);
 
   return (
     <div style={{
@@ -429,7 +432,9 @@ export default function QRRedirect() {
               color: '#999',
               fontSize: '14px'
             }}>
-              {result?.type === 'out' ? 'Redirecting to evaluation...' : 'Redirecting in 3 seconds...'}
+              {result?.type === 'out'
+                ? (alreadyEvaluated ? 'Evaluation already submitted. Redirecting...' : 'Redirecting to evaluation...')
+                : 'Redirecting in 3 seconds...'}
             </p>
           </>
         )}
@@ -4,6 +4,29 @@ import { supabase } from './supabaseClient';
 // but in production do NOT fall back to localhost (that would fail when running on Vercel).
 const API_BASE = import.meta.env.VITE_API_URL ?? (import.meta.env.DEV ? 'http://127.0.0.1:8000/api' : '');
 
+// Per-browser id sent as X-Client-Id so the backend can route this browser's reads to
+// the primary right after it writes. Without it, browsers behind one NAT share a key.
+const CLIENT_ID_KEY = 'apiClientId';
+let clientId = null;
+
+function getClientId() {
+  if (clientId) return clientId;
+  const fresh = () => (globalThis.crypto?.randomUUID
+    ? globalThis.crypto.randomUUID()
+    : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`);
+  try {
+    clientId = localStorage.getItem(CLIENT_ID_KEY);
+    if (!clientId) {
+      clientId = fresh();
+      localStorage.setItem(CLIENT_ID_KEY, clientId);
+    }
+  } catch {
+    // Storage blocked (private mode, sandboxed iframe): keep an id for this page load
+    clientId = fresh();
+  }
+  return clientId;
+}
+
 // Helper function for API calls
 async function apiCall(endpoint, method = 'GET', body = null) {
   if (!API_BASE) {
@@ -14,7 +37,7 @@ async function apiCall(endpoint, method = 'GET', body = null) {
   try {
     const options = {
       method,
-      headers: { 'Content-Type': 'application/json' }
+      headers: { 'Content-Type': 'application/json', 'X-Client-Id': getClientId() }
     };
     if (body) options.body = JSON.stringify(body);
     
@@ -69,7 +92,9 @@ export async function upsertSeminar(seminar) {
     metadata: seminar.metadata || null,
     certificate_template_url: seminar.certificate_template_url || null,
   };
-  return apiCall(`/seminars/${seminar.id}/`, 'PUT', payload);
+  // PATCH: the backend writes only the fields that differ from the stored row
+  const res = await apiCall(`/seminars/${seminar.id}/`, 'PATCH', payload);
+  return res.error ? res : { data: [res.data], error: null };
 }
 
 export async function deleteSeminar(id) {
@@ -145,7 +170,7 @@ export async function fetchEvaluations(seminarId, participant_email = null) {
 export async function hasEvaluated(seminarId, participant_email) {
   try {
     const endpoint = `/seminars/${seminarId}/evaluations/check/?participant_email=${participant_email}`;
-    const response = await fetch(`${API_BASE}${endpoint}`);
+    const response = await fetch(`${API_BASE}${endpoint}`, { headers: { 'X-Client-Id': getClientId() } });
     const json = await response.json();
     return { evaluated: json.evaluated, error: null };
   } catch (error) {
@@ -181,6 +206,14 @@ export async function uploadCertificateTemplate(seminarId, file) {
   return { data: { url: publicURL }, error: null };
 }
 
+// ============ Participants ============
+
+// Landing screen in one call: upcoming and ongoing seminars with joined,
+// attendance and evaluation-pending state, plus attended seminars awaiting evaluation
+export async function fetchParticipantHome(participant_email) {
+  return apiCall(`/participants/${encodeURIComponent(participant_email)}/home/`);
+}
+
 // ============ Bulk Operations ============
 
 export async function saveAllSeminars(seminars) {
@@ -201,6 +234,28 @@ export async function saveAllSeminars(seminars) {
   return { data: results.map(r => r.data).flat(), error: null };
 }
 
+// Several API calls in one round trip. Each request is { id, method, path, body, depends_on },
+// with `path` relative to the API base (e.g. '/seminars/1/'). Results are keyed by id,
+// each in the same { data, error } shape the single-call helpers return, plus the raw
+// `body` for endpoints that do not wrap their result in `data`.
+export async function batchRequests(requests) {
+  const res = await apiCall('/batch/', 'POST', {
+    requests: requests.map(r => ({ ...r, path: `/api${r.path}` })),
+  });
+  if (res.error) return { data: null, error: res.error };
+
+  const results = {};
+  for (const item of res.data) {
+    const ok = item.status < 400;
+    results[item.id] = {
+      data: ok ? item.body?.data ?? null : null,
+      error: ok ? null : item.body?.error || `Request failed with status ${item.status}`,
+      body: item.body ?? null,
+    };
+  }
+  return { data: results, error: null };
+}
+
 export default {
   fetchSeminars,
   createSeminar,
@@ -218,4 +273,6 @@ export default {
   saveAllSeminars,
   checkInParticipant,
   checkOutParticipant,
+  batchRequests,
+  fetchParticipantHome,
 };